@@ -0,0 +1,110 @@
+"""
+Load test of the catalog mirror against direct upstream fetches.
+
+netsim plays the upstream catalog and update servers. Simulated clients start up
+in waves and fetch /radio.json and /version.json, either straight from upstream or
+through the mirror; half of them are returning clients that send the ETag of
+their cached copy. Reports requests per second, latency, bytes on the wire and
+how many requests reached upstream.
+
+    python benchmarks/catalog_mirror_loadtest.py --clients 200 --startups 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from catalog_mirror import CatalogMirror
+from netsim import NetSimServer, default_catalog
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _run_clients(base_url, clients, startups):
+    """Each client thread simulates `startups` app launches. Returns (latencies, bytes, not_modified, errors, seconds)."""
+    latencies = []
+    totals = {"bytes": 0, "not_modified": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def client(index):
+        session = requests.Session()
+        etags = {}
+        for _ in range(startups):
+            for document in ("radio.json", "version.json"):
+                headers = {}
+                # Returning clients revalidate their cached copy.
+                if index % 2 and document in etags:
+                    headers["If-None-Match"] = etags[document]
+                started = time.monotonic()
+                try:
+                    response = session.get(f"{base_url}/{document}", headers=headers, timeout=30)
+                    wire_bytes = int(response.headers.get("Content-Length", len(response.content)))
+                    if response.headers.get("ETag"):
+                        etags[document] = response.headers["ETag"]
+                    outcome = "not_modified" if response.status_code == 304 else None
+                    if response.status_code >= 400:
+                        outcome = "errors"
+                except requests.exceptions.RequestException:
+                    wire_bytes, outcome = 0, "errors"
+                with lock:
+                    latencies.append(time.monotonic() - started)
+                    totals["bytes"] += wire_bytes
+                    if outcome:
+                        totals[outcome] += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, totals, time.monotonic() - started
+
+
+def _report(label, latencies, totals, seconds, upstream_requests):
+    print(f"{label}:")
+    print(f"  requests:           {len(latencies)} in {seconds:.2f} s ({len(latencies) / seconds:.0f} req/s)")
+    print(f"  latency:            p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"p95 {_percentile(latencies, 0.95) * 1000:.1f} ms")
+    print(f"  bytes on the wire:  {totals['bytes'] / 1e6:.2f} MB ({totals['not_modified']} not modified, "
+          f"{totals['errors']} errors)")
+    print(f"  upstream requests:  {upstream_requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--startups", type=int, default=5, help="app launches per simulated client")
+    parser.add_argument("--stations", type=int, default=200, help="stations per category in the catalog")
+    args = parser.parse_args()
+
+    with NetSimServer() as upstream:
+        upstream.catalog = default_catalog(upstream.base_url, categories=10, stations_per_category=args.stations)
+
+        latencies, totals, seconds = _run_clients(upstream.base_url, args.clients, args.startups)
+        _report("direct to upstream", latencies, totals, seconds, upstream.request_count())
+
+        before = upstream.request_count()
+        mirror = CatalogMirror(upstream.stations_url, upstream.update_url, host="127.0.0.1", port=0,
+                               refresh_seconds=2).start()
+        try:
+            latencies, totals, seconds = _run_clients(f"http://127.0.0.1:{mirror.port}", args.clients, args.startups)
+            upstream_requests = upstream.request_count() - before
+            _report(f"through the mirror (refresh every {mirror.refresh_seconds} s)", latencies, totals, seconds,
+                    upstream_requests)
+            print(f"  upstream reduction: {len(latencies) / max(upstream_requests, 1):.0f}x fewer requests")
+        finally:
+            mirror.stop()
+
+
+if __name__ == "__main__":
+    main()
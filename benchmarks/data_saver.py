@@ -0,0 +1,96 @@
+"""
+Bytes consumed with and without the data saver's bitrate cap.
+
+netsim serves an HLS master playlist with 32, 64, 128 and 256 kbps variants, and
+a station with mirrors at the same bitrates. Each case listens for a while at
+real-time pace to the rendition that would be played without a cap (the
+highest, which VLC's adaptive logic settles on over a good link) and to the one
+the data saver selects, then compares the bytes. The capped sessions are also
+fed through DataUsageTracker to show the report the app keeps.
+
+    python benchmarks/data_saver.py --cap 64 --seconds 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the user's real usage history out of reach.
+_HOME = tempfile.mkdtemp(prefix="amwaj-datasaver-")
+os.environ["HOME"] = os.environ["USERPROFILE"] = _HOME
+
+import requests
+
+from data_saver import DataUsageTracker, prefer_within_cap, select_hls_variant
+from netsim import NetSimServer
+from stations import station_bitrates, station_urls
+from task_executor import CancelToken
+
+BITRATES = (32, 64, 128, 256)
+
+
+def _listen(url, seconds):
+    received = 0
+    started = time.monotonic()
+    with requests.get(url, stream=True, timeout=10) as response:
+        for chunk in response.iter_content(chunk_size=4096):
+            received += len(chunk)
+            if time.monotonic() - started >= seconds:
+                break
+    return received
+
+
+class _FakePlayer:
+    """Stands in for Player.get_input_stats() with a fixed byte count."""
+
+    def __init__(self, read_bytes):
+        self.read_bytes = read_bytes
+
+    def get_input_stats(self):
+        return {"read_bytes": self.read_bytes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cap", type=int, default=64, help="data saver cap in kbps")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with NetSimServer() as server:
+        lines = ["#EXTM3U"]
+        for kbps in BITRATES:
+            lines += [f"#EXT-X-STREAM-INF:BANDWIDTH={kbps * 1000},CODECS=\"mp4a.40.2\"", f"/stream/hls-{kbps}?br={kbps}"]
+        server.documents["/hls/master.m3u8"] = ("\n".join(lines).encode("utf-8"), "application/vnd.apple.mpegurl")
+        station = {"name": "mirrors", "urls": [{"url": server.stream_url(f"mirror-{kbps}", br=kbps), "bitrate": kbps}
+                                              for kbps in reversed(BITRATES)]}
+
+        tracker = DataUsageTracker()
+        hls_url, hls_kbps, hls_highest = select_hls_variant(CancelToken(), f"{server.base_url}/hls/master.m3u8", args.cap)
+        mirror_urls, mirror_kbps, mirror_highest = prefer_within_cap(station_urls(station), station_bitrates(station),
+                                                                     args.cap)
+        cases = [
+            ("HLS variants", server.stream_url("hls-full", br=hls_highest), hls_url, "hls", hls_kbps, hls_highest),
+            ("bitrate mirrors", station_urls(station)[0], mirror_urls[0], "mirrors", mirror_kbps, mirror_highest),
+        ]
+        for label, full_url, capped_url, name, selected, highest in cases:
+            full = _listen(full_url, args.seconds)
+            tracker.note_selection(name, selected, highest)
+            tracker.on_player_event("opening", name, None, time.monotonic())
+            capped = _listen(capped_url, args.seconds)
+            tracker.sample(_FakePlayer(capped))
+            tracker.on_player_event("stopped", name, None, time.monotonic())
+            print(f"{label}:")
+            print(f"  without cap: {highest:4d} kbps, {full / 1024:8.0f} KB in {args.seconds:.0f} s")
+            print(f"  with cap:    {selected:4d} kbps, {capped / 1024:8.0f} KB in {args.seconds:.0f} s")
+            print(f"  reduction:   {(1 - capped / full) * 100:.0f}%")
+
+    report = tracker.get_report()
+    print(f"tracker: {report['today_bytes'] / 1024:.0f} KB used today, "
+          f"{report['estimated_bytes_saved'] / 1024:.0f} KB estimated saved")
+
+
+if __name__ == "__main__":
+    main()
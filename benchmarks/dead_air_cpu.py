@@ -0,0 +1,109 @@
+"""
+CPU cost of dead-air detection.
+
+The analysis benchmark feeds synthetic 8 kHz PCM through SilenceDetector in the
+small chunks libvlc hands to the audio callback. Each second of audio is half
+tone, half silence. It reports the CPU time per second of audio, i.e. the
+fraction of one core used at real time, next to a plain-Python RMS loop for
+comparison.
+
+With --live (needs libvlc), a DeadAirMonitor also listens to netsim WAV streams,
+one with a tone and one silent. It reports the process CPU used and how long the
+silent stream took to be flagged.
+
+    python benchmarks/dead_air_cpu.py --seconds 600 --live 20
+"""
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from dead_air import SAMPLE_RATE, BLOCK_SECONDS, SilenceDetector
+
+CHUNK_SAMPLES = 160  # 20 ms at 8 kHz, about what the audio callback receives
+
+
+def _synthetic_audio(seconds):
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    second = (np.sin(2 * np.pi * 440 * t) * 0.3 * 32767).astype(np.int16)
+    second[SAMPLE_RATE // 2:] = 0
+    return np.tile(second, seconds)
+
+
+def _python_levels(pcm):
+    """Per-sample RMS in plain Python, as a reference point for the vectorised version."""
+    block_size = int(SAMPLE_RATE * BLOCK_SECONDS)
+    samples = pcm.tolist()
+    levels = []
+    for start in range(0, len(samples) - block_size + 1, block_size):
+        total = 0
+        for value in samples[start:start + block_size]:
+            total += value * value
+        levels.append(math.sqrt(total / block_size))
+    return levels
+
+
+def analysis_benchmark(seconds):
+    pcm = _synthetic_audio(seconds)
+    chunks = [pcm[i:i + CHUNK_SAMPLES] for i in range(0, len(pcm), CHUNK_SAMPLES)]
+    detector = SilenceDetector(min_seconds=15)
+    started = time.process_time()
+    for chunk in chunks:
+        detector.feed(chunk)
+    vectorised = time.process_time() - started
+
+    reference_seconds = min(seconds, 30)
+    started = time.process_time()
+    _python_levels(pcm[:reference_seconds * SAMPLE_RATE])
+    python = (time.process_time() - started) / reference_seconds * seconds
+
+    print(f"analysis of {seconds} s of audio in {CHUNK_SAMPLES}-sample chunks:")
+    print(f"  numpy batches: {vectorised * 1000:8.1f} ms CPU, {vectorised / seconds * 100:.3f}% of a core at real time")
+    print(f"  plain Python:  {python * 1000:8.1f} ms CPU, {python / seconds * 100:.3f}% of a core at real time")
+
+
+def live_benchmark(seconds):
+    import vlc
+    from dead_air import DeadAirMonitor
+    from netsim import NetSimServer
+
+    instance = vlc.Instance("--no-video", "--quiet")
+    with NetSimServer() as server:
+        for label, url in (("tone", server.stream_url("tone", format="wav", tone=440)),
+                           ("silent", server.stream_url("silent", format="wav", tone=0))):
+            flagged = threading.Event()
+            monitor = DeadAirMonitor(instance, on_silence=lambda station, s: flagged.set(),
+                                     on_sound=lambda station, s: None, min_seconds=5)
+            started_wall, started_cpu = time.monotonic(), time.process_time()
+            monitor.start(url, label)
+            flagged.wait(seconds)
+            flagged_after = time.monotonic() - started_wall if flagged.is_set() else None
+            time.sleep(max(0.0, seconds - (time.monotonic() - started_wall)))
+            cpu = time.process_time() - started_cpu
+            levels = monitor.get_levels()
+            monitor.close()
+            wall = time.monotonic() - started_wall
+            print(f"live {label} stream for {wall:.0f} s (decoding included):")
+            print(f"  process CPU: {cpu / wall * 100:.2f}% of a core; last levels (rms, peak dBFS): {levels}")
+            print(f"  flagged as dead air: {f'after {flagged_after:.1f} s' if flagged_after is not None else 'no'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=600, help="seconds of synthetic audio to analyse")
+    parser.add_argument("--live", type=float, default=0, help="seconds to listen to each netsim stream (needs libvlc)")
+    args = parser.parse_args()
+
+    analysis_benchmark(args.seconds)
+    if args.live:
+        live_benchmark(args.live)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Time-to-audio of a multi-mirror station: trying mirrors one by one vs racing them.
+
+The netsim stand-in serves a dead mirror (connection refused), a mirror that answers
+only after a delay, one that sends headers but never audio, and a healthy one.
+The catalog lists the healthy mirror last, which is the worst case for sequential
+connection attempts. Since the player opens its own connection to the winning
+mirror, the race is timed up to the first bytes on that second connection. The
+report also gives how long the losing probes outlive each race: the stalled one
+is closed at once, while the slow one, still waiting for headers, ends when they arrive.
+
+    python benchmarks/mirror_race.py --rounds 5
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from netsim import NetSimServer
+from stations import probe_stream, race_connect
+from task_executor import CancelToken
+
+SLOW_DELAY_SECONDS = 2.0
+CONNECT_TIMEOUT_SECONDS = 4.0
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _sequential(urls):
+    started = time.monotonic()
+    for url in urls:
+        try:
+            probe_stream(url, CONNECT_TIMEOUT_SECONDS).close()
+            return time.monotonic() - started
+        except requests.exceptions.RequestException:
+            continue
+    return None
+
+
+def _race(urls, lingering):
+    started = time.monotonic()
+    url, _ = race_connect(CancelToken(), urls, timeout=CONNECT_TIMEOUT_SECONDS)
+    finished = time.monotonic()
+    # The player's own connection to the winner, as libvlc makes after the race.
+    probe_stream(url, CONNECT_TIMEOUT_SECONDS).close()
+    elapsed = time.monotonic() - started
+    while any(thread.name == "mirror-race" for thread in threading.enumerate()):
+        time.sleep(0.05)
+    lingering.append(time.monotonic() - finished)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    with NetSimServer() as server:
+        urls = [
+            f"http://127.0.0.1:{_unused_port()}/stream/dead",
+            server.stream_url("stalled", stall=CONNECT_TIMEOUT_SECONDS * 2),
+            server.stream_url("slow", latency=SLOW_DELAY_SECONDS),
+            server.stream_url("healthy"),
+        ]
+        sequential = [_sequential(urls) for _ in range(args.rounds)]
+        lingering = []
+        raced = [_race(urls, lingering) for _ in range(args.rounds)]
+
+    seq_ms = statistics.median(sequential) * 1000
+    race_ms = statistics.median(raced) * 1000
+    print(f"mirrors:              dead, stalled, slow ({SLOW_DELAY_SECONDS}s), healthy")
+    print(f"sequential (median):  {seq_ms:.0f} ms to first audio bytes")
+    print(f"race (median):        {race_ms:.0f} ms to first audio bytes, including the player's reconnect")
+    print(f"losing probes closed: {statistics.median(lingering) * 1000:.0f} ms after the race (median)")
+    print(f"improvement:          {seq_ms - race_ms:.0f} ms ({seq_ms / max(race_ms, 1e-3):.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Deterministic load test of StationLoader, UpdateChecker and Player against netsim.
+
+Each scenario applies one network fault to the stand-in server and runs many
+concurrent loaders, reporting latency percentiles and how often the cache
+fallback or error paths were taken. Player time-to-audio is measured too when
+python-vlc and libvlc are available.
+
+    python benchmarks/netsim_loadtest.py --clients 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the user's real settings and station cache out of reach.
+_HOME = tempfile.mkdtemp(prefix="amwaj-loadtest-")
+os.environ["HOME"] = os.environ["USERPROFILE"] = _HOME
+
+from netsim import FaultProfile, NetSimServer, default_catalog
+from task_executor import CancelToken
+from threads import StationLoader, StationLoadError, UpdateChecker
+
+SCENARIOS = [
+    ("clean", FaultProfile()),
+    ("latency 500ms", FaultProfile(latency=0.5)),
+    ("bandwidth 64KB/s", FaultProfile(bandwidth=64 * 1024)),
+    ("HTTP 503", FaultProfile(status=503)),
+    ("disconnect mid-body", FaultProfile(disconnect_after=2048)),
+]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _run_concurrently(job, clients):
+    results = []
+    lock = threading.Lock()
+
+    def run():
+        started = time.monotonic()
+        try:
+            outcome = job(CancelToken())
+        except Exception as e:
+            outcome = e
+        with lock:
+            results.append((time.monotonic() - started, outcome))
+
+    threads = [threading.Thread(target=run) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _report(name, results, classify):
+    durations = [duration for duration, _ in results]
+    counts = {}
+    for _, outcome in results:
+        label = classify(outcome)
+        counts[label] = counts.get(label, 0) + 1
+    outcome_text = ", ".join(f"{label}: {count}" for label, count in sorted(counts.items()))
+    print(f"  {name:<22} p50 {statistics.median(durations) * 1000:7.0f} ms   "
+          f"p95 {_percentile(durations, 0.95) * 1000:7.0f} ms   {outcome_text}")
+
+
+def _classify_stations(outcome):
+    if isinstance(outcome, StationLoadError):
+        return "failed"
+    if isinstance(outcome, Exception):
+        return type(outcome).__name__
+    return "cache" if outcome[1] else "network"
+
+
+def _classify_update(outcome):
+    if isinstance(outcome, Exception):
+        return type(outcome).__name__
+    return "update offered" if outcome else "no update"
+
+
+def _player_time_to_audio(server, plays):
+    try:
+        import vlc
+        instance = vlc.Instance("--quiet", "--no-video", "--aout=dummy")
+    except Exception as e:
+        print(f"  Player: skipped, libvlc unavailable ({e})")
+        return
+
+    from player import Player
+    player = Player(instance)
+    playing = threading.Event()
+    player.add_event_listener(lambda name, *args: playing.set() if name == "playing" else None)
+    timings = []
+    for i in range(plays):
+        playing.clear()
+        started = time.monotonic()
+        player.play(server.stream_url(f"player-{i}"), station_key=f"player-{i}")
+        if playing.wait(15):
+            timings.append(time.monotonic() - started)
+        player.stop()
+    if timings:
+        print(f"  Player time-to-audio   p50 {statistics.median(timings) * 1000:7.0f} ms   "
+              f"({len(timings)}/{plays} streams started)")
+    else:
+        print("  Player: no stream reached the playing state")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--stations", type=int, default=200, help="stations per category in the catalog")
+    parser.add_argument("--plays", type=int, default=5)
+    args = parser.parse_args()
+
+    with NetSimServer() as server:
+        server.catalog = default_catalog(server.base_url, categories=10, stations_per_category=args.stations)
+        # Prime the cache once so fallback paths have something to fall back to.
+        StationLoader(server.stations_url)(CancelToken())
+
+        for name, fault in SCENARIOS:
+            server.clear_faults()
+            server.set_fault("/radio.json", fault)
+            server.set_fault("/version.json", fault)
+            print(f"{name}:")
+            _report("StationLoader", _run_concurrently(StationLoader(server.stations_url), args.clients),
+                    _classify_stations)
+            _report("UpdateChecker", _run_concurrently(UpdateChecker("0.1", server.update_url), args.clients),
+                    _classify_update)
+
+        server.clear_faults()
+        print("playback:")
+        _player_time_to_audio(server, args.plays)
+        print(f"server: {server.request_count()} requests served")
+
+
+if __name__ == "__main__":
+    main()
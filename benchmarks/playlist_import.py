@@ -0,0 +1,105 @@
+"""
+Throughput of the bulk playlist importer.
+
+Writes playlists of --entries stations as M3U, PLS, JSON Lines and a JSON
+catalog. About 10% of the entries repeat an earlier URL in a different
+spelling (case, default port, fragment) and 1% are already in the catalog. Each
+file is imported into an empty store. The report gives entries per second, the
+duplicates caught, and the peak Python memory traced during a second run, to
+show that the file is streamed rather than loaded whole.
+
+    python benchmarks/playlist_import.py --entries 100000
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playlist_import import PlaylistImporter
+from task_executor import CancelToken
+
+CATALOG_SIZE = 1000
+
+
+def _entries(count):
+    """Yields (name, url, group) with deliberate duplicates and catalog overlaps."""
+    for i in range(count):
+        group = f"Group {i % 50}"
+        if i % 100 == 99:
+            yield f"Catalog copy {i}", f"http://catalog.example/stream/{i % CATALOG_SIZE}", group
+        elif i % 10 == 9:
+            # The same stream as an earlier entry, spelled differently.
+            yield f"Duplicate {i}", f"HTTP://Host{(i - 9) % 997}.Example:80/live/{i - 9}#dup", group
+        else:
+            yield f"Station {i}", f"http://host{i % 997}.example/live/{i}", group
+
+
+def write_playlists(directory, count):
+    paths = {}
+    paths["m3u"] = os.path.join(directory, "stations.m3u")
+    with open(paths["m3u"], "w", encoding="utf-8") as f:
+        f.write("#EXTM3U\n")
+        for name, url, group in _entries(count):
+            f.write(f'#EXTINF:-1 group-title="{group}",{name}\n{url}\n')
+    paths["pls"] = os.path.join(directory, "stations.pls")
+    with open(paths["pls"], "w", encoding="utf-8") as f:
+        f.write("[playlist]\n")
+        for i, (name, url, group) in enumerate(_entries(count), 1):
+            f.write(f"File{i}={url}\nTitle{i}={name}\nLength{i}=-1\n")
+        f.write(f"NumberOfEntries={count}\nVersion=2\n")
+    paths["jsonl"] = os.path.join(directory, "stations.jsonl")
+    with open(paths["jsonl"], "w", encoding="utf-8") as f:
+        for name, url, group in _entries(count):
+            f.write(json.dumps({"name": name, "url": url, "category": group}) + "\n")
+    paths["json"] = os.path.join(directory, "stations.json")
+    with open(paths["json"], "w", encoding="utf-8") as f:
+        f.write('{"categories": [\n')
+        for i, (name, url, group) in enumerate(_entries(count)):
+            # One small category per 100 entries, like an exported catalog.
+            if i % 100 == 0:
+                f.write(("" if i == 0 else "]},\n") + json.dumps({"name": group})[:-1] + ', "stations": [')
+            else:
+                f.write(",")
+            f.write(json.dumps({"name": name, "url": url}))
+        f.write("]}\n]}\n")
+    return paths
+
+
+def _import(path, catalog, store_path):
+    if os.path.exists(store_path):
+        os.remove(store_path)
+    return PlaylistImporter(path, catalog, store_path=store_path)(CancelToken())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    args = parser.parse_args()
+
+    catalog = [{"name": "Catalog", "stations": [{"name": f"Catalog {i}", "url": f"http://catalog.example/stream/{i}"}
+                                                for i in range(CATALOG_SIZE)]}]
+    directory = tempfile.mkdtemp(prefix="amwaj-import-")
+    try:
+        paths = write_playlists(directory, args.entries)
+        store_path = os.path.join(directory, "imported.jsonl")
+        for label, path in paths.items():
+            report = _import(path, catalog, store_path)
+            tracemalloc.start()
+            _import(path, catalog, store_path)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:5s} ({os.path.getsize(path) / 1e6:5.1f} MB): {report['entries']} entries in "
+                  f"{report['seconds']:.2f} s = {report['entries_per_second']:,} entries/s; "
+                  f"{report['imported']} imported, {report['duplicates']} duplicates, {report['invalid']} invalid; "
+                  f"store {os.path.getsize(store_path) / 1e6:.1f} MB; peak traced memory {peak / 1e6:.1f} MB")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
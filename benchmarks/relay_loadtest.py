@@ -0,0 +1,93 @@
+"""
+Load test for the LAN relay.
+
+Starts a netsim stand-in stream, a StationRelay in front of it and many simulated
+listeners (a few of them deliberately too slow), then reports client counts,
+throughput and upstream bandwidth saved.
+
+    python benchmarks/relay_loadtest.py --listeners 200 --duration 20
+"""
+import argparse
+import os
+import sys
+import socket
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netsim import NetSimServer
+from relay import StationRelay, relay_stream_url
+
+
+def _listener(url, duration, slow, results):
+    received = 0
+    deadline = time.monotonic() + duration
+    parsed = urllib.parse.urlsplit(url)
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            if slow:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            sock.settimeout(15)
+            sock.connect((parsed.hostname, parsed.port))
+            sock.sendall(f"GET {parsed.path} HTTP/1.0\r\nHost: {parsed.netloc}\r\n\r\n".encode("ascii"))
+            while time.monotonic() < deadline:
+                data = sock.recv(1024 if slow else 16384)
+                if not data:
+                    break
+                received += len(data)
+                if slow:
+                    time.sleep(1.0)
+    except OSError:
+        pass
+    results.append((slow, received, time.monotonic() < deadline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listeners", type=int, default=100)
+    parser.add_argument("--slow", type=int, default=5, help="listeners that read too slowly")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--bitrate", type=int, default=128)
+    args = parser.parse_args()
+
+    upstream = NetSimServer().start()
+    upstream_url = upstream.stream_url("live", br=args.bitrate)
+
+    relay = StationRelay("127.0.0.1", 0, client_buffer_chunks=16)
+    relay.register_station(upstream_url, "stand-in")
+    relay.start()
+    url = relay_stream_url(f"http://127.0.0.1:{relay.port}", upstream_url)
+
+    results = []
+    threads = []
+    for i in range(args.listeners):
+        thread = threading.Thread(target=_listener, args=(url, args.duration, i < args.slow, results), daemon=True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join(args.duration + 20)
+
+    stats = relay.get_stats()
+    relay.stop()
+    upstream_requests = upstream.request_count("/stream/live")
+    upstream.stop()
+
+    fast = [r for r in results if not r[0]]
+    slow = [r for r in results if r[0]]
+    expected = args.bitrate * 1000 / 8 * args.duration
+    print(f"listeners:            {args.listeners} ({args.slow} slow)")
+    print(f"peak clients:         {stats['peak_clients']}")
+    print(f"dropped clients:      {stats['dropped_clients']} (of {len(slow)} slow listeners)")
+    print(f"avg bytes/listener:   {sum(r[1] for r in fast) / max(len(fast), 1):.0f} (real-time would be ~{expected:.0f})")
+    print(f"upstream requests:    {upstream_requests}")
+    print(f"upstream bytes in:    {stats['bytes_in']}")
+    print(f"bytes served:         {stats['bytes_out']}")
+    print(f"upstream bytes saved: {stats['upstream_bytes_saved']} "
+          f"({stats['bytes_out'] / max(stats['bytes_in'], 1):.1f}x fan-out)")
+    print(f"throughput out:       {stats['throughput_out_bps'] / 1e6:.2f} Mbit/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Soak test: thousands of play/stop/zap/volume cycles, watching for leaks.
+
+Drives the in-process Player and the SoundManager headlessly against netsim
+streams (every tenth station answers 503, to exercise the error path too) and,
+with --popups, the announcement popup. The process's RSS, open handles and
+Python object count are sampled as it goes. After a warm-up, the samples are
+split into windows; a metric fails when its window medians keep rising and the
+total rise is over the threshold. The exit status is 1 on failure. Needs libvlc;
+--popups also needs wxPython and a display.
+
+    python benchmarks/soak.py --cycles 5000 --dwell 0.05
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import vlc
+
+from netsim import NetSimServer
+from player import Player
+from sound_manager import SoundManager
+
+STATIONS = 20
+SOUNDS = ("navigate", "play_station", "stop_station")
+WINDOWS = 4
+# name: (unit divisor, unit label)
+METRICS = {"rss": (1024 * 1024, "MB"), "handles": (1, ""), "objects": (1, "")}
+
+
+def _process_sample():
+    """Returns (rss_bytes, open_handles); either is None when it cannot be read on this platform."""
+    if psutil:
+        process = psutil.Process()
+        handles = process.num_handles() if hasattr(process, "num_handles") else process.num_fds()
+        return process.memory_info().rss, handles
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        return rss, len(os.listdir("/proc/self/fd"))
+    except (OSError, ValueError):
+        return None, None
+
+
+def take_sample(cycle):
+    gc.collect()
+    rss, handles = _process_sample()
+    return {"cycle": cycle, "rss": rss, "handles": handles, "objects": len(gc.get_objects())}
+
+
+def detect_growth(samples, thresholds, warmup=0.2):
+    """
+    Returns {metric: (rise, window_medians, failed)} over the samples after the warm-up.
+    A rise only counts as a leak when it is sustained: every window median is at
+    least the one before, so a one-off allocation that stays flat does not fail.
+    """
+    steady = samples[int(len(samples) * warmup):]
+    size = len(steady) // WINDOWS
+    results = {}
+    if size < 1:
+        return results
+    for metric, threshold in thresholds.items():
+        values = [sample[metric] for sample in steady]
+        if None in values:
+            continue
+        medians = [statistics.median(values[i * size:(i + 1) * size]) for i in range(WINDOWS)]
+        rise = medians[-1] - medians[0]
+        sustained = all(later >= earlier for earlier, later in zip(medians, medians[1:]))
+        results[metric] = (rise, medians, sustained and rise > threshold)
+    return results
+
+
+class _Popups:
+    """Shows an announcement per cycle through a reused TimedPopup, as the main window does."""
+
+    def __init__(self):
+        import wx
+        from popup_window import TimedPopup
+
+        self._wx = wx
+        self._popup_class = TimedPopup
+        self.app = wx.App(False)
+        self.frame = wx.Frame(None, title="soak")
+        self.frame.Show()
+        self.popup = None
+
+    def announce(self, message):
+        if self.popup:
+            self.popup.show_message(message, duration_ms=50)
+        else:
+            self.popup = self._popup_class(self.frame, message, duration_ms=50)
+        self._wx.Yield()
+
+    def close(self):
+        self.frame.Destroy()
+        self._wx.Yield()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cycles", type=int, default=5000)
+    parser.add_argument("--dwell", type=float, default=0.05, help="seconds to stay on a station before the next step")
+    parser.add_argument("--sample-every", type=int, default=50, help="cycles between samples")
+    parser.add_argument("--popups", action="store_true", help="also cycle the announcement popup (needs a display)")
+    parser.add_argument("--max-rss-mb", type=float, default=16, help="allowed sustained RSS rise")
+    parser.add_argument("--max-handles", type=int, default=20, help="allowed sustained rise in open handles")
+    parser.add_argument("--max-objects", type=int, default=2000, help="allowed sustained rise in Python objects")
+    args = parser.parse_args()
+
+    events = {}
+    events_lock = threading.Lock()
+
+    def count_event(name, station_key, data, timestamp):
+        with events_lock:
+            events[name] = events.get(name, 0) + 1
+
+    with NetSimServer() as server:
+        urls = [server.stream_url(f"soak-{i}", status=503) if i % 10 == 9 else server.stream_url(f"soak-{i}")
+                for i in range(STATIONS)]
+        instance = vlc.Instance("--no-video", "--aout=adummy", "--quiet")
+        player = Player(instance)
+        player.add_event_listener(count_event)
+        sounds = SoundManager(media_base_url=server.media_url)
+        popups = _Popups() if args.popups else None
+
+        samples = [take_sample(0)]
+        started = time.monotonic()
+        try:
+            for cycle in range(1, args.cycles + 1):
+                station = cycle % STATIONS
+                player.play(urls[station], station_key=f"soak-{station}")
+                sounds.play(SOUNDS[cycle % len(SOUNDS)])
+                time.sleep(args.dwell)
+                player.get_input_stats()
+                player.set_volume(cycle % 101)
+                if cycle % 5 == 0:
+                    player.stop()
+                if popups:
+                    popups.announce(f"تشغيل: soak-{station}")
+                if cycle % args.sample_every == 0:
+                    samples.append(take_sample(cycle))
+                    latest = samples[-1]
+                    print(f"\r{cycle}/{args.cycles} cycles, rss {(latest['rss'] or 0) / (1024 * 1024):.1f} MB, "
+                          f"handles {latest['handles']}, objects {latest['objects']}", end="", flush=True)
+        finally:
+            player.stop()
+            if popups:
+                popups.close()
+        elapsed = time.monotonic() - started
+        print()
+
+    print(f"{args.cycles} cycles in {elapsed:.0f} s; player events: {dict(sorted(events.items()))}")
+    thresholds = {"rss": args.max_rss_mb * 1024 * 1024, "handles": args.max_handles, "objects": args.max_objects}
+    failed = False
+    for metric, (rise, medians, leaking) in detect_growth(samples, thresholds).items():
+        divisor, unit = METRICS[metric]
+        trend = " -> ".join(f"{median / divisor:.1f}" for median in medians)
+        print(f"  {metric:8s} {'LEAK' if leaking else 'ok':4s}  window medians {trend} {unit} "
+              f"(rise {rise / divisor:.1f}, allowed {thresholds[metric] / divisor:.1f})")
+        failed = failed or leaking
+    if not events.get("playing"):
+        print("  the player never reached 'playing'; is libvlc working?")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
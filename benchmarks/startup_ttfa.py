@@ -0,0 +1,89 @@
+"""
+Time from launching the app to first audio, with "play last station on startup".
+
+The app is started against netsim with a fresh profile, in two configurations:
+  by-name  only `last_station_name` is saved (how earlier versions stored it), so
+           playback waits for the catalog to load and the tree to be searched;
+  saved    `last_station` holds the station's URLs, so playback starts as soon as
+           the player exists, while the catalog loads.
+The catalog is served with an added latency to model a slow network. Each launch
+reports when netsim saw the stream request and the app's own "Startup time to
+first audio" log line. Needs wxPython and libvlc.
+
+    python benchmarks/startup_ttfa.py --runs 3 --catalog-latency 1.5
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from netsim import FaultProfile, NetSimServer
+
+STATION_NAME = "Station 1-1"
+TIMEOUT_SECONDS = 30
+_LOG_PATTERN = re.compile(r"Startup time to first audio: (\d+)ms")
+
+
+def _launch(server, mode):
+    profile = tempfile.mkdtemp(prefix="amwaj-startup-")
+    settings = {"play_on_startup": True, "check_for_updates": False, "last_station_name": STATION_NAME}
+    if mode == "saved":
+        settings["last_station"] = {"name": STATION_NAME, "urls": [server.stream_url("s0-0")]}
+    with open(os.path.join(profile, "stv_radio_settings.json"), "w", encoding="utf-8") as f:
+        json.dump(settings, f)
+
+    env = dict(os.environ, HOME=profile, USERPROFILE=profile, **server.environment())
+    streams_before = server.request_count("/stream/s0-0")
+    started = time.monotonic()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "radio_app.py")], cwd=profile, env=env)
+    stream_requested = logged = None
+    try:
+        while time.monotonic() - started < TIMEOUT_SECONDS and logged is None:
+            if stream_requested is None and server.request_count("/stream/s0-0") > streams_before:
+                stream_requested = time.monotonic() - started
+            log_path = os.path.join(profile, "radio_app.log")
+            if os.path.exists(log_path):
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    match = _LOG_PATTERN.search(f.read())
+                if match:
+                    logged = int(match.group(1)) / 1000
+            time.sleep(0.01)
+    finally:
+        process.kill()
+        process.wait()
+        shutil.rmtree(profile, ignore_errors=True)
+    return stream_requested, logged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--catalog-latency", type=float, default=1.5, help="seconds added to the catalog fetch")
+    args = parser.parse_args()
+
+    with NetSimServer() as server:
+        server.set_fault("/radio.json", FaultProfile(latency=args.catalog_latency))
+        for mode in ("by-name", "saved"):
+            results = [_launch(server, mode) for _ in range(args.runs)]
+            requested = [r[0] for r in results if r[0] is not None]
+            logged = [r[1] for r in results if r[1] is not None]
+            print(f"{mode}:")
+            if requested:
+                print(f"  stream requested:  median {statistics.median(requested) * 1000:6.0f} ms after launch")
+            if logged:
+                print(f"  first audio (app): median {statistics.median(logged) * 1000:6.0f} ms after start of radio_app")
+            if len(logged) < args.runs:
+                print(f"  {args.runs - len(logged)} of {args.runs} runs did not reach first audio")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Bytes transferred by an update: full release vs per-file manifest, and resume after drops.
+
+A synthetic release (an executable plus a large plugins tree) is served by netsim.
+The "installed" copy differs from the new release only in the executable, as with
+a Python-only change. A second run downloads the same update over a connection
+that drops every few hundred kilobytes, which the Range resume has to ride out.
+
+    python benchmarks/update_download.py --plugins-mb 120
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from netsim import FaultProfile, NetSimServer
+from task_executor import CancelToken
+from updater import UpdateDownloader, apply_staged_update, build_manifest, file_sha256
+
+PLUGIN_FILE_SIZE = 1024 * 1024
+
+
+def _write_release(root, executable_seed, plugins_mb):
+    os.makedirs(os.path.join(root, "plugins"), exist_ok=True)
+    with open(os.path.join(root, "radio_app.exe"), "wb") as f:
+        f.write(executable_seed * (4 * 1024 * 1024 // len(executable_seed)))
+    for i in range(plugins_mb):
+        with open(os.path.join(root, "plugins", f"plugin_{i:03d}.dll"), "wb") as f:
+            f.write(hashlib.sha256(str(i).encode()).digest() * (PLUGIN_FILE_SIZE // 32))
+
+
+def _publish(server, release_dir, version_string):
+    manifest = build_manifest(release_dir, version_string, f"{server.base_url}/release/")
+    for path in manifest["files"]:
+        with open(os.path.join(release_dir, path), "rb") as f:
+            server.documents[f"/release/{path}"] = (f.read(), "application/octet-stream")
+    body = json.dumps(manifest).encode("utf-8")
+    server.documents["/release/manifest.json"] = (body, "application/json")
+    return f"{server.base_url}/release/manifest.json", hashlib.sha256(body).hexdigest(), manifest
+
+
+def _run(server, manifest_url, manifest_sha256, install_dir, staging_dir):
+    started = time.monotonic()
+    result = UpdateDownloader(manifest_url, manifest_sha256, install_dir, staging_dir)(CancelToken())
+    return result, time.monotonic() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plugins-mb", type=int, default=120)
+    parser.add_argument("--drop-kb", type=int, default=512, help="connection drop interval for the resume run")
+    args = parser.parse_args()
+    # The resume run logs every interruption; only the summary matters here.
+    logging.basicConfig(level=logging.ERROR)
+
+    work = tempfile.mkdtemp(prefix="amwaj-update-bench-")
+    try:
+        release_dir = os.path.join(work, "release")
+        _write_release(release_dir, b"new build ", args.plugins_mb)
+
+        with NetSimServer() as server:
+            manifest_url, manifest_sha256, manifest = _publish(server, release_dir, "9.9")
+            full_size = sum(entry["size"] for entry in manifest["files"].values())
+
+            for label, fault in (("clean", None), (f"drop every {args.drop_kb} KB", FaultProfile(disconnect_after=args.drop_kb * 1024))):
+                install_dir = os.path.join(work, "installed")
+                staging_dir = os.path.join(work, "staging")
+                shutil.rmtree(install_dir, ignore_errors=True)
+                _write_release(install_dir, b"old build ", args.plugins_mb)
+                server.clear_faults()
+                if fault:
+                    server.set_fault("/release/radio_app.exe", fault)
+                requests_before = server.request_count()
+
+                result, seconds = _run(server, manifest_url, manifest_sha256, install_dir, staging_dir)
+                apply_staged_update(install_dir, staging_dir)
+                verified = file_sha256(os.path.join(install_dir, "radio_app.exe")) == manifest["files"]["radio_app.exe"]["sha256"]
+
+                print(f"{label}:")
+                print(f"  full release:       {full_size / 1e6:8.1f} MB in {len(manifest['files'])} files")
+                print(f"  transferred:        {result['bytes_transferred'] / 1e6:8.1f} MB in "
+                      f"{result['files_changed']} file(s), {server.request_count() - requests_before} requests, {seconds:.2f} s")
+                print(f"  saved:              {(1 - result['bytes_transferred'] / full_size) * 100:8.1f} %")
+                print(f"  installed verified: {verified}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from packaging import version
+
+REFRESH_SECONDS = 300
+# How long clients and proxies may reuse a response without asking again.
+MAX_AGE_SECONDS = 300
+
+
+class CatalogError(Exception):
+    """Raised when an upstream document fails validation."""
+
+
+def normalize_catalog(data):
+    """
+    Validates a station catalog and returns a cleaned copy: names and URLs are
+    trimmed, stations without a name or any URL and duplicate stations are
+    dropped, and empty categories are removed. Unknown station fields are kept.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("categories"), list):
+        raise CatalogError("The catalog has no category list.")
+    categories = []
+    for category in data["categories"]:
+        if not isinstance(category, dict) or not isinstance(category.get("stations"), list):
+            continue
+        stations = []
+        seen = set()
+        for station in category["stations"]:
+            if not isinstance(station, dict):
+                continue
+            name = str(station.get("name") or "").strip()
+            url = str(station.get("url") or "").strip()
+            mirrors = [entry for entry in station.get("urls", []) if isinstance(entry, (str, dict))]
+            if not name or not (url or mirrors) or (name, url) in seen:
+                continue
+            seen.add((name, url))
+            cleaned = dict(station, name=name)
+            if url:
+                cleaned["url"] = url
+            else:
+                cleaned.pop("url", None)
+            stations.append(cleaned)
+        if stations:
+            categories.append({"name": str(category.get("name") or "").strip(), "stations": stations})
+    if not categories:
+        raise CatalogError("The catalog has no playable stations.")
+    return {"categories": categories}
+
+
+def normalize_version(data):
+    """Validates the update manifest (version.json) and returns it unchanged apart from trimming."""
+    if not isinstance(data, dict):
+        raise CatalogError("The version manifest is not an object.")
+    latest = str(data.get("latest_version") or "").strip()
+    try:
+        version.Version(latest)
+    except version.InvalidVersion:
+        raise CatalogError(f"Invalid latest_version: {latest!r}")
+    if not str(data.get("download_url") or "").startswith(("http://", "https://")):
+        raise CatalogError("The version manifest has no download_url.")
+    return dict(data, latest_version=latest)
+
+
+class _Document:
+    """A served document, pre-encoded once so every request is a plain write."""
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.gzip_body = gzip.compress(self.body, compresslevel=9)
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+        self.updated_at = time.time()
+
+
+class _MirrorServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _MirrorRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        mirror = self.server.mirror
+        path = self.path.split("?")[0]
+        if path == "/status":
+            body = json.dumps(mirror.get_stats()).encode("utf-8")
+            self._send(200, body, {"Content-Type": "application/json", "Cache-Control": "no-cache"})
+            return
+        document = mirror.get_document(path)
+        if document is None:
+            mirror.count("not_found")
+            self._send(404, b"", {})
+            return
+
+        headers = {
+            "Content-Type": "application/json; charset=utf-8",
+            "ETag": document.etag,
+            "Cache-Control": f"public, max-age={mirror.max_age}",
+            "Vary": "Accept-Encoding",
+        }
+        if self.headers.get("If-None-Match") == document.etag:
+            mirror.count("not_modified")
+            self._send(304, b"", headers)
+            return
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            mirror.count("gzip")
+            headers["Content-Encoding"] = "gzip"
+            body = document.gzip_body
+        else:
+            body = document.body
+        mirror.count("full", len(body))
+        self._send(200, body, headers)
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Catalog mirror: {self.address_string()} {format % args}")
+
+
+class CatalogMirror:
+    """
+    Serves the station catalog and the update manifest on behalf of an upstream.
+
+    Both documents are fetched upstream every `refresh_seconds` with conditional
+    requests, validated and normalized, then served from memory at /radio.json and
+    /version.json with an ETag, gzip and Cache-Control. If a refresh fails or a
+    new document does not validate, the last good copy keeps being served.
+    """
+
+    def __init__(self, stations_url, update_url, host="0.0.0.0", port=8801,
+                 refresh_seconds=REFRESH_SECONDS, max_age=MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self.refresh_seconds = refresh_seconds
+        self._upstreams = {
+            "/radio.json": (stations_url, normalize_catalog),
+            "/version.json": (update_url, normalize_version),
+        }
+        self._documents = {}
+        self._upstream_etags = {}
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "full": 0, "gzip": 0, "not_modified": 0, "not_found": 0, "bytes_out": 0,
+                       "upstream_fetches": 0, "upstream_not_modified": 0, "upstream_errors": 0, "rejected": 0}
+        self._stop = threading.Event()
+        self._session = requests.Session()
+        self._server = _MirrorServer((host, port), _MirrorRequestHandler)
+        self._server.mirror = self
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self.refresh()
+        threading.Thread(target=self._refresh_loop, name="catalog-mirror-refresh", daemon=True).start()
+        threading.Thread(target=self._server.serve_forever, name="catalog-mirror", daemon=True).start()
+        logging.info(f"Catalog mirror listening on port {self.port}.")
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def refresh(self):
+        for path, (url, normalize) in self._upstreams.items():
+            self._refresh_document(path, url, normalize)
+
+    def _refresh_document(self, path, url, normalize):
+        headers = {}
+        with self._lock:
+            if path in self._upstream_etags and path in self._documents:
+                headers["If-None-Match"] = self._upstream_etags[path]
+            self._stats["upstream_fetches"] += 1
+        try:
+            response = self._session.get(url, headers=headers, timeout=15)
+            if response.status_code == 304:
+                with self._lock:
+                    self._stats["upstream_not_modified"] += 1
+                return
+            response.raise_for_status()
+            document = _Document(normalize(response.json()))
+        except (requests.exceptions.RequestException, ValueError, CatalogError) as e:
+            with self._lock:
+                self._stats["rejected" if isinstance(e, CatalogError) else "upstream_errors"] += 1
+            logging.warning(f"Catalog mirror could not refresh {url}: {e}")
+            return
+        with self._lock:
+            previous = self._documents.get(path)
+            if previous is None or previous.etag != document.etag:
+                self._documents[path] = document
+            if response.headers.get("ETag"):
+                self._upstream_etags[path] = response.headers["ETag"]
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_seconds):
+            self.refresh()
+
+    def get_document(self, path):
+        with self._lock:
+            self._stats["requests"] += 1
+            return self._documents.get(path)
+
+    def count(self, name, bytes_out=0):
+        with self._lock:
+            self._stats[name] += 1
+            self._stats["bytes_out"] += bytes_out
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["documents"] = {path: {"etag": document.etag, "bytes": len(document.body),
+                                         "gzip_bytes": len(document.gzip_body), "updated_at": document.updated_at}
+                                  for path, document in self._documents.items()}
+        return stats
+
+
+def main():
+    """Runs a standalone catalog mirror."""
+    from constants import STATIONS_URL, UPDATE_URL
+
+    parser = argparse.ArgumentParser(description="Amwaj catalog mirror")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8801)
+    parser.add_argument("--stations-url", default=STATIONS_URL)
+    parser.add_argument("--update-url", default=UPDATE_URL)
+    parser.add_argument("--refresh", type=int, default=REFRESH_SECONDS, help="seconds between upstream refreshes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    mirror = CatalogMirror(args.stations_url, args.update_url, args.host, args.port, args.refresh).start()
+    try:
+        while True:
+            time.sleep(60)
+            logging.info(f"Catalog mirror stats: {mirror.get_stats()}")
+    except KeyboardInterrupt:
+        mirror.stop()
+
+
+if __name__ == "__main__":
+    main()
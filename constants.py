@@ -1,7 +1,21 @@
+import os
+
 # --- Configuration ---
 CURRENT_VERSION = "0.5"
 UPDATE_URL = "https://raw.githubusercontent.com/errachedy-crypto/playe-radio-aswatalweb/main/version.json"
 STATIONS_URL = "https://aswatalweb.com/radio/radio.json"
+MEDIA_BASE_URL = "https://aswatalweb.com/radio/media"
+
+# Point every endpoint at a local stand-in server (see the netsim package) for
+# offline testing, or override them one by one.
+_NETSIM_URL = os.environ.get("AMWAJ_NETSIM_URL")
+if _NETSIM_URL:
+    UPDATE_URL = f"{_NETSIM_URL}/version.json"
+    STATIONS_URL = f"{_NETSIM_URL}/radio.json"
+    MEDIA_BASE_URL = f"{_NETSIM_URL}/media"
+UPDATE_URL = os.environ.get("AMWAJ_UPDATE_URL", UPDATE_URL)
+STATIONS_URL = os.environ.get("AMWAJ_STATIONS_URL", STATIONS_URL)
+MEDIA_BASE_URL = os.environ.get("AMWAJ_MEDIA_URL", MEDIA_BASE_URL)
 
 # --- Themes ---
 THEMES = {
@@ -0,0 +1,231 @@
+import json
+import logging
+import re
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+from settings import get_data_usage_path, load_json_file, save_json_file
+
+# Passed to VLC's adaptive (HLS/DASH) module when the variant list could not be read.
+LOWEST_VARIANT_OPTION = ":adaptive-logic=lowest"
+HISTORY_DAYS = 31
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+SESSION_HISTORY = 50
+
+_STREAM_INF = re.compile(r"#EXT-X-STREAM-INF:(.*)")
+_BANDWIDTH = re.compile(r"(?:^|,)BANDWIDTH=(\d+)")
+
+
+def is_hls(url):
+    return urlsplit(url).path.lower().endswith(".m3u8")
+
+
+def parse_hls_variants(text, base_url):
+    """Returns [(bandwidth_bps, url)] from an HLS master playlist, or [] for a media playlist."""
+    variants = []
+    pending = None
+    for line in text.splitlines():
+        line = line.strip()
+        match = _STREAM_INF.match(line)
+        if match:
+            bandwidth = _BANDWIDTH.search(match.group(1))
+            pending = int(bandwidth.group(1)) if bandwidth else None
+        elif line and not line.startswith("#") and pending is not None:
+            variants.append((pending, urljoin(base_url, line)))
+            pending = None
+    return variants
+
+
+def select_variant(variants, cap_kbps):
+    """Picks the best variant within the cap, or the lowest one if none fits."""
+    cap_bps = cap_kbps * 1000
+    within = [variant for variant in variants if variant[0] <= cap_bps]
+    if within:
+        return max(within)
+    return min(variants)
+
+
+def select_hls_variant(token, url, cap_kbps):
+    """
+    Resolves an HLS master playlist to the variant that fits `cap_kbps`, so VLC plays
+    that rendition instead of switching up on its own. Runs on a TaskExecutor.
+    Returns (url, selected_kbps, highest_kbps); the kbps are None if unknown.
+    """
+    try:
+        response = requests.get(url, timeout=10)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"Could not read the HLS variant list of {url}: {e}")
+        return url, None, None
+    token.raise_if_cancelled()
+    variants = parse_hls_variants(response.text, response.url)
+    if not variants:
+        return url, None, None
+    bandwidth, variant_url = select_variant(variants, cap_kbps)
+    highest = max(variants)[0]
+    logging.info(f"Data saver picked the {bandwidth // 1000} kbps variant of {len(variants)} "
+                 f"(highest {highest // 1000} kbps).")
+    return variant_url, bandwidth // 1000, highest // 1000
+
+
+def prefer_within_cap(urls, bitrates, cap_kbps):
+    """
+    Narrows a station's mirrors to those whose known bitrate fits the cap, best first.
+    Returns (urls, selected_kbps, highest_kbps). Mirrors are left alone when none is
+    known to fit, since an unknown bitrate may well be acceptable.
+    """
+    known = {url: bitrates[url] for url in urls if url in bitrates}
+    highest = max(known.values()) if known else None
+    within = sorted((url for url in known if known[url] <= cap_kbps), key=lambda url: -known[url])
+    if not within:
+        return list(urls), None, highest
+    return within, known[within[0]], highest
+
+
+class _Session:
+    __slots__ = ("station", "started", "last_read", "bytes", "selected_kbps", "highest_kbps")
+
+    def __init__(self, station, started, selected_kbps, highest_kbps):
+        self.station = station
+        self.started = started
+        self.last_read = 0
+        self.bytes = 0
+        self.selected_kbps = selected_kbps
+        self.highest_kbps = highest_kbps
+
+
+class DataUsageTracker:
+    """
+    Counts the bytes the app fetches from the network, per day and per station.
+
+    Bytes are counted where they enter the process: `add_network_bytes` is fed by
+    network_meter for the app's own connections (relay and timeshift feeds,
+    recordings, mirror probes), and `sample` adds libvlc's input statistics only
+    while the player fetches the station itself rather than reading a loopback
+    feed that is already counted. Sessions remember which bitrate the data saver
+    chose and the highest one on offer, so the report can show how much the cap saved.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        data = load_json_file(get_data_usage_path(), {}) or {}
+        self._days = data.get("days", {})
+        self._sessions = data.get("sessions", [])
+        self._session = None
+        self._selection = {}
+        self._dirty = False
+
+    def note_selection(self, station, selected_kbps, highest_kbps):
+        """Records the bitrate picked for the next session of `station`."""
+        with self._lock:
+            self._selection[station] = (selected_kbps, highest_kbps)
+
+    def on_player_event(self, name, station_key, data, timestamp):
+        with self._lock:
+            if name == "opening":
+                self._end_session()
+                if station_key is not None:
+                    selected, highest = self._selection.get(station_key, (None, None))
+                    self._session = _Session(station_key, time.time(), selected, highest)
+            elif name in ("error", "ended", "stopped"):
+                self._end_session()
+
+    def sample(self, player):
+        """Adds the bytes the player read from the network since the last sample; call periodically while playing."""
+        url = getattr(player, "current_url", None)
+        if url and urlsplit(url).hostname in LOOPBACK_HOSTS:
+            # Reading the local relay or timeshift feed; those count their upstream bytes themselves.
+            return
+        stats = player.get_input_stats()
+        if not stats:
+            return
+        with self._lock:
+            session = self._session
+            if session is None:
+                return
+            read = stats["read_bytes"]
+            # The counter restarts with each media (a failover or a timeshift seek).
+            delta = read - session.last_read if read >= session.last_read else read
+            session.last_read = read
+            self._add(delta)
+
+    def add_network_bytes(self, count):
+        """network_meter listener: bytes read by the app's own connections, charged to the playing station."""
+        with self._lock:
+            self._add(count)
+
+    def _add(self, count):
+        if count <= 0:
+            return
+        session = self._session
+        day = self._days.setdefault(date.today().isoformat(), {"bytes": 0, "stations": {}})
+        day["bytes"] += count
+        if session is not None:
+            session.bytes += count
+            day["stations"][session.station] = day["stations"].get(session.station, 0) + count
+        self._dirty = True
+
+    def _end_session(self):
+        session = self._session
+        self._session = None
+        if session is None or not session.bytes:
+            return
+        seconds = max(time.time() - session.started, 1e-3)
+        self._sessions.append({
+            "station": session.station,
+            "started": int(session.started),
+            "seconds": round(seconds),
+            "bytes": session.bytes,
+            "average_kbps": round(session.bytes * 8 / seconds / 1000, 1),
+            "selected_kbps": session.selected_kbps,
+            "highest_kbps": session.highest_kbps,
+        })
+        del self._sessions[:-SESSION_HISTORY]
+        self._dirty = True
+
+    def bytes_today(self):
+        with self._lock:
+            return self._days.get(date.today().isoformat(), {}).get("bytes", 0)
+
+    def over_budget(self, daily_mb):
+        return bool(daily_mb) and self.bytes_today() >= daily_mb * 1024 * 1024
+
+    def get_report(self):
+        """Returns today's usage, the last week by day, per-station totals and the estimated savings."""
+        with self._lock:
+            today = date.today()
+            week = {(today - timedelta(days=i)).isoformat(): 0 for i in range(7)}
+            stations = {}
+            for day, entry in self._days.items():
+                if day in week:
+                    week[day] = entry["bytes"]
+                for station, count in entry["stations"].items():
+                    stations[station] = stations.get(station, 0) + count
+            # Measured bytes against what the highest bitrate on offer would have used.
+            saved = 0
+            for session in self._sessions:
+                if session["selected_kbps"] and session["highest_kbps"]:
+                    saved += max(0, session["highest_kbps"] * 1000 // 8 * session["seconds"] - session["bytes"])
+            return {
+                "today_bytes": week[today.isoformat()],
+                "last_7_days_bytes": week,
+                "station_bytes": dict(sorted(stations.items(), key=lambda item: -item[1])),
+                "recent_sessions": list(self._sessions[-10:]),
+                "estimated_bytes_saved": saved,
+            }
+
+    def save(self):
+        with self._lock:
+            # Called at exit: close the running session so it makes it into the history.
+            self._end_session()
+            if not self._dirty:
+                return
+            cutoff = (date.today() - timedelta(days=HISTORY_DAYS)).isoformat()
+            self._days = {day: entry for day, entry in self._days.items() if day >= cutoff}
+            data = json.loads(json.dumps({"days": self._days, "sessions": self._sessions}))
+            self._dirty = False
+        save_json_file(get_data_usage_path(), data, compact=True)
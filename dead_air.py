@@ -0,0 +1,171 @@
+import ctypes
+import logging
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import vlc
+except (ImportError, FileNotFoundError):
+    vlc = None
+
+# Levels do not need fidelity: VLC resamples the tap to 8 kHz mono, which keeps the analysis cheap.
+SAMPLE_RATE = 8000
+BLOCK_SECONDS = 0.1
+# Levels are computed for a batch of blocks at a time, one vectorised pass per second of audio.
+BATCH_BLOCKS = 10
+SILENCE_DB = -50.0
+FULL_SCALE = 32768.0
+
+
+def dead_air_supported():
+    return np is not None and vlc is not None
+
+
+def block_levels(pcm, block_size):
+    """Returns the RMS and peak levels in dBFS of each whole block of int16 `pcm`."""
+    count = len(pcm) // block_size
+    blocks = pcm[:count * block_size].reshape(count, block_size).astype(np.float32)
+    rms = np.sqrt(np.einsum("ij,ij->i", blocks, blocks) / block_size)
+    peak = np.abs(blocks).max(axis=1)
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(rms / FULL_SCALE), 20 * np.log10(peak / FULL_SCALE)
+
+
+class SilenceDetector:
+    """
+    Tracks how long a stream of int16 PCM has stayed below `threshold_db`.
+
+    `feed` collects samples into a batch and, once it is full, reports
+    "silence" when the quiet has lasted `min_seconds` and "sound" when audio
+    comes back after that.
+    """
+
+    def __init__(self, threshold_db=SILENCE_DB, min_seconds=15, sample_rate=SAMPLE_RATE):
+        self.threshold_db = threshold_db
+        self.min_seconds = min_seconds
+        self.block_size = int(sample_rate * BLOCK_SECONDS)
+        self._batch = np.zeros(self.block_size * BATCH_BLOCKS, dtype=np.int16)
+        self._filled = 0
+        self.silent_seconds = 0.0
+        self.in_silence = False
+        self.rms_db = self.peak_db = float("-inf")
+
+    def feed(self, pcm):
+        """Adds samples; returns "silence", "sound" or None."""
+        transition = None
+        while len(pcm):
+            taken = min(len(pcm), len(self._batch) - self._filled)
+            self._batch[self._filled:self._filled + taken] = pcm[:taken]
+            self._filled += taken
+            pcm = pcm[taken:]
+            if self._filled == len(self._batch):
+                self._filled = 0
+                transition = self._analyse(self._batch) or transition
+        return transition
+
+    def _analyse(self, batch):
+        rms, peak = block_levels(batch, self.block_size)
+        self.rms_db = float(rms.max())
+        self.peak_db = float(peak.max())
+        loud = np.flatnonzero(rms >= self.threshold_db)
+        if len(loud):
+            # Only the quiet blocks after the last loud one carry over.
+            trailing = len(rms) - 1 - loud[-1]
+            was_silent = self.in_silence
+            self.silent_seconds = trailing * BLOCK_SECONDS
+            self.in_silence = False
+            return "sound" if was_silent else None
+        self.silent_seconds += len(rms) * BLOCK_SECONDS
+        if not self.in_silence and self.silent_seconds >= self.min_seconds:
+            self.in_silence = True
+            return "silence"
+        return None
+
+
+class DeadAirMonitor:
+    """
+    Listens to the playing station and reports sustained silence.
+
+    libvlc's audio callbacks replace the sound output, so the tap is a second,
+    silent player on the same stream that hands decoded PCM to a
+    SilenceDetector. The player runs it on its own libvlc instance, in the backend
+    process when playback is out of process, and only on the local relay or
+    timeshift URL, so the station is not fetched twice. `on_silence(station, seconds)` and
+    `on_sound(station, seconds_of_dead_air)` are called from a libvlc thread.
+    """
+
+    def __init__(self, vlc_instance, on_silence, on_sound, min_seconds=15, threshold_db=SILENCE_DB):
+        if not dead_air_supported():
+            raise ImportError("Dead-air detection needs numpy and python-vlc.")
+        self.on_silence = on_silence
+        self.on_sound = on_sound
+        self.min_seconds = min_seconds
+        self.threshold_db = threshold_db
+        self._instance = vlc_instance
+        self._lock = threading.Lock()
+        self._station = None
+        self._detector = None
+        self._silence_started = None
+        self._player = vlc_instance.media_player_new()
+        # Keep a reference to the ctypes callback, or it is collected while libvlc still calls it.
+        self._play_callback = vlc.CallbackDecorators.AudioPlayCb(self._on_play)
+        self._player.audio_set_callbacks(self._play_callback, None, None, None, None, None)
+        self._player.audio_set_format("S16N", SAMPLE_RATE, 1)
+
+    def start(self, url, station_key):
+        self.stop()
+        with self._lock:
+            self._station = station_key
+            self._detector = SilenceDetector(self.threshold_db, self.min_seconds)
+        media = self._instance.media_new(url, ":no-video")
+        self._player.set_media(media)
+        media.release()
+        self._player.play()
+
+    def stop(self):
+        self._player.stop()
+        with self._lock:
+            station, started = self._station, self._silence_started
+            self._station = self._detector = self._silence_started = None
+        if started is not None:
+            self.on_sound(station, time.monotonic() - started)
+
+    def close(self):
+        self.stop()
+        self._player.release()
+
+    def get_levels(self):
+        """Returns the (rms_db, peak_db) of the last analysed second, or None."""
+        with self._lock:
+            detector = self._detector
+            return (detector.rms_db, detector.peak_db) if detector else None
+
+    def _on_play(self, opaque, samples, count, pts):
+        try:
+            pcm = np.ctypeslib.as_array(ctypes.cast(samples, ctypes.POINTER(ctypes.c_int16)), shape=(count,))
+            with self._lock:
+                detector, station = self._detector, self._station
+                if detector is None:
+                    return
+                transition = detector.feed(pcm)
+                if transition == "silence":
+                    self._silence_started = time.monotonic() - detector.silent_seconds
+                    silent_seconds = detector.silent_seconds
+                elif transition == "sound" and self._silence_started is not None:
+                    silent_seconds = time.monotonic() - self._silence_started
+                    self._silence_started = None
+                else:
+                    transition = None
+            if transition == "silence":
+                logging.warning(f"Dead air on '{station}': silent for {silent_seconds:.0f}s.")
+                self.on_silence(station, silent_seconds)
+            elif transition == "sound":
+                logging.info(f"Audio is back on '{station}' after {silent_seconds:.0f}s of dead air.")
+                self.on_sound(station, silent_seconds)
+        except Exception as e:
+            logging.error(f"Dead-air analysis failed: {e}")
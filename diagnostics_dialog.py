@@ -0,0 +1,82 @@
+import json
+import logging
+
+import wx
+
+
+def format_playback_report(report, startup_times=()):
+    """Renders PlaybackStats.get_report() as readable text, busiest stations first."""
+    lines = []
+    if startup_times:
+        lines.append(f"زمن بدء الصوت منذ فتح البرنامج (آخر {len(startup_times)} مرات): "
+                     f"الأخير {startup_times[-1]} مللي ثانية، الأفضل {min(startup_times)} مللي ثانية")
+        lines.append("")
+    if not report:
+        lines.append("لا توجد إحصائيات تشغيل بعد.")
+        return "\n".join(lines)
+
+    def ms(value):
+        return f"{value} مللي ثانية" if value is not None else "أكثر من 16 ثانية"
+
+    for station, entry in sorted(report.items(), key=lambda item: -item[1]["sessions"]):
+        lines.append(station)
+        lines.append(f"  مرات التشغيل: {entry['sessions']}، ساعات الاستماع: {entry['listening_hours']}")
+        lines.append(f"  زمن بدء الصوت: الوسيط حتى {ms(entry['ttfa_p50_ms'])}، 90% حتى {ms(entry['ttfa_p90_ms'])}")
+        lines.append(f"  نسبة التخزين المؤقت: {entry['buffering_ratio'] * 100:.1f}%")
+        lines.append(f"  الأخطاء: {entry['errors']} (نسبة {entry['error_rate'] * 100:.1f}%)، "
+                     f"منها {entry['failed_starts']} قبل بدء الصوت")
+        if entry["dead_air_events"]:
+            lines.append(f"  انقطاع الصوت: {entry['dead_air_events']} مرات، {entry['dead_air_seconds']:.0f} ثانية من الصمت")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def format_data_usage(report):
+    """Renders DataUsageTracker.get_report() as readable text."""
+    def mb(count):
+        return f"{count / (1024 * 1024):.1f} ميغابايت"
+
+    lines = ["استهلاك البيانات", f"  اليوم: {mb(report['today_bytes'])}"]
+    lines.append("  آخر 7 أيام: " + "، ".join(f"{day}: {mb(count)}" for day, count in report["last_7_days_bytes"].items()))
+    for station, count in list(report["station_bytes"].items())[:10]:
+        lines.append(f"  {station}: {mb(count)}")
+    lines.append(f"  التوفير التقديري بفضل وضع توفير البيانات: {mb(report['estimated_bytes_saved'])}")
+    return "\n".join(lines)
+
+
+class DiagnosticsDialog(wx.Dialog):
+    def __init__(self, report_text, export_data, parent=None):
+        super().__init__(parent, title="التشخيص", size=(600, 400))
+        self.export_data = export_data
+
+        # Use a read-only TextCtrl for better accessibility
+        self.text_ctrl = wx.TextCtrl(self, value=report_text, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_DONTWRAP)
+        font = wx.Font(12, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_NORMAL)
+        self.text_ctrl.SetFont(font)
+
+        sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(self.text_ctrl, 1, wx.EXPAND | wx.ALL, 5)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        export_button = wx.Button(self, label="تصدير...")
+        export_button.Bind(wx.EVT_BUTTON, self.on_export)
+        button_sizer.Add(export_button, 0, wx.ALL, 5)
+        ok_button = wx.Button(self, wx.ID_OK, "إغلاق")
+        button_sizer.Add(ok_button, 0, wx.ALL, 5)
+        sizer.Add(button_sizer, 0, wx.ALIGN_CENTER)
+
+        self.SetSizer(sizer)
+
+    def on_export(self, event):
+        with wx.FileDialog(self, "تصدير التشخيص", wildcard="JSON (*.json)|*.json",
+                           defaultFile="amwaj_diagnostics.json",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as file_dialog:
+            if file_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = file_dialog.GetPath()
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.export_data, f, ensure_ascii=False, indent=4)
+        except IOError as e:
+            logging.error(f"Could not export diagnostics: {e}")
+            wx.MessageBox(f"تعذر حفظ الملف: {e}", "خطأ", wx.OK | wx.ICON_ERROR)
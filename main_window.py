@@ -2,15 +2,33 @@ import logging
 import webbrowser
 import os
 import sys
-from datetime import datetime
+import time
+from datetime import datetime, date
 import wx
 
-from constants import CURRENT_VERSION, UPDATE_URL, THEMES
+from constants import CURRENT_VERSION, UPDATE_URL, STATIONS_URL, THEMES
 from settings import load_settings, save_settings
-from threads import UpdateChecker, StationLoader
+from threads import UpdateChecker, StationLoader, StationLoadError
+from task_executor import TaskExecutor
 from player import Player
+from remote_player import RemotePlayer
+from network_caching import NetworkCachingTuner
+from playback_session import SessionTracker
+from playback_stats import PlaybackStats
+from recorder import RecordingPolicy
+from postprocess import PostProcessQueue
+from relay import StationRelay, relay_stream_url, relay_supported
+from timeshift import Timeshift, timeshift_supported, SKIP_SECONDS
+from stations import station_urls, station_bitrates, race_connect, MirrorStore
+from data_saver import (DataUsageTracker, is_hls, prefer_within_cap, select_hls_variant,
+                        LOWEST_VARIANT_OPTION)
+import network_meter
+from dead_air import dead_air_supported
+from playlist_import import PlaylistImporter, merge_categories
+from updater import UpdateDownloader, UpdateError, updates_supported, restart_application
 from settings_dialog import SettingsDialog
 from help_dialog import HelpDialog
+from diagnostics_dialog import DiagnosticsDialog, format_playback_report, format_data_usage
 from sound_manager import SoundManager
 from popup_window import TimedPopup
 
@@ -23,17 +41,50 @@ except (ImportError, OSError):
 
 
 class RadioWindow(wx.Frame):
-    def __init__(self, vlc_instance, sound_manager):
+    def __init__(self, vlc_instance, sound_manager, launched_at=None):
         super().__init__(None, title=f"Amwaj v{CURRENT_VERSION}", size=(400, 600))
 
         self.vlc_instance = vlc_instance
         self.sound_manager = sound_manager
+        self.launched_at = launched_at
 
         self.settings = load_settings()
-        self.player = Player(self.vlc_instance)
+        self.player = self.create_player()
+        self.executor = TaskExecutor(max_workers=4, name="background")
+        self.caching_tuner = NetworkCachingTuner()
+        self.playback_stats = PlaybackStats()
+        self.sessions = SessionTracker()
+        self.sessions.add_listener(self.caching_tuner.on_session_event)
+        self.sessions.add_listener(self.playback_stats.on_session_event)
+        self.data_usage = DataUsageTracker()
+        network_meter.add_listener(self.data_usage.add_network_bytes)
+        self.budget_override_day = None
+        self.mirror_store = MirrorStore()
+        self.playback_request = 0
+        # When the listener chose the current station, and how long its mirror race took.
+        self.station_selected_at = None
+        self.race_seconds = None
+        self.failover_urls = []
+        # The catalog URL the current station was started from, before any relay, timeshift or HLS variant.
+        self.station_url = None
+        # The URL being fetched for the current station: upstream, or on a relay on the network.
+        self.stream_url = None
+        # {url: kbps} of the current station's mirrors while the data saver caps it, otherwise None.
+        self.mirror_bitrates = None
+        self.import_task = None
+        self.postprocess_queue = PostProcessQueue(max_workers=self.settings.get("postprocess_workers", 1),
+                                                  on_progress=self.on_postprocess_progress,
+                                                  on_finished=self.on_postprocess_finished)
+        self.attach_player(self.player)
         self.categories = []
+        self.relay = None
+        self.timeshift = None
+        self.announcement_popup = None
+        if self.settings.get("relay_enabled", False):
+            self.start_relay()
 
         self.sleep_timer = wx.Timer(self)
+        self.stats_timer = wx.Timer(self)
 
         self.panel = wx.Panel(self)
         self.main_sizer = wx.BoxSizer(wx.VERTICAL)
@@ -47,11 +98,60 @@ class RadioWindow(wx.Frame):
         self.apply_theme()
         self.apply_sound_settings()
 
-        wx.CallAfter(self.finish_setup)
         self.setup_shortcuts()
+        # The saved station does not depend on the catalog, so it starts before it is fetched.
+        self.startup_station = None
+        self.startup_pending = self.settings.get("play_on_startup", False)
+        if self.startup_pending:
+            self.play_saved_station()
+        wx.CallAfter(self.finish_setup)
 
         self.Bind(wx.EVT_CLOSE, self.on_close)
 
+    def create_player(self):
+        if self.settings.get("player_out_of_process", False):
+            try:
+                return RemotePlayer()
+            except Exception as e:
+                logging.error(f"Could not start the out-of-process player, using the in-process one: {e}")
+        return Player(self.vlc_instance)
+
+    def attach_player(self, player):
+        player.add_event_listener(self.sessions.on_player_event)
+        player.add_event_listener(self.data_usage.on_player_event)
+        player.add_event_listener(self.on_first_audio)
+        player.add_event_listener(self.on_dead_air_event)
+        player.connect_error_handler(self.handle_player_error)
+        if isinstance(player, RemotePlayer):
+            player.connect_failure_handler(lambda: wx.CallAfter(self.on_player_backend_failed))
+
+    def on_player_backend_failed(self):
+        """Replaces an out-of-process player that keeps crashing with the in-process one, resuming the station."""
+        remote = self.player
+        try:
+            player = Player(self.vlc_instance)
+        except Exception as e:
+            logging.error(f"Could not fall back to the in-process player: {e}")
+            self.stop_station()
+            wx.MessageBox("توقف مشغل الصوت عن العمل ولم يمكن إعادة تشغيله. أعد تشغيل التطبيق.",
+                          "خطأ في التشغيل", wx.OK | wx.ICON_ERROR)
+            return
+        # Recordings run in this process and carry on.
+        player.recorder, player.is_rec = remote.recorder, remote.is_rec
+        remote.close()
+        self.player = player
+        self.attach_player(player)
+        player.set_volume(remote.get_volume())
+        if remote.current_url:
+            player.play(remote.current_url, station_key=remote.current_station, options=remote.current_options)
+            self.stats_timer.Start(2000)
+            if remote.dead_air_source:
+                try:
+                    player.start_dead_air_monitor(*remote.dead_air_source)
+                except Exception as e:
+                    logging.error(f"Could not start dead-air detection: {e}")
+        self.GetStatusBar().SetStatusText("تعطل مشغل الصوت المنفصل، تم التحويل إلى المشغل الداخلي")
+
     def set_initial_volume(self):
         initial_volume = self.settings.get("volume", 50)
         if PYCAW_AVAILABLE:
@@ -75,9 +175,8 @@ class RadioWindow(wx.Frame):
             self.load_stations()
             if self.settings.get("check_for_updates", True):
                 self.check_for_updates()
-            self.GetStatusBar().SetStatusText("أهلاً بك في الراديو العربي STV")
-            if self.settings.get("play_on_startup", False):
-                self.play_last_station()
+            if not self.startup_station:
+                self.GetStatusBar().SetStatusText("أهلاً بك في الراديو العربي STV")
             logging.debug("Setup tasks completed successfully.")
         except Exception as e:
             logging.error(f"Error during setup: {e}")
@@ -139,11 +238,11 @@ class RadioWindow(wx.Frame):
         self.Bind(wx.EVT_SLIDER, self.adjust_volume, self.volume_slider)
         self.Bind(wx.EVT_CHOICE, self.on_sleep_timer_selected, self.sleep_timer_choice)
         self.Bind(wx.EVT_TIMER, self.on_sleep_timer_end, self.sleep_timer)
+        self.Bind(wx.EVT_TIMER, self.on_stats_timer, self.stats_timer)
         self.tree_widget.Bind(wx.EVT_TREE_ITEM_ACTIVATED, self.play_station_event)
         self.tree_widget.Bind(wx.EVT_CHAR_HOOK, self.on_tree_char_hook)
         self.tree_widget.Bind(wx.EVT_TREE_SEL_CHANGED, self.on_tree_selection_changed)
         self.search_box.Bind(wx.EVT_TEXT, self.filter_stations)
-        self.player.connect_error_handler(self.handle_player_error)
 
     def on_sleep_timer_selected(self, event):
         selection = self.sleep_timer_choice.GetSelection()
@@ -166,7 +265,6 @@ class RadioWindow(wx.Frame):
         if self.player.is_recording():
             self.player.stop_recording()
             self.record_button.SetLabel("تسجيل")
-            self.play_stop_button.Enable(True)
             self.GetStatusBar().SetStatusText("تم إيقاف التسجيل.")
         else:
             if not self.player.is_playing() or not self.player.current_url:
@@ -181,19 +279,104 @@ class RadioWindow(wx.Frame):
                 station_name = "".join(x for x in station_name if x.isalnum() or x in " _-").strip()
 
             timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-            default_filename = f"{station_name}_{timestamp}.ts"
+            default_filename = f"{station_name}_{timestamp}"
 
-            with wx.FileDialog(self, "حفظ التسجيل", wildcard="Transport Stream (*.ts)|*.ts", style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT, defaultFile=default_filename) as fileDialog:
+            with wx.FileDialog(self, "حفظ التسجيل", wildcard="جميع الملفات (*.*)|*.*", style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT, defaultFile=default_filename) as fileDialog:
                 if fileDialog.ShowModal() == wx.ID_CANCEL:
                     return
                 pathname = fileDialog.GetPath()
-                if self.player.start_recording(pathname):
+                policy = RecordingPolicy.from_settings(self.settings)
+                if self.player.start_recording(pathname, policy=policy, on_error=self.on_recording_failed,
+                                               url=self.stream_url, feed_source=self.recording_feed_source()):
                     self.record_button.SetLabel("إيقاف التسجيل")
-                    self.play_stop_button.Enable(False)
                     self.GetStatusBar().SetStatusText(f"جاري التسجيل في: {pathname}")
                 else:
                     wx.MessageBox("فشل بدء التسجيل.", "خطأ", wx.OK | wx.ICON_ERROR)
 
+    def on_recording_failed(self, error):
+        if self.player.is_recording():
+            self.player.stop_recording()
+            self.record_button.SetLabel("تسجيل")
+        wx.MessageBox(f"توقف التسجيل بسبب خطأ:\n{error}", "خطأ", wx.OK | wx.ICON_ERROR)
+
+    def recording_feed_source(self):
+        """
+        Returns a callable giving the local feed a recording of the current station can
+        share, so it does not fetch the station a second time, or None if there is none.
+        """
+        url, relay = self.stream_url, self.relay
+        if relay and relay_supported(url):
+            # The relay keeps its feed up for as long as the recording listens to it.
+            key = relay.register_station(url)
+            return lambda: relay.get_feed(key)
+        timeshift = self.timeshift
+        if timeshift and timeshift.live_feed(url):
+            # Once the listener moves on, the timeshift drops the feed and the recording fetches the station itself.
+            return lambda: timeshift.live_feed(url)
+        return None
+
+    def on_convert_recording(self, event):
+        wildcard = "فهرس تسجيل (*.index.json)|*.index.json|جميع الملفات (*.*)|*.*"
+        with wx.FileDialog(self, "اختر تسجيلاً لتحويله", wildcard=wildcard, style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as fileDialog:
+            if fileDialog.ShowModal() == wx.ID_CANCEL:
+                return
+            source = fileDialog.GetPath()
+        try:
+            self.postprocess_queue.enqueue(source,
+                                           format=self.settings.get("postprocess_format", "mp3"),
+                                           bitrate=self.settings.get("postprocess_bitrate", 128),
+                                           normalize=self.settings.get("postprocess_normalize", True))
+        except ValueError as e:
+            wx.MessageBox(f"لا يمكن تحويل التسجيل: {e}", "خطأ", wx.OK | wx.ICON_ERROR)
+            return
+        self.GetStatusBar().SetStatusText("تمت إضافة التسجيل إلى قائمة التحويل.")
+
+    def on_import_playlist(self, event):
+        # Imports append to the same store and index it first, so they run one at a time.
+        if self.import_task is not None and not self.import_task.is_done():
+            wx.MessageBox("يجري استيراد قائمة أخرى الآن. انتظر حتى ينتهي ثم أعد المحاولة.",
+                          "استيراد قائمة الإذاعات", wx.OK | wx.ICON_INFORMATION)
+            return
+        wildcard = ("قوائم الإذاعات (*.m3u;*.m3u8;*.pls;*.json;*.jsonl)|*.m3u;*.m3u8;*.pls;*.json;*.jsonl|"
+                    "جميع الملفات (*.*)|*.*")
+        with wx.FileDialog(self, "اختر قائمة إذاعات لاستيرادها", wildcard=wildcard,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as file_dialog:
+            if file_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = file_dialog.GetPath()
+        importer = PlaylistImporter(path, self.categories,
+                                    on_progress=lambda count: self.executor.call_after(self.on_import_progress, count))
+        self.import_task = self.executor.submit(importer, on_success=self.on_playlist_imported,
+                                                on_error=self.on_playlist_import_failed)
+        self.GetStatusBar().SetStatusText("جاري استيراد قائمة الإذاعات...")
+
+    def on_import_progress(self, count):
+        self.GetStatusBar().SetStatusText(f"جاري استيراد قائمة الإذاعات... {count} إدخال")
+
+    def on_playlist_imported(self, report):
+        self.categories = merge_categories(self.categories, report["categories"])
+        self.filter_stations(None)
+        if self.relay:
+            self.relay.register_categories(report["categories"])
+        self.GetStatusBar().SetStatusText(f"تم استيراد {report['imported']} إذاعة")
+        wx.MessageBox(f"تم استيراد {report['imported']} إذاعة جديدة من أصل {report['entries']}.\n"
+                      f"المكررة: {report['duplicates']}، الروابط غير الصالحة: {report['invalid']}.",
+                      "استيراد قائمة الإذاعات", wx.OK | wx.ICON_INFORMATION)
+
+    def on_playlist_import_failed(self, error):
+        logging.error(f"Playlist import failed: {error}")
+        self.GetStatusBar().SetStatusText("فشل استيراد قائمة الإذاعات")
+        wx.MessageBox(f"تعذر استيراد قائمة الإذاعات: {error}", "خطأ", wx.OK | wx.ICON_ERROR)
+
+    def on_postprocess_progress(self, job_id, fraction):
+        self.GetStatusBar().SetStatusText(f"جاري تحويل التسجيل: {int(fraction * 100)}%")
+
+    def on_postprocess_finished(self, job):
+        if job["state"] == "done":
+            self.GetStatusBar().SetStatusText(f"اكتمل التحويل: {job['output']} (وقت المعالج {job['cpu_time']} ث)")
+        else:
+            self.GetStatusBar().SetStatusText(f"فشل تحويل التسجيل: {job['error']}")
+
     def setup_menu(self):
         menu_bar = wx.MenuBar()
         file_menu = wx.Menu()
@@ -202,10 +385,19 @@ class RadioWindow(wx.Frame):
         self.id_about = wx.NewIdRef()
         self.id_exit = wx.NewIdRef()
         self.id_help = wx.NewIdRef()
+        self.id_diagnostics = wx.NewIdRef()
+        self.id_convert = wx.NewIdRef()
+        self.id_import = wx.NewIdRef()
 
         settings_item = file_menu.Append(self.id_settings, "الإعدادات...", "Open settings")
         self.Bind(wx.EVT_MENU, self.open_settings_dialog, settings_item)
         
+        convert_item = file_menu.Append(self.id_convert, "تحويل تسجيل...", "Convert a recording")
+        self.Bind(wx.EVT_MENU, self.on_convert_recording, convert_item)
+
+        import_item = file_menu.Append(self.id_import, "استيراد قائمة إذاعات...", "Import a playlist of stations")
+        self.Bind(wx.EVT_MENU, self.on_import_playlist, import_item)
+
         about_item = file_menu.Append(self.id_about, "حول البرنامج...", "About the application")
         self.Bind(wx.EVT_MENU, self.show_about_dialog, about_item)
 
@@ -218,6 +410,8 @@ class RadioWindow(wx.Frame):
         help_menu = wx.Menu()
         help_item = help_menu.Append(self.id_help, "عرض دليل المساعدة", "Show help")
         self.Bind(wx.EVT_MENU, self.show_help_dialog, help_item)
+        diagnostics_item = help_menu.Append(self.id_diagnostics, "التشخيص...", "Show playback diagnostics")
+        self.Bind(wx.EVT_MENU, self.show_diagnostics_dialog, diagnostics_item)
         menu_bar.Append(help_menu, "&المساعدة")
 
         self.SetMenuBar(menu_bar)
@@ -229,16 +423,33 @@ class RadioWindow(wx.Frame):
         self.id_vol_down = wx.NewIdRef()
         self.id_vol_up = wx.NewIdRef()
         self.id_mute = wx.NewIdRef()
+        self.id_pause = wx.NewIdRef()
+        self.id_rewind = wx.NewIdRef()
+        self.id_forward = wx.NewIdRef()
+        self.id_go_live = wx.NewIdRef()
+        self.id_save_last = wx.NewIdRef()
 
-        accel_tbl = wx.AcceleratorTable([
+        self.base_shortcuts = [
             (wx.ACCEL_NORMAL, wx.WXK_F2, self.id_play_stop),
             (wx.ACCEL_NORMAL, wx.WXK_F3, self.id_focus_search),
             (wx.ACCEL_NORMAL, wx.WXK_F5, self.id_restart),
             (wx.ACCEL_NORMAL, wx.WXK_F7, self.id_vol_down),
             (wx.ACCEL_NORMAL, wx.WXK_F8, self.id_vol_up),
             (wx.ACCEL_NORMAL, wx.WXK_F9, self.id_mute),
-        ])
-        self.SetAcceleratorTable(accel_tbl)
+            (wx.ACCEL_NORMAL, wx.WXK_F4, self.id_pause),
+        ]
+        # These clash with word navigation, select-all and saving in text fields, so they are
+        # only installed while timeshift is running and the search box does not have focus.
+        self.timeshift_shortcuts = [
+            (wx.ACCEL_CTRL, wx.WXK_LEFT, self.id_rewind),
+            (wx.ACCEL_CTRL, wx.WXK_RIGHT, self.id_forward),
+            (wx.ACCEL_CTRL, ord('L'), self.id_go_live),
+            (wx.ACCEL_CTRL, ord('S'), self.id_save_last),
+        ]
+        self.timeshift_shortcuts_installed = None
+        self.update_shortcuts()
+        self.search_box.Bind(wx.EVT_SET_FOCUS, self.on_search_focus_changed)
+        self.search_box.Bind(wx.EVT_KILL_FOCUS, self.on_search_focus_changed)
 
         self.Bind(wx.EVT_MENU, self.toggle_play_stop, id=self.id_play_stop)
         self.Bind(wx.EVT_MENU, lambda event: self.search_box.SetFocus(), id=self.id_focus_search)
@@ -246,6 +457,25 @@ class RadioWindow(wx.Frame):
         self.Bind(wx.EVT_MENU, self.lower_volume, id=self.id_vol_down)
         self.Bind(wx.EVT_MENU, self.raise_volume, id=self.id_vol_up)
         self.Bind(wx.EVT_MENU, self.toggle_mute, id=self.id_mute)
+        self.Bind(wx.EVT_MENU, self.toggle_pause, id=self.id_pause)
+        self.Bind(wx.EVT_MENU, lambda event: self.seek_timeshift(-SKIP_SECONDS), id=self.id_rewind)
+        self.Bind(wx.EVT_MENU, lambda event: self.seek_timeshift(SKIP_SECONDS), id=self.id_forward)
+        self.Bind(wx.EVT_MENU, self.go_live, id=self.id_go_live)
+        self.Bind(wx.EVT_MENU, self.on_save_last_minutes, id=self.id_save_last)
+
+    def update_shortcuts(self):
+        """Installs the timeshift shortcuts only while they cannot get in the way of typing."""
+        wanted = bool(self.timeshift and self.timeshift.is_active()) and wx.Window.FindFocus() is not self.search_box
+        if wanted == self.timeshift_shortcuts_installed:
+            return
+        self.timeshift_shortcuts_installed = wanted
+        entries = self.base_shortcuts + (self.timeshift_shortcuts if wanted else [])
+        self.SetAcceleratorTable(wx.AcceleratorTable(entries))
+
+    def on_search_focus_changed(self, event):
+        event.Skip()
+        # Focus has not moved yet while the event is being handled.
+        wx.CallAfter(self.update_shortcuts)
 
     def on_tree_char_hook(self, event):
         if event.GetKeyCode() == wx.WXK_RETURN:
@@ -270,20 +500,317 @@ class RadioWindow(wx.Frame):
             return
 
         station_name = self.tree_widget.GetItemText(item)
-        url_string = self.tree_widget.GetItemData(item)
+        station = self.tree_widget.GetItemData(item)
+        urls = self.mirror_store.ordered_urls(station_name, station_urls(station))
 
-        if not url_string:
+        if not urls or not self.check_data_budget():
             return
 
+        cap = self.data_saver_cap()
+        self.mirror_bitrates = None
+        if cap:
+            self.mirror_bitrates = station_bitrates(station)
+            urls, _, _ = prefer_within_cap(urls, self.mirror_bitrates, cap)
+
         self.sound_manager.play("play_station")
         self.settings["last_station_name"] = station_name
-        self.player.play(url_string)
+        self.startup_station = None
+        self.startup_pending = False
+        self.playback_request += 1
+        self.station_selected_at = time.monotonic()
+        self.race_seconds = None
+        self.executor.cancel("race_connect")
+        if len(urls) == 1:
+            self.start_playback(station_name, urls[0], [])
+        else:
+            request = self.playback_request
+            self.GetStatusBar().SetStatusText("جاري الاتصال بأسرع خادم...")
+            self.executor.submit(race_connect, urls, key="race_connect",
+                                 on_success=lambda result: self.on_race_won(request, station_name, urls, result),
+                                 on_error=lambda error: self.on_race_failed(request, error))
+        self._show_playing(station_name)
+
+    def _show_playing(self, station_name):
         self.now_playing_label.SetLabel(f"التشغيل الحالي: {station_name}")
         self.show_announcement_popup(f"تشغيل: {station_name}")
         self.play_stop_button.SetLabel('إيقاف')
 
+    def play_saved_station(self):
+        """Plays the station saved at the last session straight from its remembered URLs."""
+        saved = self.settings.get("last_station")
+        if not saved or not saved.get("urls"):
+            return False
+        if not self.check_data_budget():
+            return False
+        station_name = saved["name"]
+        urls = self.mirror_store.ordered_urls(station_name, saved["urls"])
+        logging.info(f"Starting the saved station '{station_name}' before the catalog loads.")
+        self.startup_station = station_name
+        self.settings["last_station_name"] = station_name
+        self.playback_request += 1
+        self.mirror_bitrates = None
+        self.start_playback(station_name, urls[0], urls[1:])
+        self._show_playing(station_name)
+        return True
+
+    def reconcile_startup_station(self):
+        """Selects the station started from settings in the freshly loaded tree, replaying it if its URLs changed."""
+        station_name = self.startup_station
+        self.startup_station = None
+        item = self.find_station_item(station_name)
+        if item is None:
+            logging.warning(f"The saved station '{station_name}' is no longer in the catalog.")
+            return
+        self.tree_widget.SelectItem(item)
+        urls = station_urls(self.tree_widget.GetItemData(item))
+        if self.player.current_station != station_name:
+            return
+        if self.station_url not in urls:
+            logging.info(f"The catalog changed the URLs of '{station_name}'; replaying it.")
+            self.play_station(item)
+        else:
+            self.failover_urls = [url for url in urls if url != self.station_url]
+            self.settings["last_station"] = {"name": station_name, "urls": [self.station_url] + self.failover_urls}
+
+    def on_first_audio(self, name, station_key, data, timestamp):
+        """Logs the time from choosing a station to its first audio, and from process launch once per run."""
+        if name != "playing":
+            return
+        selected_at, self.station_selected_at = self.station_selected_at, None
+        if selected_at is not None:
+            race = f", mirror race {self.race_seconds * 1000:.0f}ms" if self.race_seconds is not None else ""
+            logging.info(f"Time to first audio for '{station_key}': {(timestamp - selected_at) * 1000:.0f}ms{race}")
+        if self.launched_at is None:
+            return
+        elapsed = timestamp - self.launched_at
+        self.launched_at = None
+        logging.info(f"Startup time to first audio: {elapsed * 1000:.0f}ms (station '{station_key}')")
+        self.playback_stats.record_startup(elapsed)
+
+    def start_playback(self, station_name, url, fallback_urls):
+        self.failover_urls = list(fallback_urls)
+        self.station_url = url
+        self.settings["last_station"] = {"name": station_name, "urls": [url] + list(fallback_urls)}
+        cap = self.data_saver_cap()
+        # A variant lookup still running for the previous station must not join this one.
+        self.executor.cancel("hls_variant")
+        if cap and is_hls(url):
+            request = self.playback_request
+            self.executor.submit(select_hls_variant, url, cap, key="hls_variant",
+                                 on_success=lambda result: self.on_variant_selected(request, station_name, result),
+                                 on_error=lambda error: self.on_variant_selected(request, station_name, (url, None, None)))
+            return
+        if cap and self.mirror_bitrates is not None:
+            # Noted only now, once the race or a failover has settled on the mirror that plays.
+            highest_kbps = max(self.mirror_bitrates.values()) if self.mirror_bitrates else None
+            self.data_usage.note_selection(station_name, self.mirror_bitrates.get(url), highest_kbps)
+        self._play_stream(station_name, url)
+
+    def on_variant_selected(self, request, station_name, result):
+        if request != self.playback_request:
+            return
+        url, selected_kbps, highest_kbps = result
+        if selected_kbps is None:
+            # The variant list could not be read; let VLC's adaptive module stay on the lowest one.
+            self._play_stream(station_name, url, (LOWEST_VARIANT_OPTION,))
+            return
+        self.data_usage.note_selection(station_name, selected_kbps, highest_kbps)
+        self._play_stream(station_name, url)
+
+    def _play_stream(self, station_name, url, extra_options=()):
+        source_url = url
+        url = self.resolve_stream_url(url)
+        # The local relay fetches the station URL itself; a relay on the network is where the station comes from.
+        self.stream_url = source_url if self.relay else url
+        if self.settings.get("timeshift_enabled", False) and timeshift_supported(url):
+            if self.timeshift is None:
+                self.timeshift = Timeshift()
+            url = self.timeshift.start(url, minutes=self.settings.get("timeshift_minutes", 30))
+        elif self.timeshift:
+            self.timeshift.stop()
+        self.update_shortcuts()
+        self.player.play(url, station_key=station_name,
+                         options=self.caching_tuner.media_options(station_name) + tuple(extra_options))
+        self.stats_timer.Start(2000)
+        self.start_dead_air_monitor(station_name, url, tapped_locally=(url != source_url))
+
+    def start_dead_air_monitor(self, station_name, url, tapped_locally):
+        """Has the player listen to the stream for sustained silence when dead-air detection is on."""
+        if not self.settings.get("dead_air_detection_enabled", False) or not dead_air_supported():
+            self.stop_dead_air_monitor()
+            return
+        if not tapped_locally:
+            # Without the relay or timeshift in front, the tap would fetch the station a second time.
+            logging.info(f"Dead-air detection needs the relay or timeshift; not listening to '{station_name}'.")
+            self.stop_dead_air_monitor()
+            return
+        try:
+            self.player.start_dead_air_monitor(url, self.settings.get("dead_air_seconds", 15))
+        except Exception as e:
+            logging.error(f"Could not start dead-air detection: {e}")
+
+    def stop_dead_air_monitor(self):
+        self.player.stop_dead_air_monitor()
+
+    def on_dead_air_event(self, name, station_key, data, timestamp):
+        if name == "dead_air":
+            wx.CallAfter(self.on_dead_air, station_key, data)
+        elif name == "dead_air_ended":
+            self.on_dead_air_ended(station_key, data)
+
+    def on_dead_air(self, station_name, seconds):
+        if station_name != self.player.current_station:
+            return
+        if self.timeshift and self.timeshift.is_paused():
+            # Failing over would unpause the listener and throw away the buffer they paused to keep.
+            logging.info(f"'{station_name}' went silent while paused; not failing over.")
+            return
+        if self.fail_over(station_name, "الإذاعة صامتة، جاري التحويل إلى خادم بديل..."):
+            return
+        self.GetStatusBar().SetStatusText(f"لا يصل صوت من هذه الإذاعة منذ {int(seconds)} ثانية")
+        self.show_announcement_popup("انقطاع الصوت في الإذاعة")
+
+    def on_dead_air_ended(self, station_name, seconds):
+        # Called from libvlc's thread; PlaybackStats takes its own lock.
+        self.playback_stats.record_dead_air(station_name, seconds)
+        wx.CallAfter(self.on_audio_back)
+
+    def on_audio_back(self):
+        # The monitor also reports the end of a silence when it is stopped at exit.
+        if self:
+            self.GetStatusBar().SetStatusText("")
+
+    def data_saver_cap(self):
+        """Returns the bitrate cap in kbps when data saver is on, otherwise None."""
+        if self.settings.get("data_saver_enabled", False):
+            return self.settings.get("data_saver_max_kbps", 64)
+        return None
+
+    def _budget_exceeded(self):
+        daily_mb = self.settings.get("data_saver_daily_mb", 0)
+        return (self.settings.get("data_saver_enabled", False) and self.budget_override_day != date.today()
+                and self.data_usage.over_budget(daily_mb))
+
+    def check_data_budget(self):
+        """Asks before playing once today's data budget is used up. Returns True if playback may go ahead."""
+        if not self._budget_exceeded():
+            return True
+        message = (f"تم بلوغ حد استهلاك البيانات اليومي ({self.settings.get('data_saver_daily_mb')} ميغابايت).\n\n"
+                   "هل تريد المتابعة رغم ذلك حتى نهاية اليوم؟")
+        dlg = wx.MessageDialog(self, message, "توفير البيانات", wx.YES_NO | wx.ICON_WARNING)
+        allowed = dlg.ShowModal() == wx.ID_YES
+        dlg.Destroy()
+        if allowed:
+            self.budget_override_day = date.today()
+        return allowed
+
+    def _timeshift_available(self):
+        if self.timeshift and self.timeshift.is_active():
+            return True
+        self.show_announcement_popup("الإيقاف المؤقت غير متاح لهذه الإذاعة")
+        return False
+
+    def _play_timeshift_url(self, url):
+        station_name = self.player.current_station
+        self.player.play(url, station_key=station_name, options=self.caching_tuner.media_options(station_name))
+        self.stats_timer.Start(2000)
+        self.play_stop_button.SetLabel('إيقاف')
+        delay = int(self.timeshift.get_delay())
+        self.GetStatusBar().SetStatusText(f"متأخر عن البث المباشر بـ {delay} ثانية" if delay else "")
+
+    def toggle_pause(self, event):
+        if not self._timeshift_available():
+            return
+        if self.timeshift.is_paused():
+            self._play_timeshift_url(self.timeshift.resume())
+            self.show_announcement_popup("استئناف")
+        else:
+            # The station keeps being buffered while the player is stopped.
+            self.timeshift.pause()
+            self.player.stop()
+            self.stats_timer.Stop()
+            self.play_stop_button.SetLabel('تشغيل')
+            self.show_announcement_popup("إيقاف مؤقت")
+
+    def seek_timeshift(self, seconds):
+        if not self._timeshift_available():
+            return
+        self._play_timeshift_url(self.timeshift.seek(seconds))
+        delay = int(self.timeshift.get_delay())
+        self.show_announcement_popup(f"متأخر {delay} ثانية" if delay else "البث المباشر")
+
+    def go_live(self, event):
+        if not self._timeshift_available():
+            return
+        self._play_timeshift_url(self.timeshift.go_live())
+        self.show_announcement_popup("البث المباشر")
+
+    def on_save_last_minutes(self, event):
+        if not self._timeshift_available():
+            return
+        buffered_minutes = max(1, int(self.timeshift.get_buffered_seconds() // 60))
+        minutes = wx.GetNumberFromUser("كم دقيقة تريد حفظها من آخر ما تم بثه؟", "الدقائق:", "حفظ آخر دقائق",
+                                       min(5, buffered_minutes), 1, buffered_minutes, self)
+        if minutes <= 0:
+            return
+        station_name = "".join(x for x in (self.player.current_station or "recording") if x.isalnum() or x in " _-").strip()
+        extension = self.timeshift.get_extension()
+        default_filename = f"{station_name}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.{extension}"
+        with wx.FileDialog(self, "حفظ آخر دقائق", wildcard=f"*.{extension}|*.{extension}",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT, defaultFile=default_filename) as file_dialog:
+            if file_dialog.ShowModal() == wx.ID_CANCEL:
+                return
+            path = file_dialog.GetPath()
+        self.executor.submit(self.timeshift.save_last, path, minutes * 60,
+                             on_success=lambda written: self.GetStatusBar().SetStatusText(f"تم الحفظ في: {path}"),
+                             on_error=lambda error: wx.MessageBox(f"تعذر حفظ التسجيل:\n{error}", "خطأ", wx.OK | wx.ICON_ERROR))
+
+    def on_race_won(self, request, station_name, urls, result):
+        if request != self.playback_request:
+            return
+        url, elapsed = result
+        self.race_seconds = elapsed
+        self.mirror_store.remember(station_name, url)
+        self.GetStatusBar().SetStatusText("")
+        self.start_playback(station_name, url, [u for u in urls if u != url])
+
+    def on_race_failed(self, request, error):
+        if request != self.playback_request:
+            return
+        self.GetStatusBar().SetStatusText("")
+        wx.MessageBox("تعذر الاتصال بأي من خوادم هذه الإذاعة.", "خطأ في التشغيل", wx.OK | wx.ICON_ERROR)
+        self.stop_station()
+
+    def start_relay(self):
+        try:
+            self.relay = StationRelay(host=self.settings.get("relay_host", "127.0.0.1"),
+                                      port=self.settings.get("relay_port", 8800))
+            self.relay.start()
+        except OSError as e:
+            self.relay = None
+            logging.error(f"Could not start the station relay: {e}")
+
+    def resolve_stream_url(self, url):
+        """Routes playback through the local relay, or a relay on the network, when configured."""
+        if self.relay:
+            return self.relay.local_url(url)
+        relay_url = self.settings.get("relay_url")
+        if relay_url and relay_supported(url):
+            return relay_stream_url(relay_url, url)
+        return url
+
     def stop_station(self):
+        self.playback_request += 1
+        self.executor.cancel("race_connect")
+        self.failover_urls = []
+        self.startup_station = None
+        self.startup_pending = False
         self.player.stop()
+        if self.timeshift:
+            self.timeshift.stop()
+        self.update_shortcuts()
+        self.stop_dead_air_monitor()
+        self.stats_timer.Stop()
         self.sound_manager.play("stop_station")
         self.now_playing_label.SetLabel("التشغيل الحالي: -")
         self.show_announcement_popup("إيقاف التشغيل")
@@ -292,6 +819,8 @@ class RadioWindow(wx.Frame):
     def toggle_play_stop(self, event):
         if self.player.is_playing():
             self.stop_station()
+        elif self.timeshift and self.timeshift.is_paused():
+            self.toggle_pause(event)
         else:
             item = self.tree_widget.GetSelection()
             if item.IsOk():
@@ -299,8 +828,21 @@ class RadioWindow(wx.Frame):
             else:
                 self.play_last_station()
 
+    def on_stats_timer(self, event):
+        if self.player.is_playing():
+            self.caching_tuner.sample(self.player)
+            self.data_usage.sample(self.player)
+            if self._budget_exceeded():
+                self.stop_station()
+                wx.MessageBox("تم إيقاف التشغيل لبلوغ حد استهلاك البيانات اليومي.", "توفير البيانات",
+                              wx.OK | wx.ICON_INFORMATION)
+
     def show_announcement_popup(self, message):
-        popup = TimedPopup(self, message)
+        # One popup is reused; a frame per announcement piled up when zapping or changing the volume.
+        if self.announcement_popup:
+            self.announcement_popup.show_message(message)
+        else:
+            self.announcement_popup = TimedPopup(self, message)
 
     def _set_volume(self, volume, announce=True):
         self.volume_slider.SetValue(volume)
@@ -332,38 +874,66 @@ class RadioWindow(wx.Frame):
         if not last_station_name:
             return
 
+        item = self.find_station_item(last_station_name)
+        if item is not None:
+            self.tree_widget.SelectItem(item)
+            self.play_station(item)
+
+    def find_station_item(self, station_name):
         root = self.tree_widget.GetRootItem()
         if not root.IsOk():
-            return
+            return None
 
         (child, cookie) = self.tree_widget.GetFirstChild(root)
         while child.IsOk():
             (grandchild, cookie2) = self.tree_widget.GetFirstChild(child)
             while grandchild.IsOk():
-                if self.tree_widget.GetItemText(grandchild) == last_station_name:
-                    self.tree_widget.SelectItem(grandchild)
-                    self.play_station(grandchild)
-                    return
+                if self.tree_widget.GetItemText(grandchild) == station_name:
+                    return grandchild
                 (grandchild, cookie2) = self.tree_widget.GetNextChild(child, cookie2)
             (child, cookie) = self.tree_widget.GetNextChild(root, cookie)
+        return None
 
 
     def load_stations(self):
-        self.progress_dialog = wx.ProgressDialog("جاري التحميل", "يرجى الانتظار...", parent=self)
-        self.progress_dialog.Pulse()
-
-        self.station_loader = StationLoader(self)
-        self.station_loader.start()
-
-    def on_stations_loaded(self, categories):
+        # Identical in-flight loads are deduplicated by the executor, so only one dialog is needed.
+        if not getattr(self, "progress_dialog", None):
+            self.progress_dialog = wx.ProgressDialog("جاري التحميل", "يرجى الانتظار...", parent=self)
+            self.progress_dialog.Pulse()
+
+        self.executor.submit(StationLoader(self.catalog_url("radio.json", STATIONS_URL)), key="load_stations",
+                             on_success=self.on_stations_loaded,
+                             on_error=self.on_stations_load_failed,
+                             on_cancel=self.on_stations_load_cancelled)
+
+    def on_stations_load_cancelled(self, error):
+        self._close_progress_dialog()
+
+    def _close_progress_dialog(self):
+        if getattr(self, "progress_dialog", None):
+            self.progress_dialog.Destroy()
+            self.progress_dialog = None
+
+    def on_stations_loaded(self, result):
+        categories, from_cache = result
         self.categories = categories
-        self.progress_dialog.Destroy()
+        self._close_progress_dialog()
         self.populate_stations(self.categories)
+        if self.relay:
+            self.relay.register_categories(self.categories)
         self.sound_manager.play("update_success")
+        if from_cache:
+            self.on_stations_load_error("فشل تحديث قائمة الإذاعات. يتم عرض نسخة محفوظة.", False)
         self.play_last_station_if_enabled()
 
+    def on_stations_load_failed(self, error):
+        if isinstance(error, StationLoadError):
+            self.on_stations_load_error(str(error), True)
+        else:
+            self.on_stations_load_error(f"حدث خطأ أثناء تحميل قائمة الإذاعات: {error}", True)
+
     def on_stations_load_error(self, error_message, is_critical):
-        self.progress_dialog.Destroy()
+        self._close_progress_dialog()
         if is_critical:
             wx.MessageBox(error_message, "خطأ فادح", wx.OK | wx.ICON_ERROR)
         else:
@@ -376,11 +946,17 @@ class RadioWindow(wx.Frame):
             parent = self.tree_widget.AppendItem(root, category["name"])
             for station in category.get("stations", []):
                 child = self.tree_widget.AppendItem(parent, station["name"])
-                self.tree_widget.SetItemData(child, station["url"])
+                self.tree_widget.SetItemData(child, station)
         self.tree_widget.ExpandAll()
 
     def play_last_station_if_enabled(self):
-        if self.settings.get("play_on_startup", False):
+        if not self.startup_pending:
+            return
+        self.startup_pending = False
+        if self.startup_station:
+            self.reconcile_startup_station()
+        else:
+            # No saved URLs yet (first run of this version): find the station by name.
             self.play_last_station()
 
     def filter_stations(self, event):
@@ -404,19 +980,72 @@ class RadioWindow(wx.Frame):
 
         self.populate_stations(filtered_categories)
 
+    def catalog_url(self, document, default_url):
+        """Uses the catalog mirror from the settings, if any, instead of the upstream address."""
+        mirror_url = self.settings.get("catalog_mirror_url")
+        if mirror_url:
+            return f"{mirror_url.rstrip('/')}/{document}"
+        return default_url
+
     def check_for_updates(self):
-        self.update_checker = UpdateChecker(CURRENT_VERSION, UPDATE_URL, self)
-        self.update_checker.start()
+        self.executor.submit(UpdateChecker(CURRENT_VERSION, self.catalog_url("version.json", UPDATE_URL)), key="check_for_updates",
+                             on_success=self.on_update_checked)
 
-    def show_update_dialog(self, new_version, download_url):
+    def on_update_checked(self, result):
+        if result:
+            self.show_update_dialog(*result)
+
+    def show_update_dialog(self, new_version, download_url, manifest=None):
+        in_place = manifest is not None and updates_supported()
         message = (f"يتوفر تحديث جديد!\n\n"
                    f"الإصدار الحالي: {CURRENT_VERSION}\n"
-                   f"الإصدار الجديد: {new_version}\n\n"
-                   "هل تريد الذهاب إلى صفحة التنزيل الآن؟")
+                   f"الإصدار الجديد: {new_version}\n\n")
+        message += "هل تريد تنزيل التحديث الآن؟" if in_place else "هل تريد الذهاب إلى صفحة التنزيل الآن؟"
 
         dlg = wx.MessageDialog(self, message, "تحديث متوفر", wx.YES_NO | wx.ICON_INFORMATION)
         if dlg.ShowModal() == wx.ID_YES:
-            webbrowser.open(download_url)
+            if in_place:
+                self.download_update(manifest, download_url)
+            else:
+                webbrowser.open(download_url)
+        dlg.Destroy()
+
+    def download_update(self, manifest, download_url):
+        self.update_page_url = download_url
+        downloader = UpdateDownloader(manifest["url"], manifest.get("sha256"),
+                                      on_progress=lambda done, total: self.executor.call_after(self.on_update_progress, done, total))
+        self.executor.submit(downloader, key="download_update",
+                             on_success=self.on_update_downloaded, on_error=self.on_update_download_failed)
+        self.GetStatusBar().SetStatusText("جاري تنزيل التحديث...")
+
+    def on_update_progress(self, done, total):
+        if total:
+            self.GetStatusBar().SetStatusText(f"جاري تنزيل التحديث... {done * 100 // total}%")
+
+    def on_update_downloaded(self, result):
+        megabytes = result["bytes_transferred"] / (1024 * 1024)
+        full_megabytes = result["bytes_full_release"] / (1024 * 1024)
+        self.GetStatusBar().SetStatusText(f"تم تنزيل التحديث {result['version']} ({megabytes:.1f} ميغابايت)")
+        message = (f"تم تنزيل الإصدار {result['version']}.\n"
+                   f"تم تنزيل {result['files_changed']} ملفات فقط ({megabytes:.1f} ميغابايت من أصل {full_megabytes:.1f}).\n\n"
+                   "سيتم تثبيت التحديث عند إعادة تشغيل البرنامج. هل تريد إعادة التشغيل الآن؟")
+        dlg = wx.MessageDialog(self, message, "التحديث جاهز", wx.YES_NO | wx.ICON_INFORMATION)
+        restart_now = dlg.ShowModal() == wx.ID_YES
+        dlg.Destroy()
+        if restart_now:
+            # Close first so settings and stores are saved before the new copy starts.
+            self.Close()
+            restart_application()
+
+    def on_update_download_failed(self, error):
+        logging.error(f"Update download failed: {error}")
+        self.GetStatusBar().SetStatusText("فشل تنزيل التحديث")
+        if not isinstance(error, UpdateError):
+            return
+        dlg = wx.MessageDialog(self, f"تعذر تنزيل التحديث: {error}\n\nهل تريد الذهاب إلى صفحة التنزيل بدلاً من ذلك؟",
+                               "خطأ في التحديث", wx.YES_NO | wx.ICON_WARNING)
+        if dlg.ShowModal() == wx.ID_YES:
+            webbrowser.open(self.update_page_url)
         dlg.Destroy()
 
     def apply_sound_settings(self):
@@ -433,6 +1062,8 @@ class RadioWindow(wx.Frame):
             save_settings(self.settings)
             self.apply_theme()
             self.apply_sound_settings()
+            if not self.settings.get("dead_air_detection_enabled", False):
+                self.stop_dead_air_monitor()
             if theme_changed or font_changed:
                 wx.MessageBox("بعض الإعدادات تتطلب إعادة تشغيل التطبيق لتصبح سارية المفعول.", "الإعدادات", wx.OK | wx.ICON_INFORMATION)
         dialog.Destroy()
@@ -487,8 +1118,24 @@ class RadioWindow(wx.Frame):
 
     def handle_player_error(self, event):
         logging.error("Player error detected.")
-        wx.CallAfter(wx.MessageBox, "حدث خطأ أثناء محاولة تشغيل الإذاعة", "خطأ في التشغيل", wx.OK | wx.ICON_ERROR)
-        wx.CallAfter(self.stop_station)
+        wx.CallAfter(self.on_player_error)
+
+    def on_player_error(self):
+        if self.fail_over(self.player.current_station, "انقطع الخادم الحالي، جاري التحويل إلى خادم بديل..."):
+            return
+        wx.MessageBox("حدث خطأ أثناء محاولة تشغيل الإذاعة", "خطأ في التشغيل", wx.OK | wx.ICON_ERROR)
+        self.stop_station()
+
+    def fail_over(self, station_name, status_text):
+        """Switches the station to its next mirror. Returns False when there is none left."""
+        if not self.failover_urls or not station_name:
+            return False
+        url = self.failover_urls.pop(0)
+        logging.info(f"Failing over '{station_name}' to the next mirror: {url}")
+        self.GetStatusBar().SetStatusText(status_text)
+        self.mirror_store.remember(station_name, url)
+        self.start_playback(station_name, url, self.failover_urls)
+        return True
 
     def show_help_dialog(self, event):
         try:
@@ -513,7 +1160,43 @@ class RadioWindow(wx.Frame):
             logging.error(f"Could not show help dialog: {e}")
             wx.MessageBox(f"لا يمكن عرض ملف المساعدة: {e}", "خطأ", wx.OK | wx.ICON_ERROR)
 
+    def show_diagnostics_dialog(self, event):
+        export_data = {
+            "version": CURRENT_VERSION,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "playback": self.playback_stats.export(),
+            "playback_summary": self.playback_stats.get_report(),
+            "network_caching": self.caching_tuner.get_report(),
+            "data_usage": self.data_usage.get_report(),
+            "background_tasks": self.executor.get_stats(),
+        }
+        if isinstance(self.player, RemotePlayer):
+            export_data["player_latency"] = self.player.get_latency_stats()
+        report_text = (format_playback_report(export_data["playback_summary"], self.playback_stats.get_startup_times())
+                       + "\n" + format_data_usage(export_data["data_usage"]))
+        dialog = DiagnosticsDialog(report_text, export_data, self)
+        dialog.ShowModal()
+        dialog.Destroy()
 
     def on_close(self, event):
         save_settings(self.settings)
-        self.Destroy()
\ No newline at end of file
+        # Stop delivering background results before the window goes away.
+        self.executor.shutdown(timeout=2.0)
+        self.stats_timer.Stop()
+        if self.player.is_recording():
+            self.player.stop_recording()
+        self.stop_dead_air_monitor()
+        self.player.stop()
+        if isinstance(self.player, RemotePlayer):
+            self.player.close()
+        self.postprocess_queue.shutdown()
+        if self.relay:
+            self.relay.stop()
+        if self.timeshift:
+            self.timeshift.close()
+        self.caching_tuner.save()
+        self.mirror_store.save()
+        self.playback_stats.save()
+        self.data_usage.save()
+        logging.info(f"Per-station network caching report: {self.caching_tuner.get_report()}")
+        self.Destroy()
@@ -0,0 +1,9 @@
+"""
+Offline network simulator: a local stand-in for the catalog, update manifest,
+sound effects and radio streams, with configurable faults.
+
+Run `python -m netsim` and start the app with AMWAJ_NETSIM_URL pointing at it.
+"""
+from netsim.server import FaultProfile, NetSimServer, default_catalog
+
+__all__ = ["FaultProfile", "NetSimServer", "default_catalog"]
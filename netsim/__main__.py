@@ -0,0 +1,34 @@
+import argparse
+import logging
+import time
+
+from netsim.server import FaultProfile, NetSimServer
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m netsim", description="Amwaj offline network simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--bandwidth", type=int, default=0, help="per-connection cap in bytes/second")
+    parser.add_argument("--gzip", action="store_true", help="gzip JSON documents when asked")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    server = NetSimServer(args.host, args.port)
+    server.gzip_documents = args.gzip
+    if args.latency or args.bandwidth:
+        server.set_fault("/", FaultProfile(latency=args.latency, bandwidth=args.bandwidth))
+    server.start()
+    print(f"netsim serving on {server.base_url}")
+    print(f"Start the app with: AMWAJ_NETSIM_URL={server.base_url}")
+    try:
+        while True:
+            time.sleep(60)
+            logging.info(f"netsim stats: {server.get_stats()}")
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import io
+import math
+import struct
+import wave
+
+MP3_SAMPLE_RATE = 44100
+MP3_SAMPLES_PER_FRAME = 1152
+_MP3_BITRATE_INDEX = {32: 1, 40: 2, 48: 3, 56: 4, 64: 5, 80: 6, 96: 7, 112: 8,
+                      128: 9, 160: 10, 192: 11, 224: 12, 256: 13, 320: 14}
+
+
+def silent_mp3_frame(bitrate_kbps=128):
+    """
+    Returns one MPEG-1 Layer III mono frame at 44.1 kHz that decodes to silence.
+    A zeroed side-info block has no main data, so the frame is valid without an encoder.
+    """
+    if bitrate_kbps not in _MP3_BITRATE_INDEX:
+        raise ValueError(f"Unsupported MP3 bitrate: {bitrate_kbps}")
+    header = bytes([0xFF, 0xFB, _MP3_BITRATE_INDEX[bitrate_kbps] << 4, 0xC0])
+    length = 144 * bitrate_kbps * 1000 // MP3_SAMPLE_RATE
+    return header + b"\0" * (length - len(header))
+
+
+def mp3_frame_duration():
+    return MP3_SAMPLES_PER_FRAME / MP3_SAMPLE_RATE
+
+
+def wav_header(sample_rate=44100, channels=1, data_size=0x7FFFFFF0):
+    """Returns a 16-bit PCM WAV header; the default size makes the stream effectively endless."""
+    byte_rate = sample_rate * channels * 2
+    return (b"RIFF" + struct.pack("<I", data_size + 36) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, channels * 2, 16)
+            + b"data" + struct.pack("<I", data_size))
+
+
+def tone_pcm(frequency, duration, sample_rate=44100, amplitude=0.3, phase=0):
+    """Returns mono 16-bit PCM of a sine tone, starting at sample offset `phase`."""
+    count = int(duration * sample_rate)
+    scale = amplitude * 32767
+    step = 2 * math.pi * frequency / sample_rate
+    samples = (int(scale * math.sin(step * (phase + i))) for i in range(count))
+    return struct.pack(f"<{count}h", *samples) if frequency else b"\0" * (count * 2)
+
+
+def tone_wav(frequency=880, duration=0.3, sample_rate=44100):
+    """Returns a complete short WAV file, used as a stand-in sound effect."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(tone_pcm(frequency, duration, sample_rate))
+    return buffer.getvalue()
+
+
+def icy_metadata_block(title):
+    """Encodes a StreamTitle ICY metadata block, padded to a multiple of 16 bytes."""
+    text = f"StreamTitle='{title}';".encode("utf-8")
+    blocks = (len(text) + 15) // 16
+    return bytes([blocks]) + text.ljust(blocks * 16, b"\0")
@@ -0,0 +1,309 @@
+import gzip
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from netsim.audio import (icy_metadata_block, mp3_frame_duration, silent_mp3_frame,
+                          tone_pcm, tone_wav, wav_header)
+
+ICY_METAINT = 16000
+
+
+class FaultProfile:
+    """
+    Network conditions applied to a route.
+
+    latency: seconds before the response starts.
+    bandwidth: cap in bytes per second (0 = unlimited).
+    disconnect_after: close the connection after this many body bytes (0 = never).
+    stall: seconds to hang after sending headers, before any body bytes.
+    status: HTTP error code to answer with instead of content (0 = none).
+    """
+
+    def __init__(self, latency=0.0, bandwidth=0, disconnect_after=0, stall=0.0, status=0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.disconnect_after = disconnect_after
+        self.stall = stall
+        self.status = status
+
+    def override(self, query):
+        """Returns a copy updated from query parameters such as ?latency=2&bw=16000."""
+        def value(name, cast, default):
+            return cast(query[name][0]) if name in query else default
+
+        return FaultProfile(
+            latency=value("latency", float, self.latency),
+            bandwidth=value("bw", int, self.bandwidth),
+            disconnect_after=value("drop", int, self.disconnect_after),
+            stall=value("stall", float, self.stall),
+            status=value("status", int, self.status),
+        )
+
+
+class _Disconnect(Exception):
+    pass
+
+
+def default_catalog(base_url, categories=3, stations_per_category=10):
+    """Builds a catalog in the STATIONS_URL format whose streams point at the simulator."""
+    catalog = {"categories": []}
+    for c in range(categories):
+        stations = []
+        for s in range(stations_per_category):
+            stations.append({"name": f"Station {c + 1}-{s + 1}", "url": f"{base_url}/stream/s{c}-{s}"})
+        catalog["categories"].append({"name": f"Category {c + 1}", "stations": stations})
+    return catalog
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once; the default backlog of 5 adds SYN retries.
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def do_GET(self):
+        server = self.server.netsim
+        parts = urlsplit(self.path)
+        path = parts.path
+        query = parse_qs(parts.query)
+        server.count_request(path)
+        fault = server.fault_for(path).override(query)
+        self._sent = 0
+        self._audio_sent = 0
+        self._fault = fault
+
+        if fault.latency:
+            time.sleep(fault.latency)
+        self._started = time.monotonic()
+        if fault.status:
+            self.send_error(fault.status)
+            return
+
+        try:
+            if path == "/radio.json":
+                self._send_document(json.dumps(server.catalog, ensure_ascii=False).encode("utf-8"), "application/json")
+            elif path == "/version.json":
+                self._send_document(json.dumps(server.version).encode("utf-8"), "application/json")
+            elif path.startswith("/media/") and path.endswith(".wav"):
+                self._send_document(server.sound_effect(), "audio/wav")
+            elif path.startswith("/stream/"):
+                self._send_stream(path[len("/stream/"):], query)
+            elif path in server.documents:
+                body, content_type = server.documents[path]
+                self._send_document(body, content_type)
+            else:
+                self.send_error(404)
+        except (_Disconnect, ConnectionError, OSError):
+            pass
+        finally:
+            server.add_bytes(self._sent)
+
+    def _headers_then_stall(self):
+        self.end_headers()
+        if self._fault.stall:
+            time.sleep(self._fault.stall)
+
+    def _send_document(self, body, content_type):
+        requested_range = self.headers.get("Range", "")
+        if "gzip" in self.headers.get("Accept-Encoding", "") and self.server.netsim.gzip_documents:
+            body = gzip.compress(body)
+            self.send_response(200)
+            self.send_header("Content-Encoding", "gzip")
+        elif requested_range.startswith("bytes=") and requested_range.endswith("-"):
+            # Only open-ended ranges ("bytes=N-"), which is what resuming downloads send.
+            start = int(requested_range[len("bytes="):-1])
+            if start >= len(body):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+            body = body[start:]
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self._headers_then_stall()
+        self._write(body)
+
+    def _send_stream(self, name, query):
+        audio_format = query.get("format", ["mp3"])[0]
+        bitrate = int(query.get("br", ["128"])[0])
+        wants_icy = self.headers.get("Icy-MetaData") == "1"
+
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav" if audio_format == "wav" else "audio/mpeg")
+        self.send_header("icy-name", f"netsim {name}")
+        self.send_header("icy-br", str(bitrate))
+        if wants_icy:
+            self.send_header("icy-metaint", str(ICY_METAINT))
+        self._headers_then_stall()
+
+        if audio_format == "wav":
+            # One second of an integer-frequency tone holds whole cycles, so it loops seamlessly.
+            frequency = int(query.get("tone", ["440"])[0])
+            block = tone_pcm(frequency, 1.0)
+            block_duration = 1.0
+            self._write_icy(wav_header(), wants_icy, name)
+        else:
+            frames = max(1, int(0.25 / mp3_frame_duration()))
+            block = silent_mp3_frame(bitrate) * frames
+            block_duration = frames * mp3_frame_duration()
+
+        # Pace blocks at real time, like a live source.
+        next_send = time.monotonic()
+        while True:
+            self._write_icy(block, wants_icy, name)
+            next_send += block_duration
+            time.sleep(max(0.0, next_send - time.monotonic()))
+
+    def _write_icy(self, data, wants_icy, name):
+        if not wants_icy:
+            self._write(data)
+            return
+        while data:
+            until_meta = ICY_METAINT - self._icy_counter()
+            self._write(data[:until_meta])
+            data = data[until_meta:]
+            if self._icy_counter() == 0:
+                self.wfile.write(icy_metadata_block(f"netsim {name} {time.strftime('%H:%M:%S')}"))
+
+    def _icy_counter(self):
+        return self._audio_sent % ICY_METAINT
+
+    def _write(self, data):
+        fault = self._fault
+        for offset in range(0, len(data), 4096):
+            piece = data[offset:offset + 4096]
+            if fault.disconnect_after and self._sent + len(piece) > fault.disconnect_after:
+                piece = piece[:fault.disconnect_after - self._sent]
+                self.wfile.write(piece)
+                self._sent += len(piece)
+                raise _Disconnect()
+            self.wfile.write(piece)
+            self._sent += len(piece)
+            self._audio_sent += len(piece)
+            if fault.bandwidth:
+                # Token-bucket style pacing: never run ahead of the byte budget.
+                ahead = self._sent / fault.bandwidth - (time.monotonic() - self._started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def log_message(self, format, *args):
+        logging.debug(f"netsim: {format % args}")
+
+
+class NetSimServer:
+    """
+    A local stand-in for every network endpoint the app talks to.
+
+    Serves the station catalog (/radio.json), the update manifest (/version.json),
+    sound effects (/media/*.wav), extra `documents` (with Range support for resumed
+    downloads) and endless synthetic streams (/stream/<name>, silent MP3 by default
+    or a WAV tone with ?format=wav&tone=440) with optional ICY metadata. Faults can be set per path prefix with `set_fault` or per request
+    with query parameters (latency, bw, drop, stall, status).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, catalog=None, latest_version="0.5"):
+        self._server = _Server((host, port), _Handler)
+        self._server.netsim = self
+        self._lock = threading.Lock()
+        self._faults = {}
+        self._requests = {}
+        self._bytes_sent = 0
+        self._thread = None
+        self._sound = tone_wav()
+        self.gzip_documents = False
+        self.documents = {}
+        self.catalog = catalog or default_catalog(self.base_url)
+        self.version = {
+            "latest_version": latest_version,
+            "download_url": f"{self.base_url}/releases/latest",
+        }
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    @property
+    def base_url(self):
+        host = self._server.server_address[0]
+        return f"http://{'127.0.0.1' if host == '0.0.0.0' else host}:{self.port}"
+
+    @property
+    def stations_url(self):
+        return f"{self.base_url}/radio.json"
+
+    @property
+    def update_url(self):
+        return f"{self.base_url}/version.json"
+
+    @property
+    def media_url(self):
+        return f"{self.base_url}/media"
+
+    def stream_url(self, name, **params):
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        return f"{self.base_url}/stream/{name}" + (f"?{query}" if query else "")
+
+    def environment(self):
+        """Returns the environment variables that point `constants` at this server."""
+        return {"AMWAJ_NETSIM_URL": self.base_url}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="netsim", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def set_fault(self, path_prefix, fault):
+        """Applies `fault` to every request whose path starts with `path_prefix`."""
+        with self._lock:
+            self._faults[path_prefix] = fault
+
+    def clear_faults(self):
+        with self._lock:
+            self._faults.clear()
+
+    def fault_for(self, path):
+        with self._lock:
+            matches = [prefix for prefix in self._faults if path.startswith(prefix)]
+            if not matches:
+                return FaultProfile()
+            return self._faults[max(matches, key=len)]
+
+    def sound_effect(self):
+        return self._sound
+
+    def count_request(self, path):
+        with self._lock:
+            self._requests[path] = self._requests.get(path, 0) + 1
+
+    def add_bytes(self, count):
+        with self._lock:
+            self._bytes_sent += count
+
+    def request_count(self, path=None):
+        with self._lock:
+            if path is None:
+                return sum(self._requests.values())
+            return self._requests.get(path, 0)
+
+    def get_stats(self):
+        with self._lock:
+            return {"requests": dict(self._requests), "bytes_sent": self._bytes_sent}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,132 @@
+import logging
+import statistics
+import threading
+
+from settings import get_network_caching_path, load_json_file, save_json_file
+
+# libvlc's own default for network streams, used until a station has history.
+DEFAULT_CACHING_MS = 1000
+MIN_CACHING_MS = 300
+MAX_CACHING_MS = 10000
+
+# A clean session must last this long before the buffer is tightened.
+MIN_CLEAN_SESSION_SECONDS = 60
+# Input bitrate coefficient of variation above which a stream counts as jittery.
+JITTER_THRESHOLD = 0.25
+
+
+def _jitter(bitrate_samples):
+    samples = [s for s in bitrate_samples if s > 0]
+    if len(samples) < 5:
+        return None
+    mean = statistics.fmean(samples)
+    return statistics.pstdev(samples) / mean if mean else None
+
+
+class NetworkCachingTuner:
+    """
+    Learns a libvlc `network-caching` value per station from how playback went.
+
+    Takes underruns and time-to-audio from the sessions of a SessionTracker, and
+    samples the input bitrate to estimate jitter. At the end of each session the
+    station's caching is raised after underruns and lowered after long, steady
+    sessions, so good streams start fast and bad ones stop dropping out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stations = load_json_file(get_network_caching_path(), {}) or {}
+        self._session = None
+        self._bitrate_samples = []
+        self._dirty = False
+
+    def get_caching(self, station_key):
+        with self._lock:
+            entry = self._stations.get(station_key)
+        return entry["caching_ms"] if entry else DEFAULT_CACHING_MS
+
+    def media_options(self, station_key):
+        """Returns the libvlc media options to apply when playing `station_key`."""
+        return (f":network-caching={self.get_caching(station_key)}",)
+
+    def on_session_event(self, name, session, timestamp):
+        """SessionTracker listener."""
+        with self._lock:
+            if name == "opened":
+                self._session = session
+                self._bitrate_samples = []
+            elif name == "closed" and session is self._session:
+                self._session = None
+                self._end_session(session)
+
+    def sample(self, player):
+        """Records the current input bitrate; call periodically while playing."""
+        stats = player.get_input_stats()
+        if not stats:
+            return
+        with self._lock:
+            if self._session is not None and self._session.playing_at is not None:
+                self._bitrate_samples.append(stats["input_bitrate"])
+                # Bound memory on very long sessions.
+                del self._bitrate_samples[:-600]
+
+    def _end_session(self, session):
+        entry = self._stations.setdefault(session.station_key, {
+            "caching_ms": DEFAULT_CACHING_MS,
+            "sessions": 0,
+            "underruns": 0,
+            "failures": 0,
+            "ttfa_ms_total": 0,
+            "ttfa_count": 0,
+            "last_ttfa_ms": None,
+        })
+        entry["sessions"] += 1
+        entry["underruns"] += session.underruns
+        ttfa = session.time_to_audio()
+        if ttfa is not None:
+            ttfa_ms = int(ttfa * 1000)
+            entry["last_ttfa_ms"] = ttfa_ms
+            entry["ttfa_ms_total"] += ttfa_ms
+            entry["ttfa_count"] += 1
+        elif session.failed:
+            entry["failures"] += 1
+
+        old_caching = entry["caching_ms"]
+        jitter = _jitter(self._bitrate_samples)
+        duration = session.playing_seconds()
+        if session.underruns:
+            entry["caching_ms"] = min(MAX_CACHING_MS, int(old_caching * (1 + 0.5 * min(session.underruns, 4))))
+        elif duration >= MIN_CLEAN_SESSION_SECONDS and (jitter is None or jitter < JITTER_THRESHOLD):
+            entry["caching_ms"] = max(MIN_CACHING_MS, int(old_caching * 0.85))
+        self._dirty = True
+
+        jitter_text = f"{jitter:.2f}" if jitter is not None else "n/a"
+        ttfa_text = f"{int(ttfa * 1000)}ms" if ttfa is not None else "n/a"
+        logging.info(f"Session ended for '{session.station_key}': time-to-audio {ttfa_text}, "
+                     f"underruns {session.underruns}, jitter {jitter_text}, "
+                     f"network-caching {old_caching}ms -> {entry['caching_ms']}ms")
+
+    def get_report(self):
+        """Returns per-station caching, underrun and time-to-audio figures."""
+        with self._lock:
+            report = {}
+            for key, entry in self._stations.items():
+                count = entry["ttfa_count"]
+                report[key] = {
+                    "caching_ms": entry["caching_ms"],
+                    "sessions": entry["sessions"],
+                    "underruns": entry["underruns"],
+                    "failures": entry["failures"],
+                    "avg_ttfa_ms": entry["ttfa_ms_total"] // count if count else None,
+                    "last_ttfa_ms": entry["last_ttfa_ms"],
+                }
+            return report
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {key: dict(entry) for key, entry in self._stations.items()}
+            self._dirty = False
+        save_json_file(get_network_caching_path(), data)
+
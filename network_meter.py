@@ -0,0 +1,32 @@
+import logging
+import threading
+
+# Listeners called as listener(byte_count) for every block the app itself reads from the network.
+_listeners = []
+_lock = threading.Lock()
+
+
+def add_listener(listener):
+    """
+    Registers `listener(byte_count)` for bytes read by the app's own connections:
+    the relay and timeshift feeds, recordings and mirror probes. Playback that
+    libvlc fetches itself is not reported here; it shows in the player's stats.
+    """
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def count_bytes(count):
+    with _lock:
+        listeners = list(_listeners)
+    for listener in listeners:
+        try:
+            listener(count)
+        except Exception as e:
+            logging.error(f"Network meter listener failed: {e}")
@@ -0,0 +1,99 @@
+import logging
+import threading
+
+
+class PlaybackSession:
+    """One listening session: from the player opening a station until it stops, fails or ends."""
+
+    def __init__(self, station_key, opened_at):
+        self.station_key = station_key
+        self.opened_at = opened_at
+        self.playing_at = None
+        self.closed_at = None
+        self.failed = False
+        # libvlc 3 reports Playing before the initial fill; only a drop after a full buffer is a stall.
+        self.filled = False
+        self.stall_started = None
+        self.underruns = 0
+        self.buffering_seconds = 0.0
+
+    def time_to_audio(self):
+        """Seconds from opening the stream to the first Playing event, or None if audio never started."""
+        if self.playing_at is None:
+            return None
+        return self.playing_at - self.opened_at
+
+    def playing_seconds(self):
+        if self.playing_at is None or self.closed_at is None:
+            return 0.0
+        return self.closed_at - self.playing_at
+
+    def _close_stall(self, timestamp):
+        if self.stall_started is not None:
+            self.buffering_seconds += timestamp - self.stall_started
+            self.stall_started = None
+
+
+class SessionTracker:
+    """
+    Turns Player events into listening sessions for the statistics that need them.
+
+    The playback statistics and the network caching tuner both consume these
+    sessions, so they agree on time-to-first-audio, underruns and time spent
+    re-buffering. Listeners are called as `listener(name, session, timestamp)`
+    with "opened", "first_audio" or "closed", in order and from the thread that
+    delivered the player event.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._session = None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def on_player_event(self, name, station_key, data, timestamp):
+        with self._lock:
+            if name == "opening":
+                self._close(timestamp, failed=False)
+                if station_key is not None:
+                    self._session = PlaybackSession(station_key, timestamp)
+                    self._notify("opened", self._session, timestamp)
+                return
+
+            session = self._session
+            if session is None:
+                return
+            if name == "playing":
+                if session.playing_at is None:
+                    session.playing_at = timestamp
+                    self._notify("first_audio", session, timestamp)
+                session._close_stall(timestamp)
+            elif name == "buffering" and session.playing_at is not None:
+                if data is not None and data < 100:
+                    if session.filled and session.stall_started is None:
+                        session.stall_started = timestamp
+                        session.underruns += 1
+                else:
+                    session.filled = True
+                    session._close_stall(timestamp)
+            elif name in ("error", "ended", "stopped"):
+                self._close(timestamp, failed=(name == "error"))
+
+    def _close(self, timestamp, failed):
+        session = self._session
+        self._session = None
+        if session is None:
+            return
+        session._close_stall(timestamp)
+        session.closed_at = timestamp
+        session.failed = failed
+        self._notify("closed", session, timestamp)
+
+    def _notify(self, name, session, timestamp):
+        for listener in self._listeners:
+            try:
+                listener(name, session, timestamp)
+            except Exception as e:
+                logging.error(f"Playback session listener failed on '{name}': {e}")
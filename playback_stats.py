@@ -0,0 +1,146 @@
+import json
+import threading
+
+from settings import get_playback_stats_path, get_startup_times_path, load_json_file, save_json_file
+
+# Histogram bucket upper bounds; the last bucket collects everything above.
+TTFA_BUCKETS_MS = [250, 500, 1000, 2000, 4000, 8000, 16000]
+SESSION_BUCKETS_SECONDS = [10, 60, 300, 900, 3600, 4 * 3600]
+STARTUP_SAMPLES = 20
+
+
+def _bucket(bounds, value):
+    for i, bound in enumerate(bounds):
+        if value <= bound:
+            return i
+    return len(bounds)
+
+
+def histogram_percentile(bounds, counts, fraction):
+    """Estimates a percentile from bucket counts, as the upper bound of its bucket (None if open-ended)."""
+    total = sum(counts)
+    if not total:
+        return None
+    running = 0
+    for i, count in enumerate(counts):
+        running += count
+        if running >= total * fraction:
+            return bounds[i] if i < len(bounds) else None
+    return None
+
+
+class PlaybackStats:
+    """
+    Passive per-station playback instrumentation.
+
+    Fed by the sessions of a SessionTracker, it keeps histograms of
+    time-to-first-audio and of how long sessions last, the time spent
+    re-buffering, and error counts. Event handling is a few additions under a
+    lock, so it adds nothing noticeable to the playback path; the compact store
+    is only written on `save`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stations = load_json_file(get_playback_stats_path(), {}) or {}
+        # Time from process launch to first audio of the last few runs.
+        self._startup = load_json_file(get_startup_times_path(), []) or []
+        self._dirty = False
+
+    def on_session_event(self, name, session, timestamp):
+        """SessionTracker listener."""
+        with self._lock:
+            if name == "first_audio":
+                entry = self._entry(session.station_key)
+                entry["ttfa"][_bucket(TTFA_BUCKETS_MS, session.time_to_audio() * 1000)] += 1
+                self._dirty = True
+            elif name == "closed":
+                self._end_session(session)
+
+    def _entry(self, station):
+        entry = self._stations.get(station)
+        if entry is None:
+            entry = self._stations[station] = {
+                "sessions": 0,
+                "errors": 0,
+                "failed_starts": 0,
+                "playing_seconds": 0.0,
+                "buffering_seconds": 0.0,
+                "ttfa": [0] * (len(TTFA_BUCKETS_MS) + 1),
+                "session_length": [0] * (len(SESSION_BUCKETS_SECONDS) + 1),
+            }
+        return entry
+
+    def _end_session(self, session):
+        entry = self._entry(session.station_key)
+        entry["sessions"] += 1
+        if session.failed:
+            entry["errors"] += 1
+            if session.playing_at is None:
+                entry["failed_starts"] += 1
+        if session.playing_at is not None:
+            length = session.playing_seconds()
+            entry["playing_seconds"] += length
+            entry["buffering_seconds"] += session.buffering_seconds
+            entry["session_length"][_bucket(SESSION_BUCKETS_SECONDS, length)] += 1
+        self._dirty = True
+
+    def record_dead_air(self, station, seconds):
+        """Counts a stretch of silence on `station` that libvlc reported as playing."""
+        with self._lock:
+            entry = self._entry(station)
+            # Entries stored before dead-air detection existed lack these keys.
+            entry["dead_air_events"] = entry.get("dead_air_events", 0) + 1
+            entry["dead_air_seconds"] = round(entry.get("dead_air_seconds", 0.0) + seconds, 1)
+            self._dirty = True
+
+    def record_startup(self, seconds):
+        with self._lock:
+            self._startup = (self._startup + [round(seconds * 1000)])[-STARTUP_SAMPLES:]
+            self._dirty = True
+
+    def get_startup_times(self):
+        """Returns the launch-to-first-audio times of recent runs, in milliseconds, oldest first."""
+        with self._lock:
+            return list(self._startup)
+
+    def get_report(self):
+        """Returns per-station summaries: sessions, error rate, buffering ratio and TTFA percentiles."""
+        with self._lock:
+            report = {}
+            for station, entry in self._stations.items():
+                sessions = entry["sessions"]
+                playing = entry["playing_seconds"]
+                report[station] = {
+                    "sessions": sessions,
+                    "errors": entry["errors"],
+                    "failed_starts": entry["failed_starts"],
+                    "error_rate": round(entry["errors"] / sessions, 3) if sessions else 0.0,
+                    "buffering_ratio": round(entry["buffering_seconds"] / playing, 4) if playing else 0.0,
+                    "listening_hours": round(playing / 3600, 2),
+                    "ttfa_p50_ms": histogram_percentile(TTFA_BUCKETS_MS, entry["ttfa"], 0.5),
+                    "ttfa_p90_ms": histogram_percentile(TTFA_BUCKETS_MS, entry["ttfa"], 0.9),
+                    "dead_air_events": entry.get("dead_air_events", 0),
+                    "dead_air_seconds": entry.get("dead_air_seconds", 0.0),
+                }
+            return report
+
+    def export(self):
+        """Returns the raw histograms with their bucket bounds, for machine-readable export."""
+        with self._lock:
+            return {
+                "ttfa_buckets_ms": TTFA_BUCKETS_MS,
+                "session_length_buckets_seconds": SESSION_BUCKETS_SECONDS,
+                "stations": json.loads(json.dumps(self._stations)),
+                "startup_ttfa_ms": list(self._startup),
+            }
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = json.loads(json.dumps(self._stations))
+            startup = list(self._startup)
+            self._dirty = False
+        save_json_file(get_playback_stats_path(), data, compact=True)
+        save_json_file(get_startup_times_path(), startup)
@@ -1,10 +1,47 @@
 import logging
+import time
+
+from dead_air import DeadAirMonitor
+from recorder import SegmentedRecorder
+
 try:
     import vlc
 except (ImportError, FileNotFoundError):
     vlc = None
 
-class Player:
+class RecordingSupport:
+    """Recording methods shared by the in-process Player and the RemotePlayer proxy."""
+
+    def start_recording(self, output_path, policy=None, on_error=None, url=None, feed_source=None):
+        """
+        Starts a raw, segmented capture of the current stream next to `output_path`.
+        Playback is not interrupted; the capture runs on its own thread, reading `url`
+        (the playing URL by default) or the local feed `feed_source` returns.
+        """
+        if not self.current_url:
+            logging.error("Cannot record: no stream is currently playing.")
+            return False
+
+        self.recorder = SegmentedRecorder(url or self.current_url, output_path, policy=policy,
+                                          station_name=self.current_station, feed_source=feed_source)
+        self.recorder.start(on_error=on_error)
+
+        self.is_rec = True
+        logging.info(f"Started recording to {self.recorder.manifest_path}")
+        return True
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+        self.is_rec = False
+        logging.info("Stopped recording.")
+
+    def is_recording(self):
+        return self.is_rec
+
+
+class Player(RecordingSupport):
     def __init__(self, vlc_instance):
         if not vlc:
             raise ImportError("python-vlc library not found.")
@@ -14,53 +51,77 @@ class Player:
         self.vlc_instance = vlc_instance
         self.vlc_player = self.vlc_instance.media_player_new()
         self.current_url = None
+        self.current_station = None
         self.is_rec = False
+        self.recorder = None
+        self.dead_air = None
+        self._event_listeners = []
+        self._attach_events()
 
-    def play(self, url_string):
+    def play(self, url_string, station_key=None, options=()):
+        """Plays `url_string`. `options` are extra libvlc media options such as ':network-caching=1500'."""
         self.stop()
         self.current_url = url_string
-        logging.info(f"Playing with VLC: {url_string}")
-        media = self.vlc_instance.media_new(url_string)
+        self.current_station = station_key
+        logging.info(f"Playing with VLC: {url_string} {' '.join(options)}")
+        media = self.vlc_instance.media_new(url_string, *options)
         self.vlc_player.set_media(media)
+        # The player holds its own reference; dropping ours lets libvlc free the
+        # previous media on the next zap instead of keeping every one alive.
+        media.release()
         self.vlc_player.play()
 
     def stop(self):
-        if self.vlc_player.is_playing():
+        # Also stop streams that are still opening or buffering, not just playing ones.
+        if vlc and self.vlc_player.get_state() in (vlc.State.Opening, vlc.State.Buffering,
+                                                    vlc.State.Playing, vlc.State.Paused):
             self.vlc_player.stop()
             self.current_url = None
 
     def is_playing(self):
         return self.vlc_player.is_playing()
 
-    def start_recording(self, output_path):
-        if not self.current_url:
-            logging.error("Cannot record: no stream is currently playing.")
-            return False
-
-        # Stop current playback before starting a recording stream
-        self.stop()
+    def get_input_stats(self):
+        """Returns libvlc's input statistics for the current media, or None."""
+        media = self.vlc_player.get_media()
+        if media is None:
+            return None
+        stats = vlc.MediaStats()
+        # get_media() returns a new reference, released here since this runs every few seconds.
+        found = media.get_stats(stats)
+        media.release()
+        if not found:
+            return None
+        return {
+            "read_bytes": stats.read_bytes,
+            "input_bitrate": stats.input_bitrate,
+            "demux_read_bytes": stats.demux_read_bytes,
+            "demux_corrupted": stats.demux_corrupted,
+            "demux_discontinuity": stats.demux_discontinuity,
+            "lost_abuffers": stats.lost_abuffers,
+        }
 
-        sout_options = f'#transcode{{acodec=mp3,ab=128}}:std{{access=file,mux=ts,dst="{output_path}"}}'
-        media = self.vlc_instance.media_new(self.current_url, f'sout={sout_options}', 'sout-keep')
+    def start_dead_air_monitor(self, url, min_seconds):
+        """
+        Listens to `url`, a local copy of the current stream, for sustained silence on
+        this player's libvlc instance. Reported as 'dead_air' and 'dead_air_ended'
+        events whose data is the seconds of silence.
+        """
+        if self.dead_air is None:
+            self.dead_air = DeadAirMonitor(
+                self.vlc_instance,
+                on_silence=lambda station, seconds: self._emit("dead_air", seconds, station),
+                on_sound=lambda station, seconds: self._emit("dead_air_ended", seconds, station))
+        self.dead_air.min_seconds = min_seconds
+        self.dead_air.start(url, self.current_station)
 
-        self.vlc_player.set_media(media)
-        self.vlc_player.play()
-
-        self.is_rec = True
-        logging.info(f"Started recording to {output_path}")
-        return True
-
-    def stop_recording(self):
-        self.stop() # Stopping the player will stop the recording
-        self.is_rec = False
-        logging.info("Stopped recording.")
-
-    def is_recording(self):
-        return self.is_rec
+    def stop_dead_air_monitor(self):
+        if self.dead_air is not None:
+            self.dead_air.stop()
 
     def set_volume(self, volume):
         self.vlc_player.audio_set_volume(volume)
-            
+
     def get_volume(self):
         return self.vlc_player.audio_get_volume()
 
@@ -69,4 +130,41 @@ class Player:
 
     def connect_error_handler(self, handler):
         event_manager = self.vlc_player.event_manager()
-        event_manager.event_attach(vlc.EventType.MediaPlayerEncounteredError, handler)
\ No newline at end of file
+        event_manager.event_attach(vlc.EventType.MediaPlayerEncounteredError, handler)
+
+    def add_event_listener(self, listener):
+        """
+        Registers `listener(event_name, station_key, data, timestamp)` for playback events.
+        Event names are 'opening', 'buffering', 'playing', 'error', 'ended' and 'stopped',
+        plus 'dead_air' and 'dead_air_ended' from the dead-air monitor; `data` is the
+        cache fill percentage for 'buffering', the seconds of silence for the dead-air
+        events, and None otherwise.
+        Listeners run on a libvlc thread and must return quickly.
+        """
+        self._event_listeners.append(listener)
+
+    def _attach_events(self):
+        event_manager = self.vlc_player.event_manager()
+        events = {
+            vlc.EventType.MediaPlayerOpening: "opening",
+            vlc.EventType.MediaPlayerBuffering: "buffering",
+            vlc.EventType.MediaPlayerPlaying: "playing",
+            vlc.EventType.MediaPlayerEncounteredError: "error",
+            vlc.EventType.MediaPlayerEndReached: "ended",
+            vlc.EventType.MediaPlayerStopped: "stopped",
+        }
+        for event_type, name in events.items():
+            event_manager.event_attach(event_type, self._on_vlc_event, name)
+
+    def _on_vlc_event(self, event, name):
+        data = event.u.new_cache if name == "buffering" else None
+        self._emit(name, data)
+
+    def _emit(self, name, data=None, station_key=None):
+        timestamp = time.monotonic()
+        station_key = station_key or self.current_station
+        for listener in self._event_listeners:
+            try:
+                listener(name, station_key, data, timestamp)
+            except Exception as e:
+                logging.error(f"Player event listener failed on '{name}': {e}")
@@ -0,0 +1,321 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import re
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from settings import get_imported_stations_path
+from stations import station_urls
+
+STREAM_SCHEMES = ("http", "https", "mms", "mmsh", "rtsp", "rtmp")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+READ_CHUNK_SIZE = 64 * 1024
+# A single JSON array element larger than this (in characters) is treated as a malformed file.
+MAX_ELEMENT_SIZE = 32 * 1024 * 1024
+# Imported entries are appended to the store in batches; an interrupted import keeps what was written.
+WRITE_BATCH = 1000
+PROGRESS_EVERY = 5000
+
+# The title follows the first comma that is not inside a quoted attribute.
+_EXTINF = re.compile(r'#EXTINF:((?:[^,"]|"[^"]*")*),(.*)')
+_GROUP_TITLE = re.compile(r'group-title="([^"]*)"')
+_PLS_ENTRY = re.compile(r"(File|Title)(\d+)=(.*)", re.IGNORECASE)
+
+
+class PlaylistImportError(Exception):
+    """Raised when a playlist file cannot be read or is not in a known format."""
+
+
+def normalize_url(url):
+    """
+    Returns the canonical form of a stream URL used for de-duplication, or None if
+    it is not a network stream. Scheme and host are lowercased, default ports and
+    fragments dropped; the path and query are kept as they are.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in STREAM_SCHEMES or not parts.hostname:
+        return None
+    netloc = parts.hostname
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def url_key(url):
+    """An 8-byte digest of a normalized URL; a set of these indexes a large catalog in little memory."""
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+
+
+def iter_m3u(lines):
+    """Yields (name, url, group) from M3U/M3U8 lines, using #EXTINF titles and group-title when present."""
+    name = group = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            match = _EXTINF.match(line)
+            if match:
+                group = _GROUP_TITLE.search(match.group(1))
+                group, name = group.group(1) if group else None, match.group(2).strip()
+            continue
+        yield name, line, group
+        name = group = None
+
+
+def iter_pls(lines):
+    """Yields (name, url, None) from PLS lines. An entry is complete once a later entry number starts."""
+    pending = {}
+    current = None
+    for line in lines:
+        match = _PLS_ENTRY.match(line.strip())
+        if not match:
+            continue
+        key, number, value = match.group(1).lower(), int(match.group(2)), match.group(3).strip()
+        if current is not None and number != current and current in pending:
+            entry = pending.pop(current)
+            if entry.get("file"):
+                yield entry.get("title"), entry["file"], None
+        current = number
+        pending.setdefault(number, {})[key] = value
+    for number in sorted(pending):
+        entry = pending[number]
+        if entry.get("file"):
+            yield entry.get("title"), entry["file"], None
+
+
+def _iter_station_objects(item, group):
+    """Yields (name, url, group) for a station object, a bare URL string, or a category with stations."""
+    if isinstance(item, str):
+        yield None, item, group
+    elif isinstance(item, dict):
+        if isinstance(item.get("stations"), list):
+            for station in item["stations"]:
+                yield from _iter_station_objects(station, item.get("name") or group)
+            return
+        name = item.get("name") or item.get("title")
+        group = item.get("category") or item.get("group") or group
+        for url in station_urls(item):
+            yield name, url, group
+
+
+def iter_jsonl(lines):
+    """Yields (name, url, group) from JSON Lines, one station object per line; bad lines are skipped."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        yield from _iter_station_objects(item, None)
+
+
+def iter_json_array(f):
+    """
+    Yields the elements of the first JSON array in `f` one at a time, reading it in
+    chunks. This covers a bare list of stations and the catalog layout
+    {"categories": [...]}, without holding the whole document in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        buffer = buffer[position:]
+        position = 0
+        if len(buffer) > MAX_ELEMENT_SIZE:
+            raise PlaylistImportError("The JSON station list is not valid or holds an oversized entry.")
+        # Double the read while one element spans many chunks, so it is re-decoded only a few times.
+        chunk = f.read(max(READ_CHUNK_SIZE, len(buffer)))
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    while "[" not in buffer:
+        if eof:
+            return
+        fill()
+    position = buffer.index("[") + 1
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                raise PlaylistImportError("The JSON document ends inside the station list.")
+            fill()
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise PlaylistImportError("The JSON station list is not valid.")
+            fill()
+            continue
+        position = end
+        yield item
+
+
+def iter_playlist(path):
+    """Picks a parser from the file extension and yields (name, url, group) entries from `path`."""
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+            if extension in (".m3u", ".m3u8"):
+                yield from iter_m3u(f)
+            elif extension == ".pls":
+                yield from iter_pls(f)
+            elif extension in (".jsonl", ".ndjson"):
+                yield from iter_jsonl(f)
+            elif extension == ".json":
+                for item in iter_json_array(f):
+                    yield from _iter_station_objects(item, None)
+            else:
+                raise PlaylistImportError(f"Unsupported playlist format: {extension or path}")
+    except OSError as e:
+        raise PlaylistImportError(f"Could not read {path}: {e}")
+
+
+def iter_imported_entries(path=None):
+    """
+    Yields (category, name, url) from the imported stations store. Lines torn by an
+    interrupted import, including a multi-byte character cut in half, are skipped.
+    """
+    path = path or get_imported_stations_path()
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    category, name, url = entry["category"], entry["name"], entry["url"]
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    continue
+                if isinstance(category, str) and isinstance(url, str):
+                    yield category, name, url
+    except OSError as e:
+        logging.error(f"Could not read imported stations: {e}")
+
+
+def load_imported_categories(path=None):
+    """Reads the imported stations store back into catalog categories, marked with "imported": True."""
+    categories = {}
+    for name, station_name, url in iter_imported_entries(path):
+        category = categories.get(name)
+        if category is None:
+            category = categories[name] = {"name": name, "stations": [], "imported": True}
+        category["stations"].append({"name": station_name, "url": url})
+    return list(categories.values())
+
+
+def merge_categories(categories, imported):
+    """Appends imported categories to the catalog, joining imported categories of the same name."""
+    merged = list(categories)
+    by_name = {category["name"]: i for i, category in enumerate(merged) if category.get("imported")}
+    for category in imported:
+        i = by_name.get(category["name"])
+        if i is None:
+            by_name[category["name"]] = len(merged)
+            merged.append(category)
+        else:
+            merged[i] = dict(merged[i], stations=merged[i]["stations"] + category["stations"])
+    return merged
+
+
+class PlaylistImporter:
+    """
+    Background job (run via TaskExecutor) that merges a user playlist into the station list.
+
+    The file is parsed as a stream, so lists with tens of thousands of entries are
+    never loaded whole. URLs are normalized and checked against a hash index of
+    the catalog and of the store itself, so earlier imports are recognised even
+    when the catalog could not be loaded. New stations are appended
+    to the imported stations store as they are found.
+    """
+
+    def __init__(self, path, categories, store_path=None, on_progress=None):
+        self.path = path
+        self.categories = categories
+        self.store_path = store_path or get_imported_stations_path()
+        self.on_progress = on_progress
+
+    def _build_index(self):
+        urls = (url for category in self.categories for station in category.get("stations", [])
+                for url in station_urls(station))
+        index = set()
+        for url in itertools.chain(urls, (url for _, _, url in iter_imported_entries(self.store_path))):
+            normalized = normalize_url(url)
+            if normalized:
+                index.add(url_key(normalized))
+        return index
+
+    def _ends_with_newline(self):
+        with open(self.store_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def __call__(self, token):
+        """Returns a report with the counts, the throughput and the new stations as categories."""
+        started = time.perf_counter()
+        index = self._build_index()
+        default_group = os.path.splitext(os.path.basename(self.path))[0]
+        added = {}
+        batch = []
+        report = {"entries": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+        with open(self.store_path, "a", encoding="utf-8") as store:
+            # Start on a fresh line if an earlier import was cut off mid-write.
+            if store.tell() and not self._ends_with_newline():
+                store.write("\n")
+            for name, url, group in iter_playlist(self.path):
+                report["entries"] += 1
+                if report["entries"] % PROGRESS_EVERY == 0:
+                    token.raise_if_cancelled()
+                    if self.on_progress:
+                        self.on_progress(report["entries"])
+                normalized = normalize_url(url)
+                if normalized is None:
+                    report["invalid"] += 1
+                    continue
+                key = url_key(normalized)
+                if key in index:
+                    report["duplicates"] += 1
+                    continue
+                index.add(key)
+                category = group or default_group
+                name = name or urlsplit(normalized).hostname
+                added.setdefault(category, []).append({"name": name, "url": url.strip()})
+                batch.append(json.dumps({"category": category, "name": name, "url": url.strip()},
+                                        ensure_ascii=False, separators=(",", ":")))
+                if len(batch) >= WRITE_BATCH:
+                    store.write("\n".join(batch) + "\n")
+                    batch = []
+                report["imported"] += 1
+            if batch:
+                store.write("\n".join(batch) + "\n")
+        seconds = time.perf_counter() - started
+        report["seconds"] = round(seconds, 3)
+        report["entries_per_second"] = round(report["entries"] / seconds) if seconds else None
+        report["categories"] = [{"name": name, "stations": stations, "imported": True}
+                                for name, stations in added.items()]
+        logging.info(f"Imported {report['imported']} of {report['entries']} stations from {self.path} "
+                     f"({report['duplicates']} duplicates, {report['invalid']} invalid) in {seconds:.2f}s")
+        return report
@@ -1,34 +1,46 @@
 import wx
 
 class TimedPopup(wx.Frame):
+    """
+    A short on-screen announcement that hides itself after `duration_ms`.
+    The window keeps one popup and calls show_message() again for later
+    announcements, rather than creating a frame each time.
+    """
+
     def __init__(self, parent, message, duration_ms=2000):
         style = wx.FRAME_SHAPED | wx.SIMPLE_BORDER | wx.STAY_ON_TOP
         super().__init__(parent, style=style)
 
         self.SetBackgroundColour(wx.BLACK)
 
-        text = wx.StaticText(self, label=message)
-        text.SetForegroundColour(wx.WHITE)
+        self.text = wx.StaticText(self, label=message)
+        self.text.SetForegroundColour(wx.WHITE)
         font = wx.Font(14, wx.FONTFAMILY_DEFAULT, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD)
-        text.SetFont(font)
+        self.text.SetFont(font)
 
         sizer = wx.BoxSizer(wx.VERTICAL)
-        sizer.Add(text, 1, wx.EXPAND | wx.ALL, 20)
-        self.SetSizerAndFit(sizer)
+        sizer.Add(self.text, 1, wx.EXPAND | wx.ALL, 20)
+        self.SetSizer(sizer)
+
+        # Set a timer to hide the popup
+        self.timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
+
+        self.show_message(message, duration_ms)
+
+    def show_message(self, message, duration_ms=2000):
+        self.text.SetLabel(message)
+        self.Fit()
 
         # Center on the parent window
-        parent_rect = parent.GetScreenRect()
+        parent_rect = self.GetParent().GetScreenRect()
         self_rect = self.GetRect()
         pos_x = parent_rect.x + (parent_rect.width - self_rect.width) // 2
         pos_y = parent_rect.y + (parent_rect.height - self_rect.height) // 2
         self.SetPosition((pos_x, pos_y))
 
         self.Show()
-
-        # Set a timer to close the popup
-        self.timer = wx.Timer(self)
-        self.Bind(wx.EVT_TIMER, self.on_timer, self.timer)
         self.timer.StartOnce(duration_ms)
 
     def on_timer(self, event):
-        self.Close()
+        self.Hide()
@@ -0,0 +1,329 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from settings import get_postprocess_jobs_path, load_json_file, save_json_file
+
+try:
+    import wx
+except ImportError:
+    wx = None
+
+# Output format -> (transcode acodec, std mux, file extension)
+FORMATS = {
+    "mp3": ("mp3", "dummy", "mp3"),
+    "ogg": ("vorb", "ogg", "ogg"),
+    "aac": ("mp4a", "mp4", "m4a"),
+    "flac": ("flac", "raw", "flac"),
+}
+
+PROGRESS_INTERVAL_SECONDS = 0.5
+JOB_TIMEOUT_SECONDS = 6 * 3600
+# A job whose worker keeps dying (libvlc crashing on the file) is failed after this many starts.
+MAX_ATTEMPTS = 3
+# Finished jobs are kept in the journal this long for reporting.
+JOURNAL_RETENTION_SECONDS = 7 * 24 * 3600
+
+_progress_queue = None
+
+
+def _init_worker(progress_queue):
+    """Runs in each pool process: announces its pid and lowers its priority so playback always wins."""
+    global _progress_queue
+    _progress_queue = progress_queue
+    progress_queue.put(("worker", os.getpid()))
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            os.nice(10)
+    except (OSError, AttributeError):
+        pass
+
+
+def _report_progress(job_id, fraction):
+    if _progress_queue is not None:
+        _progress_queue.put(("progress", job_id, fraction))
+
+
+def _source_files(source):
+    """Returns the media files behind `source`, expanding a recording index into its segments."""
+    if source.endswith(".index.json"):
+        manifest = load_json_file(source) or {}
+        directory = os.path.dirname(source)
+        return [os.path.join(directory, s["file"]) for s in manifest.get("segments", [])]
+    return [source]
+
+
+def _run_job(job):
+    """Executes one conversion inside a pool process. Returns the CPU seconds it used."""
+    import vlc
+
+    cpu_start = time.process_time()
+    output_part = f"{job['output']}.part"
+    files = _source_files(job["source"])
+    if not files:
+        raise ValueError("Recording contains no segments.")
+
+    # Raw MP3/AAC/TS captures can be joined byte-wise before decoding.
+    source = files[0]
+    joined = None
+    if len(files) > 1:
+        joined = f"{job['output']}.src.part"
+        with open(joined, "wb") as out:
+            for path in files:
+                with open(path, "rb") as f:
+                    while True:
+                        chunk = f.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+        source = joined
+
+    acodec, mux, _ = FORMATS[job["format"]]
+    transcode = f"acodec={acodec},ab={job['bitrate']}"
+    if job.get("normalize"):
+        transcode += ",afilter=normvol"
+    dst = output_part.replace("\\", "/")
+    sout = f'#transcode{{{transcode}}}:std{{access=file,mux={mux},dst="{dst}"}}'
+    options = [f"sout={sout}", "no-sout-all", "sout-keep"]
+    if job.get("trim_start"):
+        options.append(f"start-time={job['trim_start']}")
+    if job.get("trim_end"):
+        options.append(f"stop-time={job['trim_end']}")
+
+    instance = vlc.Instance("--quiet", "--no-video", "--aout=dummy")
+    player = instance.media_player_new()
+    media = instance.media_new(source, *options)
+    player.set_media(media)
+    media.release()
+    player.play()
+
+    finished_states = (vlc.State.Ended, vlc.State.Error, vlc.State.Stopped)
+    deadline = time.monotonic() + JOB_TIMEOUT_SECONDS
+    try:
+        while time.monotonic() < deadline:
+            time.sleep(PROGRESS_INTERVAL_SECONDS)
+            state = player.get_state()
+            if state in finished_states:
+                break
+            _report_progress(job["id"], max(0.0, player.get_position()))
+        else:
+            raise TimeoutError("Conversion did not finish in time.")
+        if state == vlc.State.Error:
+            raise RuntimeError("libvlc failed to convert the recording.")
+    finally:
+        player.stop()
+        player.release()
+        instance.release()
+        if joined and os.path.exists(joined):
+            os.remove(joined)
+
+    os.replace(output_part, job["output"])
+    _report_progress(job["id"], 1.0)
+    return time.process_time() - cpu_start
+
+
+class PostProcessQueue:
+    """
+    Converts recordings offline in a small pool of low-priority processes.
+
+    Jobs are journalled to disk before they start. Output is written to a `.part`
+    file and renamed only on success, so a crash or a closed app simply leaves the
+    job pending; it is picked up again the next time the queue is created, up to
+    MAX_ATTEMPTS starts. A worker that crashes breaks the pool, which is then
+    replaced. Progress and completion callbacks are delivered on the UI thread.
+    """
+
+    def __init__(self, max_workers=1, on_progress=None, on_finished=None, call_after=None):
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+        self._call_after = call_after or (wx.CallAfter if wx else None)
+        self._lock = threading.Lock()
+        self._jobs = load_json_file(get_postprocess_jobs_path(), {}) or {}
+        cutoff = time.time() - JOURNAL_RETENTION_SECONDS
+        self._jobs = {job_id: job for job_id, job in self._jobs.items()
+                      if job["state"] in ("pending", "running") or job["created_at"] > cutoff}
+        self._closed = False
+        self._max_workers = max_workers
+        # Pool processes announce themselves from _init_worker, so shutdown can stop them.
+        self._worker_pids = set()
+        self._progress_queue = multiprocessing.Queue()
+        self._pool = self._new_pool()
+        self._listener = threading.Thread(target=self._listen_progress, name="postprocess-progress", daemon=True)
+        self._listener.start()
+        self._resume()
+
+    def enqueue(self, source, output=None, format="mp3", bitrate=128, normalize=True,
+                trim_start=None, trim_end=None):
+        """Adds a conversion job and returns its id."""
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported output format: {format}")
+        if output is None:
+            base = source[:-len(".index.json")] if source.endswith(".index.json") else os.path.splitext(source)[0]
+            output = f"{base}_converted.{FORMATS[format][2]}"
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "source": source,
+            "output": output,
+            "format": format,
+            "bitrate": bitrate,
+            "normalize": normalize,
+            "trim_start": trim_start,
+            "trim_end": trim_end,
+            "state": "pending",
+            "progress": 0.0,
+            "cpu_time": None,
+            "attempts": 0,
+            "error": None,
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._jobs[job["id"]] = job
+        self._save()
+        self._submit(job)
+        return job["id"]
+
+    def get_jobs(self):
+        with self._lock:
+            return [dict(job) for job in self._jobs.values()]
+
+    def shutdown(self):
+        """
+        Stops the pool without waiting for running conversions. Their journal entries
+        stay 'running', so they are resumed on the next start.
+        """
+        self._closed = True
+        self._save()
+        # ProcessPoolExecutor has no public way to abandon running work; terminate the
+        # children so closing the app never waits for a long conversion.
+        with self._lock:
+            pids = list(self._worker_pids)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        self._progress_queue.put(None)
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self._max_workers, initializer=_init_worker,
+                                   initargs=(self._progress_queue,))
+
+    def _submit_to_pool(self, job):
+        pool = self._pool
+        try:
+            return pool.submit(_run_job, dict(job))
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    logging.warning("A post-processing worker died; starting a new pool.")
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._worker_pids.clear()
+                    self._pool = self._new_pool()
+            return self._pool.submit(_run_job, dict(job))
+
+    def _resume(self):
+        with self._lock:
+            unfinished = [job for job in self._jobs.values() if job["state"] in ("pending", "running")]
+        for job in unfinished:
+            logging.info(f"Resuming post-processing job {job['id']} ({job['attempts']} previous attempts).")
+            job["state"] = "pending"
+            job["progress"] = 0.0
+            self._submit(job)
+
+    def _submit(self, job):
+        if job["attempts"] >= MAX_ATTEMPTS:
+            self._finish(job["id"], error=f"Gave up after {job['attempts']} attempts; the conversion keeps crashing.")
+            return
+        with self._lock:
+            job["state"] = "running"
+            job["attempts"] += 1
+        self._save()
+        try:
+            future = self._submit_to_pool(job)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._finish(job["id"], error=f"Could not start the conversion: {e}")
+            return
+        future.add_done_callback(lambda f, job_id=job["id"]: self._job_done(job_id, f))
+
+    def _job_done(self, job_id, future):
+        if self._closed or future.cancelled():
+            return
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # A worker died, maybe while running another job; this one is tried again.
+            logging.error(f"Post-processing job {job_id} lost its worker: {error}")
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                self._submit(job)
+            return
+        if error is not None:
+            self._finish(job_id, error=str(error))
+        else:
+            self._finish(job_id, cpu_time=future.result())
+
+    def _finish(self, job_id, cpu_time=None, error=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if error is None:
+                job["cpu_time"] = round(cpu_time, 3)
+                job["state"] = "done"
+                job["progress"] = 1.0
+                logging.info(f"Post-processing job {job_id} done; CPU time {job['cpu_time']}s.")
+            else:
+                job["state"] = "failed"
+                job["error"] = error
+                logging.error(f"Post-processing job {job_id} failed: {error}")
+            result = dict(job)
+        self._save()
+        if self.on_finished:
+            self._deliver(self.on_finished, result)
+
+    def _listen_progress(self):
+        while True:
+            try:
+                item = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            if item[0] == "worker":
+                with self._lock:
+                    self._worker_pids.add(item[1])
+                continue
+            _, job_id, fraction = item
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None:
+                    continue
+                job["progress"] = round(fraction, 3)
+            if self.on_progress:
+                self._deliver(self.on_progress, job_id, fraction)
+
+    def _deliver(self, callback, *args):
+        if self._closed:
+            return
+        if self._call_after is None:
+            callback(*args)
+        else:
+            self._call_after(callback, *args)
+
+    def _save(self):
+        with self._lock:
+            data = {job_id: dict(job) for job_id, job in self._jobs.items()}
+        save_json_file(get_postprocess_jobs_path(), data)
@@ -1,6 +1,12 @@
+import time
+
+# Taken before the heavy imports, for the launch-to-first-audio measurement.
+LAUNCHED_AT = time.monotonic()
+
 import sys
 import os
 import logging
+import multiprocessing
 import wx
 import vlc
 
@@ -9,6 +15,7 @@ from main_window import RadioWindow
 from sound_manager import SoundManager
 from splash_screen import SplashScreen
 from constants import CURRENT_VERSION
+from updater import apply_staged_update, remove_old_files, restart_application, updates_supported
 
 def setup_logging():
     """Configures the logging system manually to use the custom formatter."""
@@ -34,6 +41,12 @@ def main():
     """Main function to run the application."""
     setup_logging()
     logging.info("Application starting...")
+    if updates_supported():
+        if apply_staged_update():
+            # The new files are in place; start them instead of this copy.
+            restart_application()
+            return
+        remove_old_files()
     app = wx.App(False)
 
     # Show splash screen
@@ -51,15 +64,14 @@ def main():
         wx.MessageBox(f"فشل تهيئة المكونات الأساسية. لا يمكن تشغيل التطبيق.\n\nخطأ: {e}", "خطأ فادح", wx.OK | wx.ICON_ERROR)
         return
 
-    # Wait for splash screen to finish
-    wx.Sleep(3)
-    splash.Destroy()
-
-    # Create and show the main window
-    window = RadioWindow(vlc_instance=vlc_instance, sound_manager=sound_manager)
+    # Create and show the main window; the splash stays up only while it is being built.
+    window = RadioWindow(vlc_instance=vlc_instance, sound_manager=sound_manager, launched_at=LAUNCHED_AT)
     window.Show()
+    splash.Destroy()
     
     app.MainLoop()
 
 if __name__ == '__main__':
+    # Needed for the post-processing process pool in frozen builds.
+    multiprocessing.freeze_support()
     main()
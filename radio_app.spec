@@ -1,5 +1,7 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# One-folder build: updates replace only the files whose hashes changed
+# (see updater.py), so the VLC plugins are not downloaded again every release.
 a = Analysis(
     ['radio_app.py'],
     pathex=[],
@@ -18,20 +20,27 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='radio_app',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
     upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
     target_arch=None,
     codesign_identity=None,
     entitlements_file=None,
-)
\ No newline at end of file
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='radio_app',
+)
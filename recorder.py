@@ -0,0 +1,395 @@
+import logging
+import os
+import queue
+import re
+import time
+from datetime import datetime
+from urllib.parse import urljoin, urlsplit
+
+import requests
+
+import network_meter
+from data_saver import parse_hls_variants
+from playlist_import import iter_m3u, iter_pls
+from settings import load_json_file, save_json_file
+from task_executor import TaskExecutor, TaskCancelled
+
+CHUNK_SIZE = 64 * 1024
+RECONNECT_DELAY_SECONDS = 5
+# The manifest is rewritten this often while a segment grows, so a crash loses at most this much of the index.
+MANIFEST_SAVE_SECONDS = 10
+# A station URL may point at a playlist; recording its text would be useless, so it is followed instead.
+PLAYLIST_TYPES = ("audio/x-scpls", "audio/x-mpegurl", "audio/mpegurl", "application/x-mpegurl",
+                  "application/vnd.apple.mpegurl", "application/vnd.apple.mpegurl.audio")
+PLAYLIST_EXTENSIONS = (".pls", ".m3u", ".m3u8")
+MAX_PLAYLIST_BYTES = 1024 * 1024
+MAX_PLAYLIST_DEPTH = 3
+# 408 and 429 ask the client to come back later; other 4xx answers will not change on a retry.
+RETRYABLE_CLIENT_ERRORS = (408, 429)
+
+_MEDIA_SEQUENCE = re.compile(r"#EXT-X-MEDIA-SEQUENCE:(\d+)")
+_TARGET_DURATION = re.compile(r"#EXT-X-TARGETDURATION:(\d+)")
+_KEY_METHOD = re.compile(r"#EXT-X-KEY:.*METHOD=([A-Z0-9-]+)")
+
+_EXTENSIONS = {
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/aac": "aac",
+    "audio/aacp": "aac",
+    "audio/x-aac": "aac",
+    "audio/ogg": "ogg",
+    "application/ogg": "ogg",
+    "audio/flac": "flac",
+}
+
+
+class RecordingPolicy:
+    """Segment boundaries and retention limits. A limit of 0 means unlimited."""
+
+    def __init__(self, segment_seconds=3600, segment_bytes=200 * 1024 * 1024,
+                 retention_bytes=0, retention_seconds=0):
+        self.segment_seconds = segment_seconds
+        self.segment_bytes = segment_bytes
+        self.retention_bytes = retention_bytes
+        self.retention_seconds = retention_seconds
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            segment_seconds=settings.get("recording_segment_minutes", 60) * 60,
+            segment_bytes=settings.get("recording_segment_mb", 200) * 1024 * 1024,
+            retention_bytes=settings.get("recording_retention_mb", 0) * 1024 * 1024,
+            retention_seconds=settings.get("recording_retention_days", 0) * 24 * 3600,
+        )
+
+
+class RecordingError(Exception):
+    """Raised when a stream cannot be recorded and reconnecting would not help."""
+
+
+def _mime(content_type):
+    return (content_type or "").split(";")[0].strip().lower()
+
+
+def _extension_for(content_type):
+    return _EXTENSIONS.get(_mime(content_type), "ts")
+
+
+def _is_playlist(url, content_type):
+    mime = _mime(content_type)
+    if mime in PLAYLIST_TYPES:
+        return True
+    # Servers often label playlists text/plain or octet-stream; trust the extension unless it is plainly audio.
+    return urlsplit(url).path.lower().endswith(PLAYLIST_EXTENSIONS) and mime not in _EXTENSIONS
+
+
+def _is_client_error(error):
+    status = error.response.status_code if error.response is not None else None
+    return status is not None and 400 <= status < 500 and status not in RETRYABLE_CLIENT_ERRORS
+
+
+def _read_playlist(response):
+    data = bytearray()
+    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+        network_meter.count_bytes(len(chunk))
+        data += chunk
+        if len(data) > MAX_PLAYLIST_BYTES:
+            raise RecordingError("The station playlist is too large.")
+    return data.decode("utf-8", errors="replace")
+
+
+def parse_hls_media_playlist(text, base_url):
+    """
+    Returns (first_sequence, target_seconds, segment_urls, ended, key_method) from an
+    HLS media playlist. `key_method` is None unless the segments are encrypted.
+    """
+    sequence = _MEDIA_SEQUENCE.search(text)
+    target = _TARGET_DURATION.search(text)
+    key = _KEY_METHOD.search(text)
+    urls = [urljoin(base_url, line.strip()) for line in text.splitlines()
+            if line.strip() and not line.startswith("#")]
+    key_method = key.group(1) if key and key.group(1) != "NONE" else None
+    return (int(sequence.group(1)) if sequence else 0, int(target.group(1)) if target else 10,
+            urls, "#EXT-X-ENDLIST" in text, key_method)
+
+
+def _now_iso():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class SegmentedRecorder:
+    """
+    Captures a stream as raw bytes into a series of segment files.
+
+    Segments roll over on a time or size boundary and are listed, with timestamps
+    and sizes, in a `<base>.index.json` manifest next to them. A segment is listed
+    as soon as it opens and its end, size and the manifest's `ended_at` are
+    refreshed every few seconds, so the index survives a crash. PLS and M3U
+    playlists are followed to the stream they name and HLS is captured segment by
+    segment. Old segments are deleted once the total size or age exceeds the
+    policy. All network and file work happens on a dedicated worker thread;
+    `start` and `stop` never block. HTTP client errors end the recording with a
+    RecordingError instead of being retried.
+
+    `feed_source`, when given, returns the relay or timeshift StreamFeed already
+    fetching `url`, or None. The recording then subscribes to that feed instead of
+    opening a second connection to the station, and only fetches `url` itself
+    while no feed is available.
+    """
+
+    def __init__(self, url, base_path, policy=None, station_name=None, feed_source=None):
+        self.url = url
+        self.feed_source = feed_source
+        self.directory = os.path.dirname(os.path.abspath(base_path))
+        self.base_name = os.path.splitext(os.path.basename(base_path))[0]
+        self.policy = policy or RecordingPolicy()
+        self.station_name = station_name
+        self.manifest_path = os.path.join(self.directory, f"{self.base_name}.index.json")
+        self.manifest = None
+        self._executor = TaskExecutor(max_workers=1, max_queue=1, name="recorder")
+        self._task = None
+        self._file = None
+        self._segment = None
+        self._segment_opened = None
+        self._saved_at = 0.0
+
+    def start(self, on_finished=None, on_error=None):
+        self._task = self._executor.submit(self._capture, on_success=on_finished, on_error=on_error)
+
+    def stop(self):
+        """Requests the capture to finish; the current segment is closed by the worker."""
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    def is_running(self):
+        return self._task is not None and not self._task.is_done()
+
+    def _capture(self, token):
+        os.makedirs(self.directory, exist_ok=True)
+        self.manifest = load_json_file(self.manifest_path) or {
+            "station": self.station_name,
+            "url": self.url,
+            "started_at": _now_iso(),
+            "ended_at": None,
+            "segments": [],
+            "deleted_segments": 0,
+        }
+        discontinuity = False
+        try:
+            while not token.is_cancelled():
+                try:
+                    feed = self.feed_source() if self.feed_source else None
+                    if feed is not None:
+                        self._capture_feed(token, feed, discontinuity)
+                    elif self._capture_connection(token, self.url, discontinuity):
+                        break
+                except requests.exceptions.HTTPError as e:
+                    if _is_client_error(e):
+                        raise RecordingError(f"The server refused the stream: {e}")
+                    logging.warning(f"Recording connection failed: {e}. Reconnecting in {RECONNECT_DELAY_SECONDS}s.")
+                except requests.exceptions.RequestException as e:
+                    logging.warning(f"Recording connection lost: {e}. Reconnecting in {RECONNECT_DELAY_SECONDS}s.")
+                self._close_segment()
+                discontinuity = True
+                if token.wait(RECONNECT_DELAY_SECONDS):
+                    break
+        except TaskCancelled:
+            pass
+        finally:
+            self._close_segment()
+            self._save_manifest()
+            logging.info(f"Recording finished: {len(self.manifest['segments'])} segments in {self.manifest_path}")
+        return self.manifest_path
+
+    def _capture_connection(self, token, url, discontinuity, depth=0):
+        """Records one connection to `url`; returns True when the stream has ended for good."""
+        with requests.get(url, stream=True, timeout=(10, 30)) as response:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type")
+            if _is_playlist(response.url, content_type):
+                text = _read_playlist(response)
+                if "#EXT-X-TARGETDURATION" in text or "#EXT-X-STREAM-INF" in text:
+                    return self._capture_hls(token, response.url, text, discontinuity)
+                return self._follow_playlist(token, response.url, text, discontinuity, depth)
+            extension = _extension_for(content_type)
+            self.manifest["content_type"] = content_type
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                token.raise_if_cancelled()
+                if chunk:
+                    network_meter.count_bytes(len(chunk))
+                    self._write(chunk, extension, discontinuity)
+                    discontinuity = False
+        return False
+
+    def _capture_feed(self, token, feed, discontinuity):
+        """Records from a local StreamFeed until it ends or drops this listener."""
+        subscriber = feed.subscribe()
+        if subscriber is None:
+            logging.warning("Recording could not join the local feed of the station.")
+            return
+        try:
+            content_type = feed.headers.get("Content-Type")
+            extension = _extension_for(content_type)
+            self.manifest["content_type"] = content_type
+            while True:
+                token.raise_if_cancelled()
+                try:
+                    chunk = subscriber.queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if chunk is None:
+                    logging.warning("The local feed of the recorded station ended.")
+                    return
+                # The feed has already counted these bytes as they arrived.
+                self._write(chunk, extension, discontinuity)
+                discontinuity = False
+        finally:
+            feed.unsubscribe(subscriber)
+
+    def _follow_playlist(self, token, url, text, discontinuity, depth):
+        if depth >= MAX_PLAYLIST_DEPTH:
+            raise RecordingError("The station playlist does not lead to a stream.")
+        lines = text.splitlines()
+        entries = iter_pls(lines) if "[playlist]" in text.lower() else iter_m3u(lines)
+        for _, entry_url, _ in entries:
+            stream_url = urljoin(url, entry_url.strip())
+            logging.info(f"Recording {stream_url}, the first stream in {url}")
+            return self._capture_connection(token, stream_url, discontinuity, depth + 1)
+        raise RecordingError("The station playlist names no stream.")
+
+    def _fetch_playlist(self, url):
+        with requests.get(url, stream=True, timeout=(10, 30)) as response:
+            response.raise_for_status()
+            return _read_playlist(response)
+
+    def _capture_hls(self, token, url, text, discontinuity):
+        """Appends each new media segment of an HLS stream; returns True once the playlist ends."""
+        variants = parse_hls_variants(text, url)
+        if variants:
+            # A recording keeps the best rendition on offer.
+            url = max(variants)[1]
+            text = self._fetch_playlist(url)
+        extension = None
+        last_sequence = None
+        while True:
+            sequence, target, segment_urls, ended, key_method = parse_hls_media_playlist(text, url)
+            if key_method:
+                raise RecordingError(f"The stream is encrypted ({key_method}) and cannot be recorded as is.")
+            if last_sequence is not None and sequence > last_sequence + 1:
+                logging.warning(f"Recording missed HLS segments {last_sequence + 1}-{sequence - 1}.")
+                discontinuity = True
+            for number, segment_url in enumerate(segment_urls, sequence):
+                if last_sequence is not None and number <= last_sequence:
+                    continue
+                token.raise_if_cancelled()
+                try:
+                    with requests.get(segment_url, stream=True, timeout=(10, 30)) as response:
+                        response.raise_for_status()
+                        if extension is None:
+                            extension = _extension_for(response.headers.get("Content-Type"))
+                            self.manifest["content_type"] = response.headers.get("Content-Type")
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            token.raise_if_cancelled()
+                            if chunk:
+                                network_meter.count_bytes(len(chunk))
+                                self._write(chunk, extension, discontinuity)
+                                discontinuity = False
+                except requests.exceptions.HTTPError as e:
+                    if not _is_client_error(e):
+                        raise
+                    # A live playlist can list a segment the server has already dropped.
+                    logging.warning(f"Skipped HLS segment {number}: {e}")
+                    discontinuity = True
+                last_sequence = number
+            if ended:
+                return True
+            if token.wait(max(1.0, target / 2)):
+                return True
+            text = self._fetch_playlist(url)
+
+    def _write(self, chunk, extension, discontinuity):
+        if self._segment is None or self._segment_full():
+            self._close_segment()
+            self._open_segment(extension, discontinuity)
+        self._file.write(chunk)
+        self._segment["bytes"] += len(chunk)
+        if time.monotonic() - self._saved_at >= MANIFEST_SAVE_SECONDS:
+            self._save_manifest()
+
+    def _segment_full(self):
+        segment = self._segment
+        if self.policy.segment_bytes and segment["bytes"] >= self.policy.segment_bytes:
+            return True
+        if self.policy.segment_seconds and time.monotonic() - self._segment_opened >= self.policy.segment_seconds:
+            return True
+        return False
+
+    def _save_manifest(self):
+        now = _now_iso()
+        if self._segment is not None:
+            self._segment["end"] = now
+            self._segment["duration"] = round(time.monotonic() - self._segment_opened, 3)
+        self.manifest["ended_at"] = now
+        save_json_file(self.manifest_path, self.manifest)
+        self._saved_at = time.monotonic()
+
+    def _open_segment(self, extension, discontinuity):
+        segments = self.manifest["segments"]
+        index = segments[-1]["index"] + 1 if segments else 1
+        file_name = f"{self.base_name}_{index:04d}.{extension}"
+        self._file = open(os.path.join(self.directory, file_name), "wb")
+        now = _now_iso()
+        self._segment = {
+            "index": index,
+            "file": file_name,
+            "start": now,
+            "end": now,
+            "bytes": 0,
+            "duration": 0.0,
+            "discontinuity": discontinuity,
+        }
+        self._segment_opened = time.monotonic()
+        segments.append(self._segment)
+        self._save_manifest()
+        logging.debug(f"Recording segment {index} opened.")
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        self._file.close()
+        segment = self._segment
+        segment["end"] = _now_iso()
+        segment["duration"] = round(time.monotonic() - self._segment_opened, 3)
+        self._file = None
+        self._segment = None
+        if not segment["bytes"]:
+            self.manifest["segments"].remove(segment)
+            os.remove(os.path.join(self.directory, segment["file"]))
+        self._apply_retention()
+        self._save_manifest()
+
+    def _apply_retention(self):
+        segments = self.manifest["segments"]
+        now = datetime.now()
+
+        def expired(segment):
+            if not self.policy.retention_seconds:
+                return False
+            age = (now - datetime.fromisoformat(segment["end"])).total_seconds()
+            return age > self.policy.retention_seconds
+
+        def over_budget():
+            if not self.policy.retention_bytes:
+                return False
+            return sum(s["bytes"] for s in segments) > self.policy.retention_bytes
+
+        # Always keep the newest segment, whatever the limits say.
+        while len(segments) > 1 and (expired(segments[0]) or over_budget()):
+            oldest = segments.pop(0)
+            try:
+                os.remove(os.path.join(self.directory, oldest["file"]))
+            except OSError as e:
+                logging.warning(f"Could not delete old recording segment {oldest['file']}: {e}")
+            self.manifest["deleted_segments"] += 1
+            logging.info(f"Retention policy removed recording segment {oldest['file']}.")
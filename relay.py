@@ -0,0 +1,375 @@
+import argparse
+import collections
+import hashlib
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import requests
+
+import network_meter
+from stations import station_urls
+
+CHUNK_SIZE = 16 * 1024
+# Per-client buffer, in chunks. A client that falls this far behind is dropped.
+CLIENT_BUFFER_CHUNKS = 64
+# Recent chunks handed to a new client so its player can start without waiting.
+BURST_CHUNKS = 8
+CLIENT_SOCKET_BUFFER = 64 * 1024
+# How long an upstream connection stays open after its last listener leaves.
+IDLE_LINGER_SECONDS = 10
+RECONNECT_DELAY_SECONDS = 3
+
+_PASSTHROUGH_HEADERS = ("Content-Type", "icy-name", "icy-genre", "icy-br", "icy-description")
+
+
+def station_key(url):
+    """Returns a short stable identifier for a stream URL, shared by relay hosts and clients."""
+    return hashlib.sha1(url.strip().encode("utf-8")).hexdigest()[:12]
+
+
+def relay_supported(url):
+    """
+    Playlists (HLS, m3u, pls) are fetched piecewise by the player, with segment
+    addresses relative to the playlist, so they cannot be relayed as one stream.
+    """
+    path = urlsplit(url).path.lower()
+    return not path.endswith((".m3u8", ".m3u", ".pls"))
+
+
+def relay_stream_url(relay_url, url):
+    """Returns the address of `url` on the relay at `relay_url`."""
+    return f"{relay_url.rstrip('/')}/stream/{station_key(url)}"
+
+
+class _Subscriber:
+    def __init__(self, max_chunks):
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.dropped = False
+        self.bytes_sent = 0
+
+
+class StreamFeed:
+    """One upstream connection whose chunks are fanned out to any number of subscribers."""
+
+    def __init__(self, url, client_buffer_chunks=CLIENT_BUFFER_CHUNKS):
+        self.url = url
+        self.client_buffer_chunks = client_buffer_chunks
+        self.headers = {}
+        self.bytes_in = 0
+        self.dropped_clients = 0
+        self._subscribers = set()
+        self._burst = collections.deque(maxlen=BURST_CHUNKS)
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._idle_since = None
+        self._thread = threading.Thread(target=self._run, name="relay-feed", daemon=True)
+        self._thread.start()
+
+    def subscribe(self, timeout=10):
+        """Adds a listener. Returns None if the upstream could not be reached in time."""
+        if not self._ready.wait(timeout) or self._stop.is_set():
+            return None
+        subscriber = _Subscriber(self.client_buffer_chunks)
+        with self._lock:
+            for chunk in self._burst:
+                subscriber.queue.put_nowait(chunk)
+            self._subscribers.add(subscriber)
+            self._idle_since = None
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if not self._subscribers:
+                self._idle_since = time.monotonic()
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def close(self):
+        self._stop.set()
+        self._ready.set()
+
+    def _idle_expired(self):
+        with self._lock:
+            return self._idle_since is not None and time.monotonic() - self._idle_since > IDLE_LINGER_SECONDS
+
+    def _run(self):
+        self._idle_since = time.monotonic()
+        while not self._stop.is_set() and not self._idle_expired():
+            try:
+                with requests.get(self.url, stream=True, timeout=(10, 30)) as response:
+                    response.raise_for_status()
+                    self.headers = {h: response.headers[h] for h in _PASSTHROUGH_HEADERS if h in response.headers}
+                    self._ready.set()
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if self._stop.is_set() or self._idle_expired():
+                            break
+                        if chunk:
+                            self._publish(chunk)
+            except requests.exceptions.RequestException as e:
+                logging.warning(f"Relay upstream error: {e}")
+            if self._stop.wait(RECONNECT_DELAY_SECONDS if not self._idle_expired() else 0):
+                break
+        self._stop.set()
+        self._ready.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            self._end(subscriber)
+
+    def _publish(self, chunk):
+        self.bytes_in += len(chunk)
+        network_meter.count_bytes(len(chunk))
+        with self._lock:
+            self._burst.append(chunk)
+            slow = []
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.queue.put_nowait(chunk)
+                except queue.Full:
+                    slow.append(subscriber)
+            for subscriber in slow:
+                # Dropping a slow listener keeps everyone else real-time.
+                self._subscribers.discard(subscriber)
+                subscriber.dropped = True
+                self.dropped_clients += 1
+                self._end(subscriber)
+            if slow and not self._subscribers:
+                self._idle_since = time.monotonic()
+
+    @staticmethod
+    def _end(subscriber):
+        # Discard anything still buffered so the end marker always fits.
+        while True:
+            try:
+                subscriber.queue.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.queue.put_nowait(None)
+
+
+class _RelayServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _RelayRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def setup(self):
+        super().setup()
+        # Keep the kernel-side buffer small too, so a stalled client shows up as a full queue.
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, CLIENT_SOCKET_BUFFER)
+
+    def do_GET(self):
+        relay = self.server.relay
+        if self.path == "/status":
+            self._send_json(relay.get_stats())
+        elif self.path == "/stations":
+            self._send_json(relay.get_stations())
+        elif self.path.startswith("/stream/"):
+            self._serve_stream(relay, self.path[len("/stream/"):].split("?")[0])
+        else:
+            self.send_error(404)
+
+    def _send_json(self, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve_stream(self, relay, key):
+        feed = relay.get_feed(key)
+        if feed is None:
+            self.send_error(404, "Unknown station")
+            return
+        subscriber = feed.subscribe()
+        if subscriber is None:
+            self.send_error(502, "Upstream unavailable")
+            return
+        relay.client_connected()
+        try:
+            self.send_response(200)
+            for header, value in feed.headers.items():
+                self.send_header(header, value)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            while True:
+                try:
+                    chunk = subscriber.queue.get(timeout=30)
+                except queue.Empty:
+                    break
+                if chunk is None:
+                    break
+                self.wfile.write(chunk)
+                subscriber.bytes_sent += len(chunk)
+                relay.add_bytes_out(len(chunk))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            feed.unsubscribe(subscriber)
+            relay.client_disconnected(subscriber)
+
+    def log_message(self, format, *args):
+        logging.debug(f"Relay: {self.address_string()} {format % args}")
+
+
+class StationRelay:
+    """
+    Serves registered stations over HTTP at /stream/<key>, on the loopback
+    interface unless given another `host` (0.0.0.0 serves the local network).
+
+    Each station is fetched upstream at most once however many listeners it has;
+    listeners that cannot keep up are disconnected rather than slowing the others.
+    /status reports client counts, throughput and upstream bandwidth saved.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8800, client_buffer_chunks=CLIENT_BUFFER_CHUNKS):
+        self.client_buffer_chunks = client_buffer_chunks
+        self._stations = {}
+        self._feeds = {}
+        self._lock = threading.Lock()
+        self._started_at = time.monotonic()
+        self._clients = 0
+        self._peak_clients = 0
+        self._total_clients = 0
+        self._dropped_clients = 0
+        self._bytes_out = 0
+        self._bytes_in_closed = 0
+        self._server = _RelayServer((host, port), _RelayRequestHandler)
+        self._server.relay = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="relay-server", daemon=True)
+        self._thread.start()
+        logging.info(f"Station relay listening on port {self.port}.")
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            feeds = list(self._feeds.values())
+        for feed in feeds:
+            feed.close()
+        logging.info(f"Station relay stopped. Stats: {self.get_stats()}")
+
+    def register_station(self, url, name=None):
+        key = station_key(url)
+        with self._lock:
+            self._stations[key] = {"url": url, "name": name}
+        return key
+
+    def register_categories(self, categories):
+        for category in categories:
+            for station in category.get("stations", []):
+                for url in station_urls(station):
+                    if relay_supported(url):
+                        self.register_station(url, station.get("name"))
+
+    def local_url(self, url):
+        """
+        Returns the loopback address of `url` on this relay, registering it if needed.
+        Playlists the relay cannot carry are returned unchanged, for the player to fetch.
+        """
+        if not relay_supported(url):
+            return url
+        self.register_station(url)
+        return relay_stream_url(f"http://127.0.0.1:{self.port}", url)
+
+    def get_feed(self, key):
+        with self._lock:
+            station = self._stations.get(key)
+            if station is None:
+                return None
+            feed = self._feeds.get(key)
+            if feed is None or not feed.is_alive():
+                if feed is not None:
+                    self._bytes_in_closed += feed.bytes_in
+                feed = StreamFeed(station["url"], self.client_buffer_chunks)
+                self._feeds[key] = feed
+            return feed
+
+    def get_stations(self):
+        with self._lock:
+            return {key: station["name"] for key, station in self._stations.items()}
+
+    def client_connected(self):
+        with self._lock:
+            self._clients += 1
+            self._total_clients += 1
+            self._peak_clients = max(self._peak_clients, self._clients)
+
+    def client_disconnected(self, subscriber):
+        with self._lock:
+            self._clients -= 1
+            if subscriber.dropped:
+                self._dropped_clients += 1
+
+    def add_bytes_out(self, count):
+        with self._lock:
+            self._bytes_out += count
+
+    def get_stats(self):
+        with self._lock:
+            feeds = list(self._feeds.items())
+            bytes_in = self._bytes_in_closed + sum(feed.bytes_in for _, feed in feeds)
+            elapsed = max(time.monotonic() - self._started_at, 1e-6)
+            return {
+                "clients": self._clients,
+                "peak_clients": self._peak_clients,
+                "total_clients": self._total_clients,
+                "dropped_clients": self._dropped_clients,
+                "active_upstreams": sum(1 for _, feed in feeds if feed.is_alive()),
+                "bytes_in": bytes_in,
+                "bytes_out": self._bytes_out,
+                "upstream_bytes_saved": max(0, self._bytes_out - bytes_in),
+                "throughput_out_bps": int(self._bytes_out * 8 / elapsed),
+                "stations": {key: feed.client_count() for key, feed in feeds if feed.is_alive()},
+            }
+
+
+def main():
+    """Runs a standalone relay for every station in the catalog."""
+    from constants import STATIONS_URL
+
+    parser = argparse.ArgumentParser(description="Amwaj LAN station relay")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on; 0.0.0.0 serves the local network")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--catalog", default=STATIONS_URL)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    relay = StationRelay(args.host, args.port)
+    catalog = requests.get(args.catalog, timeout=10).json()
+    relay.register_categories(catalog.get("categories", []))
+    relay.start()
+    try:
+        while True:
+            time.sleep(60)
+            logging.info(f"Relay stats: {relay.get_stats()}")
+    except KeyboardInterrupt:
+        relay.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+
+from player import RecordingSupport
+
+PING_INTERVAL_SECONDS = 1.0
+# A backend that has not answered a ping for this long is considered hung.
+HANG_TIMEOUT_SECONDS = 5.0
+STATS_INTERVAL_SECONDS = 2.0
+MAX_RESTARTS_PER_MINUTE = 5
+STARTUP_TIMEOUT_SECONDS = 10.0
+
+
+def _backend_main(conn, vlc_args):
+    """Entry point of the child process that hosts libvlc."""
+    import vlc
+    from player import Player
+
+    send_lock = threading.Lock()
+
+    def send(message):
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+
+    player = Player(vlc.Instance(*vlc_args))
+    send(("ready",))
+    player.add_event_listener(lambda name, station, data, timestamp: send(("event", name, station, data)))
+
+    def report_stats():
+        while True:
+            time.sleep(STATS_INTERVAL_SECONDS)
+            if player.is_playing():
+                send(("stats", player.get_input_stats()))
+
+    threading.Thread(target=report_stats, name="backend-stats", daemon=True).start()
+
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        command_id, command, args = message
+        if command == "quit":
+            player.stop_dead_air_monitor()
+            player.stop()
+            break
+        try:
+            if command == "ping":
+                pass
+            elif command == "play":
+                player.play(*args)
+            elif command == "stop":
+                player.stop()
+            elif command == "set_volume":
+                player.set_volume(*args)
+            elif command == "toggle_mute":
+                player.toggle_mute()
+            elif command == "start_dead_air":
+                player.start_dead_air_monitor(*args)
+            elif command == "stop_dead_air":
+                player.stop_dead_air_monitor()
+        except Exception as e:
+            send(("log", f"Player backend command '{command}' failed: {e}"))
+        send(("ack", command_id))
+
+
+class RemotePlayer(RecordingSupport):
+    """
+    Drop-in replacement for Player that hosts libvlc in a child process.
+
+    Every call returns immediately: commands go through a queue to a sender thread
+    and the child reports state back as events over a pipe. A watchdog pings the
+    child and restarts it (resuming the current stream) if it hangs or crashes,
+    so a stuck network stop or a crashing decoder never freezes or kills the UI.
+    When it keeps failing, the watchdog gives up and calls the failure handlers
+    so the owner can switch to an in-process Player.
+    Time spent on the calling thread and command round-trips are measured.
+    """
+
+    def __init__(self, vlc_args=()):
+        self.vlc_args = tuple(vlc_args)
+        self.current_url = None
+        self.current_station = None
+        self.current_options = ()
+        # (url, min_seconds) of the dead-air tap running in the backend, replayed after a restart.
+        self.dead_air_source = None
+        self.is_rec = False
+        self.recorder = None
+        self._playing = False
+        self._volume = 50
+        self._input_stats = None
+        self._event_listeners = []
+        self._error_handlers = []
+        self._failure_handlers = []
+        self._commands = queue.Queue()
+        self._command_ids = itertools.count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_pong = time.monotonic()
+        self._restarts = []
+        self._closed = False
+        self._latency = {}
+        self._process = None
+        self._conn = None
+        self._ready = threading.Event()
+        self._start_backend()
+        if not self._wait_ready(STARTUP_TIMEOUT_SECONDS):
+            self._stop_backend()
+            raise RuntimeError("The player backend process failed to start.")
+        threading.Thread(target=self._send_loop, name="player-sender", daemon=True).start()
+        threading.Thread(target=self._watchdog_loop, name="player-watchdog", daemon=True).start()
+
+    def play(self, url_string, station_key=None, options=()):
+        started = time.perf_counter()
+        self.current_url = url_string
+        self.current_station = station_key
+        self.current_options = tuple(options)
+        self._playing = False
+        self._input_stats = None
+        self._enqueue("play", url_string, station_key, tuple(options))
+        self._record_latency("play", started)
+
+    def stop(self):
+        started = time.perf_counter()
+        self.current_url = None
+        self._playing = False
+        self._enqueue("stop")
+        self._record_latency("stop", started)
+
+    def is_playing(self):
+        return self._playing
+
+    def get_input_stats(self):
+        return self._input_stats
+
+    def set_volume(self, volume):
+        started = time.perf_counter()
+        self._volume = volume
+        self._enqueue("set_volume", volume)
+        self._record_latency("set_volume", started)
+
+    def get_volume(self):
+        return self._volume
+
+    def toggle_mute(self):
+        started = time.perf_counter()
+        self._enqueue("toggle_mute")
+        self._record_latency("toggle_mute", started)
+
+    def start_dead_air_monitor(self, url, min_seconds):
+        """Runs the dead-air tap in the backend process, next to the libvlc instance that plays."""
+        self.dead_air_source = (url, min_seconds)
+        self._enqueue("start_dead_air", url, min_seconds)
+
+    def stop_dead_air_monitor(self):
+        self.dead_air_source = None
+        self._enqueue("stop_dead_air")
+
+    def connect_error_handler(self, handler):
+        self._error_handlers.append(handler)
+
+    def connect_failure_handler(self, handler):
+        """`handler()` is called once, on the watchdog thread, if the backend is given up on."""
+        self._failure_handlers.append(handler)
+
+    def add_event_listener(self, listener):
+        """Same contract as Player.add_event_listener; listeners run on the pipe reader thread."""
+        self._event_listeners.append(listener)
+
+    def get_latency_stats(self):
+        """Returns per-command UI-thread call time and backend round-trip time, in milliseconds."""
+        with self._lock:
+            return {name: {
+                "count": entry["count"],
+                "avg_call_ms": round(entry["call_total"] / entry["count"] * 1000, 3) if entry["count"] else None,
+                "max_call_ms": round(entry["call_max"] * 1000, 3),
+                "avg_round_trip_ms": round(entry["rtt_total"] / entry["rtt_count"] * 1000, 1) if entry["rtt_count"] else None,
+                "max_round_trip_ms": round(entry["rtt_max"] * 1000, 1),
+            } for name, entry in self._latency.items()}
+
+    def close(self):
+        self._closed = True
+        self._commands.put((0, "quit", ()))
+        self._commands.put(None)
+        process = self._process
+        process.join(2.0)
+        if process.is_alive():
+            process.terminate()
+            process.join(1.0)
+        self._conn.close()
+        logging.info(f"Player backend latency: {self.get_latency_stats()}")
+
+    def _enqueue(self, command, *args):
+        command_id = next(self._command_ids)
+        with self._lock:
+            self._pending[command_id] = (command, time.perf_counter())
+        self._commands.put((command_id, command, args))
+
+    def _record_latency(self, name, started, round_trip=None):
+        with self._lock:
+            entry = self._latency.setdefault(name, {"count": 0, "call_total": 0.0, "call_max": 0.0,
+                                                    "rtt_count": 0, "rtt_total": 0.0, "rtt_max": 0.0})
+            if round_trip is None:
+                elapsed = time.perf_counter() - started
+                entry["count"] += 1
+                entry["call_total"] += elapsed
+                entry["call_max"] = max(entry["call_max"], elapsed)
+            else:
+                entry["rtt_count"] += 1
+                entry["rtt_total"] += round_trip
+                entry["rtt_max"] = max(entry["rtt_max"], round_trip)
+
+    def _start_backend(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_backend_main, args=(child_conn, self.vlc_args),
+                                          name="player-backend", daemon=True)
+        process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._process = process
+        self._ready.clear()
+        self._last_pong = time.monotonic()
+        threading.Thread(target=self._receive_loop, args=(parent_conn,), name="player-receiver", daemon=True).start()
+        logging.info(f"Player backend started (pid {process.pid}).")
+
+    def _stop_backend(self):
+        """Kills the current backend, reaps it and closes its pipe; its receiver thread then ends."""
+        process = self._process
+        if process.is_alive():
+            process.kill()
+        process.join(1.0)
+        self._conn.close()
+
+    def _wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._ready.wait(0.1):
+                return True
+            if not self._process.is_alive():
+                return False
+        return False
+
+    def _send_loop(self):
+        while True:
+            item = self._commands.get()
+            if item is None:
+                return
+            try:
+                self._conn.send(item)
+            except (OSError, EOFError, BrokenPipeError):
+                # The watchdog restarts the backend; the current stream is replayed then.
+                pass
+
+    def _receive_loop(self, conn):
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            kind = message[0]
+            if kind == "ready":
+                self._ready.set()
+            elif kind == "ack":
+                self._last_pong = time.monotonic()
+                with self._lock:
+                    pending = self._pending.pop(message[1], None)
+                if pending and pending[0] != "ping":
+                    self._record_latency(pending[0], None, time.perf_counter() - pending[1])
+            elif kind == "event":
+                self._on_event(*message[1:])
+            elif kind == "stats":
+                self._input_stats = message[1]
+            elif kind == "log":
+                logging.error(message[1])
+
+    def _on_event(self, name, station, data):
+        # The end of a silence is reported when the tap moves on, after the station has changed.
+        if station != self.current_station and name != "dead_air_ended":
+            return
+        if name == "playing":
+            self._playing = True
+        elif name in ("stopped", "ended", "error"):
+            self._playing = False
+        timestamp = time.monotonic()
+        for listener in self._event_listeners:
+            try:
+                listener(name, station, data, timestamp)
+            except Exception as e:
+                logging.error(f"Player event listener failed on '{name}': {e}")
+        if name == "error":
+            for handler in self._error_handlers:
+                handler(None)
+
+    def _watchdog_loop(self):
+        while not self._closed:
+            time.sleep(PING_INTERVAL_SECONDS)
+            if self._closed:
+                return
+            hung = time.monotonic() - self._last_pong > HANG_TIMEOUT_SECONDS
+            if hung or not self._process.is_alive():
+                self._restart_backend("hung" if hung else "crashed")
+            else:
+                self._enqueue("ping")
+
+    def _restart_backend(self, reason):
+        now = time.monotonic()
+        self._restarts = [t for t in self._restarts if now - t < 60] + [now]
+        if len(self._restarts) > MAX_RESTARTS_PER_MINUTE:
+            logging.critical("Player backend keeps failing; giving up on restarts.")
+            self._closed = True
+            self._playing = False
+            self._stop_backend()
+            for handler in self._failure_handlers:
+                try:
+                    handler()
+                except Exception as e:
+                    logging.error(f"Player backend failure handler failed: {e}")
+            return
+
+        logging.error(f"Player backend {reason}; restarting it.")
+        self._stop_backend()
+        with self._lock:
+            self._pending.clear()
+        self._start_backend()
+        self._enqueue("set_volume", self._volume)
+        if self.current_url:
+            self._enqueue("play", self.current_url, self.current_station, self.current_options)
+        if self.dead_air_source:
+            self._enqueue("start_dead_air", *self.dead_air_source)
@@ -15,6 +15,28 @@ def load_settings():
         "large_font": False,
         "volume": 40,
         "last_station_name": None,
+        "last_station": None,
+        "recording_segment_minutes": 60,
+        "recording_segment_mb": 200,
+        "recording_retention_mb": 0,
+        "recording_retention_days": 0,
+        "postprocess_format": "mp3",
+        "postprocess_bitrate": 128,
+        "postprocess_normalize": True,
+        "postprocess_workers": 1,
+        "player_out_of_process": False,
+        "relay_enabled": False,
+        "relay_host": "127.0.0.1",
+        "relay_port": 8800,
+        "relay_url": "",
+        "timeshift_enabled": False,
+        "timeshift_minutes": 30,
+        "catalog_mirror_url": "",
+        "data_saver_enabled": False,
+        "data_saver_max_kbps": 64,
+        "data_saver_daily_mb": 0,
+        "dead_air_detection_enabled": False,
+        "dead_air_seconds": 15,
     }
     if not os.path.exists(path):
         return defaults
@@ -39,6 +61,14 @@ def get_stations_cache_path():
     """Returns the path to the station cache file."""
     return os.path.join(os.path.expanduser("~"), "stv_radio_stations_cache.json")
 
+def get_imported_stations_path():
+    """Returns the path to the stations imported from user playlists, one JSON object per line."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_imported_stations.jsonl")
+
+def get_stations_etag_path():
+    """Returns the path to the ETag of the cached station list, used for conditional requests."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_stations_cache.etag.json")
+
 def load_stations_cache():
     """Loads the station list from the cache file."""
     path = get_stations_cache_path()
@@ -56,4 +86,55 @@ def save_stations_cache(categories):
         with open(get_stations_cache_path(), "w", encoding="utf-8") as f:
             json.dump(categories, f, ensure_ascii=False, indent=4)
     except IOError:
-        pass
\ No newline at end of file
+        pass
+
+def load_json_file(path, default=None):
+    """Loads a JSON document from `path`, returning `default` if it is missing or invalid."""
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        return default
+
+def save_json_file(path, data, compact=False):
+    """Writes `data` to `path` atomically so a crash never leaves a truncated file."""
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            if compact:
+                json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, path)
+    except IOError:
+        pass
+
+def get_network_caching_path():
+    """Returns the path to the learned per-station network caching file."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_network_caching.json")
+
+def get_postprocess_jobs_path():
+    """Returns the path to the recording post-processing job journal."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_postprocess_jobs.json")
+
+def get_station_mirrors_path():
+    """Returns the path to the file remembering the fastest mirror of each station."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_station_mirrors.json")
+
+def get_playback_stats_path():
+    """Returns the path to the per-station playback statistics store."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_playback_stats.json")
+
+def get_startup_times_path():
+    """Returns the path to the recent launch-to-first-audio times."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_startup_times.json")
+
+def get_update_staging_dir():
+    """Returns the directory where downloaded update files wait to be installed."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_update")
+
+def get_data_usage_path():
+    """Returns the path to the daily and per-station data usage store."""
+    return os.path.join(os.path.expanduser("~"), "stv_radio_data_usage.json")
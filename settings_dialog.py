@@ -35,6 +35,38 @@ class SettingsDialog(wx.Dialog):
         self.sound_effects_checkbox.SetValue(self.settings.get("sound_effects_enabled", True))
         self.vbox.Add(self.sound_effects_checkbox, flag=wx.LEFT | wx.TOP, border=10)
 
+        self.timeshift_checkbox = wx.CheckBox(self.panel, label="تفعيل الإيقاف المؤقت والرجوع للخلف أثناء البث")
+        self.timeshift_checkbox.SetValue(self.settings.get("timeshift_enabled", False))
+        self.vbox.Add(self.timeshift_checkbox, flag=wx.LEFT | wx.TOP, border=10)
+
+        timeshift_label = wx.StaticText(self.panel, label="مدة الاحتفاظ بالبث (بالدقائق):")
+        self.vbox.Add(timeshift_label, flag=wx.LEFT | wx.TOP, border=10)
+        self.timeshift_minutes = wx.SpinCtrl(self.panel, min=1, max=240, initial=self.settings.get("timeshift_minutes", 30))
+        self.vbox.Add(self.timeshift_minutes, flag=wx.LEFT, border=10)
+
+        self.data_saver_checkbox = wx.CheckBox(self.panel, label="وضع توفير البيانات")
+        self.data_saver_checkbox.SetValue(self.settings.get("data_saver_enabled", False))
+        self.vbox.Add(self.data_saver_checkbox, flag=wx.LEFT | wx.TOP, border=10)
+
+        bitrate_label = wx.StaticText(self.panel, label="أقصى معدل بت (كيلوبت/ثانية):")
+        self.vbox.Add(bitrate_label, flag=wx.LEFT | wx.TOP, border=10)
+        self.data_saver_kbps = wx.SpinCtrl(self.panel, min=16, max=512, initial=self.settings.get("data_saver_max_kbps", 64))
+        self.vbox.Add(self.data_saver_kbps, flag=wx.LEFT, border=10)
+
+        budget_label = wx.StaticText(self.panel, label="حد البيانات اليومي بالميغابايت (0 = بلا حد):")
+        self.vbox.Add(budget_label, flag=wx.LEFT | wx.TOP, border=10)
+        self.data_saver_budget = wx.SpinCtrl(self.panel, min=0, max=100000, initial=self.settings.get("data_saver_daily_mb", 0))
+        self.vbox.Add(self.data_saver_budget, flag=wx.LEFT, border=10)
+
+        self.dead_air_checkbox = wx.CheckBox(self.panel, label="اكتشاف انقطاع الصوت في الإذاعة (الصمت المتواصل، مع الإيقاف المؤقت أو المرحّل)")
+        self.dead_air_checkbox.SetValue(self.settings.get("dead_air_detection_enabled", False))
+        self.vbox.Add(self.dead_air_checkbox, flag=wx.LEFT | wx.TOP, border=10)
+
+        dead_air_label = wx.StaticText(self.panel, label="مدة الصمت قبل التنبيه (بالثواني):")
+        self.vbox.Add(dead_air_label, flag=wx.LEFT | wx.TOP, border=10)
+        self.dead_air_seconds = wx.SpinCtrl(self.panel, min=5, max=300, initial=self.settings.get("dead_air_seconds", 15))
+        self.vbox.Add(self.dead_air_seconds, flag=wx.LEFT, border=10)
+
         button_sizer = wx.BoxSizer(wx.HORIZONTAL)
         ok_button = wx.Button(self.panel, id=wx.ID_OK, label="موافق")
         cancel_button = wx.Button(self.panel, id=wx.ID_CANCEL, label="إلغاء")
@@ -52,6 +84,13 @@ class SettingsDialog(wx.Dialog):
         self.settings["theme"] = self.theme_choice.GetStringSelection()
         self.settings["large_font"] = self.font_size_checkbox.GetValue()
         self.settings["sound_effects_enabled"] = self.sound_effects_checkbox.GetValue()
+        self.settings["timeshift_enabled"] = self.timeshift_checkbox.GetValue()
+        self.settings["timeshift_minutes"] = self.timeshift_minutes.GetValue()
+        self.settings["data_saver_enabled"] = self.data_saver_checkbox.GetValue()
+        self.settings["data_saver_max_kbps"] = self.data_saver_kbps.GetValue()
+        self.settings["data_saver_daily_mb"] = self.data_saver_budget.GetValue()
+        self.settings["dead_air_detection_enabled"] = self.dead_air_checkbox.GetValue()
+        self.settings["dead_air_seconds"] = self.dead_air_seconds.GetValue()
         self.EndModal(wx.ID_OK)
 
     def get_settings(self):
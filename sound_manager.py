@@ -1,12 +1,14 @@
 import logging
 
+from constants import MEDIA_BASE_URL
+
 try:
     import vlc
 except (ImportError, FileNotFoundError):
     vlc = None
 
 class SoundManager:
-    def __init__(self):
+    def __init__(self, media_base_url=MEDIA_BASE_URL):
         self.vlc_instance = None
         self.sfx_player = None
         self.enabled = False
@@ -27,11 +29,11 @@ class SoundManager:
             logging.warning("SoundManager: python-vlc library not found. Sound effects will be disabled.")
 
         self.sounds = {
-            "startup": "https://aswatalweb.com/radio/media/demarage.wav",
-            "update_success": "https://aswatalweb.com/radio/media/misajour_du_play_station.wav",
-            "navigate": "https://aswatalweb.com/radio/media/When_moving_between_the_stations_in_the_list.wav",
-            "play_station": "https://aswatalweb.com/radio/media/When_starting_a%20station.wav",
-            "stop_station": "https://aswatalweb.com/radio/media/When_turning_off_a_station.wav"
+            "startup": f"{media_base_url}/demarage.wav",
+            "update_success": f"{media_base_url}/misajour_du_play_station.wav",
+            "navigate": f"{media_base_url}/When_moving_between_the_stations_in_the_list.wav",
+            "play_station": f"{media_base_url}/When_starting_a%20station.wav",
+            "stop_station": f"{media_base_url}/When_turning_off_a_station.wav"
         }
 
     def set_enabled(self, enabled):
@@ -49,6 +51,7 @@ class SoundManager:
             try:
                 media = self.vlc_instance.media_new(url)
                 self.sfx_player.set_media(media)
+                media.release()
                 self.sfx_player.play()
                 logging.debug(f"Playing sound effect: '{sound_name}' from {url}")
             except Exception as e:
@@ -0,0 +1,178 @@
+import logging
+import threading
+import time
+
+import requests
+
+import network_meter
+from settings import get_station_mirrors_path, load_json_file, save_json_file
+from task_executor import TaskCancelled
+
+RACE_TIMEOUT_SECONDS = 10
+
+
+class NoWorkingMirrorError(Exception):
+    """Raised when none of a station's candidate URLs delivered data."""
+
+
+def station_urls(station):
+    """
+    Returns every candidate URL of a catalog station, in catalog order.
+    Stations may list mirrors in `urls` (strings or {"url": ...} objects) besides `url`.
+    """
+    candidates = []
+    for entry in station.get("urls", []):
+        url = entry.get("url") if isinstance(entry, dict) else entry
+        if url:
+            candidates.append(url)
+    if station.get("url"):
+        candidates.append(station["url"])
+    seen = set()
+    return [url for url in candidates if not (url in seen or seen.add(url))]
+
+
+def station_bitrates(station):
+    """Returns {url: kbps} for the station URLs whose bitrate the catalog states."""
+    bitrates = {}
+    for entry in station.get("urls", []):
+        if isinstance(entry, dict) and entry.get("url") and entry.get("bitrate"):
+            bitrates[entry["url"]] = int(entry["bitrate"])
+    if station.get("url") and station.get("bitrate"):
+        bitrates.setdefault(station["url"], int(station["bitrate"]))
+    return bitrates
+
+
+def probe_stream(url, timeout, on_response=None):
+    """
+    Opens `url` and reads its first bytes. Returns the response, still open.
+    `on_response(response)` is called once the headers are in, so another thread
+    can close a probe that is still waiting for audio.
+    """
+    response = requests.get(url, stream=True, timeout=(timeout, timeout))
+    if on_response:
+        on_response(response)
+    try:
+        response.raise_for_status()
+        # A read blocks until the whole chunk arrives, so keep it small for low-bitrate streams.
+        first = next(response.iter_content(chunk_size=512), None)
+        if not first:
+            raise requests.exceptions.ConnectionError("Stream ended before delivering audio.")
+    except Exception:
+        response.close()
+        raise
+    network_meter.count_bytes(len(first))
+    return response
+
+
+def _abort_probe(response):
+    """
+    Wakes a probe blocked on its first read; close() would wait for that read to
+    time out. urllib3 before 2.3 has no shutdown(), and the probe then ends at its timeout.
+    """
+    shutdown = getattr(response.raw, "shutdown", None)
+    if shutdown is None:
+        return
+    try:
+        shutdown()
+    except (OSError, ValueError, RuntimeError):
+        pass
+
+
+def race_connect(token, urls, timeout=RACE_TIMEOUT_SECONDS):
+    """
+    Connects to all `urls` in parallel and returns (url, seconds) for the first one
+    that delivers data. Once there is a winner, or the race is given up, the
+    probes still waiting for audio are closed; one still connecting ends at its
+    timeout. Runs on a TaskExecutor.
+    """
+    if len(urls) == 1:
+        return urls[0], 0.0
+
+    started = time.monotonic()
+    done = threading.Event()
+    lock = threading.Lock()
+    state = {"winner": None, "failures": 0, "open": set(), "over": False}
+
+    def track(response):
+        with lock:
+            if not state["over"]:
+                state["open"].add(response)
+                return
+        _abort_probe(response)
+
+    def attempt(url):
+        response = None
+        try:
+            response = probe_stream(url, timeout, on_response=track)
+        except Exception as e:
+            # Besides network errors, a probe closed by the race fails with whatever the socket raised.
+            logging.debug(f"Mirror failed during race: {url}: {e}")
+            with lock:
+                state["failures"] += 1
+                if state["failures"] == len(urls):
+                    done.set()
+            return
+        finally:
+            if response is not None:
+                # The winner is played by libvlc on its own connection; the probe is always closed.
+                response.close()
+                with lock:
+                    state["open"].discard(response)
+        with lock:
+            if state["winner"] is None and not state["over"]:
+                state["winner"] = (url, time.monotonic() - started)
+                done.set()
+
+    for url in urls:
+        threading.Thread(target=attempt, args=(url,), name="mirror-race", daemon=True).start()
+
+    deadline = started + timeout
+    try:
+        while not done.wait(0.1):
+            if token.is_cancelled():
+                raise TaskCancelled()
+            if time.monotonic() > deadline:
+                break
+    finally:
+        with lock:
+            state["over"] = True
+            winner = state["winner"]
+            losers = list(state["open"])
+        # Each probe thread closes its own response once its read fails.
+        for response in losers:
+            _abort_probe(response)
+    if winner is None:
+        raise NoWorkingMirrorError(f"None of the {len(urls)} mirrors delivered audio.")
+    logging.info(f"Mirror race won in {winner[1] * 1000:.0f}ms: {winner[0]}")
+    return winner
+
+
+class MirrorStore:
+    """Remembers which mirror last worked for each station, so it is tried first."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._winners = load_json_file(get_station_mirrors_path(), {}) or {}
+        self._dirty = False
+
+    def ordered_urls(self, station_name, urls):
+        """Returns `urls` with the station's remembered winner first."""
+        with self._lock:
+            winner = self._winners.get(station_name)
+        if winner in urls:
+            return [winner] + [url for url in urls if url != winner]
+        return list(urls)
+
+    def remember(self, station_name, url):
+        with self._lock:
+            if self._winners.get(station_name) != url:
+                self._winners[station_name] = url
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            data = dict(self._winners)
+            self._dirty = False
+        save_json_file(get_station_mirrors_path(), data)
@@ -0,0 +1,308 @@
+import logging
+import queue
+import threading
+import time
+
+try:
+    import wx
+except ImportError:
+    wx = None
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task when its cancellation token has been triggered."""
+
+
+class CancelToken:
+    """A flag shared between the caller and a running task to request cancellation."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    def is_cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def wait(self, timeout):
+        """Sleeps for up to `timeout` seconds. Returns True if cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+
+class Task:
+    """A handle to a submitted job. Callbacks are delivered on the UI thread."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, fn, args, kwargs, key=None, on_success=None, on_error=None, on_cancel=None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.on_success = on_success
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.token = CancelToken()
+        self.state = Task.PENDING
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self._done_event = threading.Event()
+        self._extra_callbacks = []
+
+    def cancel(self):
+        """Requests cancellation. A pending task never runs, a running one sees its token set."""
+        self.token.cancel()
+
+    def is_done(self):
+        return self._done_event.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the task has finished. Returns True if it did within `timeout`."""
+        return self._done_event.wait(timeout)
+
+    def add_callbacks(self, on_success=None, on_error=None, on_cancel=None):
+        """
+        Attaches extra callbacks, used when a duplicate submission joins this task.
+        Callbacks identical to ones already attached are not added again, so
+        resubmitting the same job does not run its handlers twice.
+        Returns True if they were added.
+        """
+        callbacks = (on_success, on_error, on_cancel)
+        if callbacks in self._callbacks():
+            return False
+        self._extra_callbacks.append(callbacks)
+        return True
+
+    def duration(self):
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def _callbacks(self):
+        return [(self.on_success, self.on_error, self.on_cancel)] + self._extra_callbacks
+
+
+class TaskExecutor:
+    """
+    A bounded pool of daemon worker threads for background work.
+
+    Each submitted function is called as `fn(token, *args, **kwargs)` where `token`
+    is the task's CancelToken. Results and errors are marshalled to the UI thread
+    via `wx.CallAfter`; once the executor is shut down no further callbacks are
+    delivered, so tasks never call back into a destroyed window.
+    """
+
+    def __init__(self, max_workers=4, max_queue=64, name="worker", call_after=None):
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._closed = False
+        self._call_after = call_after or (wx.CallAfter if wx else None)
+        self._stats = {
+            "submitted": 0,
+            "deduplicated": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "max_queue_depth": 0,
+            "total_run_time": 0.0,
+            "max_run_time": 0.0,
+            "total_wait_time": 0.0,
+        }
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"{name}-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn, *args, key=None, on_success=None, on_error=None, on_cancel=None, **kwargs):
+        """
+        Queues `fn` for execution and returns its Task.
+
+        If `key` is given and a task with the same key is still pending or running,
+        no new job is started: the callbacks are attached to the existing task instead.
+        `on_cancel(TaskCancelled)` runs if the task is cancelled before it completes,
+        for callers that must undo UI state such as a progress dialog.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"TaskExecutor '{self.name}' has been shut down.")
+            if key is not None:
+                existing = self._in_flight.get(key)
+                if existing is not None and not existing.token.is_cancelled():
+                    existing.add_callbacks(on_success, on_error, on_cancel)
+                    self._stats["deduplicated"] += 1
+                    logging.debug(f"Task '{key}' is already in flight; joined existing task.")
+                    return existing
+            task = Task(fn, args, kwargs, key=key, on_success=on_success, on_error=on_error, on_cancel=on_cancel)
+            if key is not None:
+                self._in_flight[key] = task
+            self._stats["submitted"] += 1
+
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            with self._lock:
+                if key is not None and self._in_flight.get(key) is task:
+                    del self._in_flight[key]
+            raise RuntimeError(f"TaskExecutor '{self.name}' queue is full.")
+
+        with self._lock:
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue.qsize())
+        return task
+
+    def cancel(self, key):
+        """Cancels the in-flight task registered under `key`, if any."""
+        with self._lock:
+            task = self._in_flight.get(key)
+        if task is not None:
+            task.cancel()
+        return task
+
+    def shutdown(self, timeout=5.0, wait=True):
+        """
+        Cancels all pending and running tasks and waits up to `timeout` seconds for
+        the workers to exit. Returns True if every worker stopped within the deadline.
+        With `wait=False` it returns at once and the workers exit in the background.
+        """
+        with self._lock:
+            if self._closed:
+                return True
+            self._closed = True
+            tasks = list(self._in_flight.values())
+
+        for task in tasks:
+            task.cancel()
+        while True:
+            try:
+                task = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if task is not None:
+                task.cancel()
+                self._finish(task, Task.CANCELLED)
+
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if not wait:
+            return False
+
+        deadline = time.monotonic() + timeout
+        for worker in self._workers:
+            worker.join(max(0.0, deadline - time.monotonic()))
+        stopped = not any(worker.is_alive() for worker in self._workers)
+        if not stopped:
+            logging.warning(f"TaskExecutor '{self.name}' shut down with tasks still running after {timeout}s.")
+        logging.info(f"TaskExecutor '{self.name}' stats: {self.get_stats()}")
+        return stopped
+
+    def call_after(self, fn, *args):
+        """
+        Runs `fn(*args)` on the UI thread with the same guard as task callbacks, so
+        progress reports from a running task never reach a closed window.
+        """
+        self._deliver(lambda value: fn(*args), None)
+
+    def is_shut_down(self):
+        return self._closed
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def get_stats(self):
+        """Returns a snapshot of queue depth and task timing counters."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._in_flight)
+        stats["queue_depth"] = self._queue.qsize()
+        finished = stats["completed"] + stats["failed"]
+        stats["avg_run_time"] = stats["total_run_time"] / finished if finished else 0.0
+        stats["avg_wait_time"] = stats["total_wait_time"] / finished if finished else 0.0
+        return stats
+
+    def _worker_loop(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            if task.token.is_cancelled():
+                self._finish(task, Task.CANCELLED)
+                continue
+
+            task.state = Task.RUNNING
+            task.started_at = time.monotonic()
+            try:
+                task.result = task.fn(task.token, *task.args, **task.kwargs)
+            except TaskCancelled:
+                self._finish(task, Task.CANCELLED)
+            except Exception as e:
+                task.error = e
+                logging.error(f"Task '{task.key or task.fn.__name__}' failed: {e}")
+                self._finish(task, Task.FAILED)
+            else:
+                if task.token.is_cancelled():
+                    self._finish(task, Task.CANCELLED)
+                else:
+                    self._finish(task, Task.DONE)
+
+    def _finish(self, task, state):
+        task.state = state
+        task.finished_at = time.monotonic()
+        with self._lock:
+            if task.key is not None and self._in_flight.get(task.key) is task:
+                del self._in_flight[task.key]
+            if state == Task.CANCELLED:
+                self._stats["cancelled"] += 1
+            else:
+                self._stats["completed" if state == Task.DONE else "failed"] += 1
+                run_time = task.duration() or 0.0
+                self._stats["total_run_time"] += run_time
+                self._stats["max_run_time"] = max(self._stats["max_run_time"], run_time)
+                self._stats["total_wait_time"] += task.started_at - task.submitted_at
+        task._done_event.set()
+
+        if task.started_at is not None and state != Task.CANCELLED:
+            logging.debug(f"Task '{task.key or task.fn.__name__}' {state} in {task.duration():.3f}s.")
+
+        if state == Task.DONE:
+            for on_success, _, _ in task._callbacks():
+                if on_success:
+                    self._deliver(on_success, task.result)
+        elif state == Task.FAILED:
+            for _, on_error, _ in task._callbacks():
+                if on_error:
+                    self._deliver(on_error, task.error)
+        elif state == Task.CANCELLED:
+            for _, _, on_cancel in task._callbacks():
+                if on_cancel:
+                    self._deliver(on_cancel, TaskCancelled())
+
+    def _deliver(self, callback, value):
+        if self._closed:
+            return
+        if self._call_after is None:
+            callback(value)
+            return
+
+        def guarded():
+            # The window may have been destroyed between scheduling and running.
+            if not self._closed:
+                callback(value)
+
+        self._call_after(guarded)
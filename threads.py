@@ -1,48 +1,85 @@
+import os
 import requests
 import json
 import logging
-import threading
 from packaging import version
-import wx
 
 from constants import STATIONS_URL
-from settings import load_stations_cache, save_stations_cache
+from playlist_import import load_imported_categories, merge_categories
+from settings import (load_stations_cache, save_stations_cache, get_stations_cache_path,
+                      get_stations_etag_path, load_json_file, save_json_file)
 
 
-class UpdateChecker(threading.Thread):
-    def __init__(self, current_version, update_url, window):
-        super().__init__()
+class UpdateChecker:
+    """Background job (run via TaskExecutor) that looks for a newer release."""
+
+    def __init__(self, current_version, update_url):
         self.current_version = current_version
         self.update_url = update_url
-        self.window = window
 
-    def run(self):
+    def __call__(self, token):
+        """
+        Returns (latest_version, download_url, manifest) if an update is available, otherwise None.
+        `manifest` is {"url", "sha256"} when the release publishes a per-file manifest, else None.
+        """
         try:
             logging.debug("Checking for updates...")
             response = requests.get(self.update_url, timeout=5)
             response.raise_for_status()
+            token.raise_if_cancelled()
             data = response.json()
             latest_version_str = data.get("latest_version")
             download_url = data.get("download_url")
-            if latest_version_str and download_url and version.parse(latest_version_str) > version.parse(self.current_version):
-                wx.CallAfter(self.window.show_update_dialog, latest_version_str, download_url)
             logging.debug(f"Update check completed. Latest version: {latest_version_str}")
+            if latest_version_str and download_url and version.parse(latest_version_str) > version.parse(self.current_version):
+                manifest = None
+                if data.get("manifest_url"):
+                    manifest = {"url": data["manifest_url"], "sha256": data.get("manifest_sha256")}
+                return latest_version_str, download_url, manifest
         except requests.exceptions.RequestException as e:
             logging.error(f"Failed to check for updates: {e}")
         except (json.JSONDecodeError, AttributeError):
             logging.error("Failed to decode update JSON.")
+        return None
+
+
+class StationLoadError(Exception):
+    """Raised when stations could not be loaded from the network or the cache."""
 
 
-class StationLoader(threading.Thread):
-    def __init__(self, window):
-        super().__init__()
-        self.window = window
+class StationLoader:
+    """Background job (run via TaskExecutor) that fetches the station list."""
 
-    def run(self):
+    def __init__(self, stations_url=STATIONS_URL):
+        self.stations_url = stations_url
+
+    def __call__(self, token):
+        """
+        Returns (categories, from_cache), with the stations imported from user playlists
+        appended as extra categories. Falls back to the cached station list when the
+        network fetch fails, and raises StationLoadError if neither is available.
+        """
+        categories, from_cache = self._load_catalog(token)
+        token.raise_if_cancelled()
+        try:
+            return merge_categories(categories, load_imported_categories()), from_cache
+        except Exception as e:
+            # The imported stations are extras; they must never cost the user the catalog.
+            logging.error(f"Could not merge imported stations: {e}")
+            return categories, from_cache
+
+    def _load_catalog(self, token):
         try:
             logging.debug("Attempting to load stations from network...")
-            response = requests.get(STATIONS_URL, timeout=10)
+            response = requests.get(self.stations_url, headers=self._conditional_headers(), timeout=10)
+            if response.status_code == 304:
+                cached_categories = load_stations_cache()
+                if cached_categories:
+                    logging.info("Station list unchanged since the last fetch; using the cache.")
+                    return cached_categories, False
+                response = requests.get(self.stations_url, timeout=10)
             response.raise_for_status()
+            token.raise_if_cancelled()
             data = response.json()
             categories = data.get("categories", [])
 
@@ -51,7 +88,9 @@ class StationLoader(threading.Thread):
 
             logging.info(f"Successfully loaded {len(categories)} categories from network.")
             save_stations_cache(categories)
-            wx.CallAfter(self.window.on_stations_loaded, categories)
+            if response.headers.get("ETag"):
+                save_json_file(get_stations_etag_path(), {"url": self.stations_url, "etag": response.headers["ETag"]})
+            return categories, False
 
         except (requests.exceptions.RequestException, json.JSONDecodeError, ValueError) as e:
             logging.warning(f"Could not load stations from network: {e}. Attempting to load from cache.")
@@ -59,8 +98,15 @@ class StationLoader(threading.Thread):
             cached_categories = load_stations_cache()
             if cached_categories:
                 logging.info("Successfully loaded stations from cache.")
-                wx.CallAfter(self.window.on_stations_loaded, cached_categories)
-                wx.CallAfter(self.window.on_stations_load_error, "فشل تحديث قائمة الإذاعات. يتم عرض نسخة محفوظة.", False)
-            else:
-                logging.error("Failed to load stations from network and no cache available.")
-                wx.CallAfter(self.window.on_stations_load_error, "فشل تحميل قائمة الإذاعات من الإنترنت ولا توجد نسخة محفوظة. يرجى التحقق من اتصالك بالإنترنت.", True)
\ No newline at end of file
+                return cached_categories, True
+
+            logging.error("Failed to load stations from network and no cache available.")
+            raise StationLoadError("فشل تحميل قائمة الإذاعات من الإنترنت ولا توجد نسخة محفوظة. يرجى التحقق من اتصالك بالإنترنت.")
+
+    def _conditional_headers(self):
+        """Asks for the list only if it changed since the cached copy was fetched from the same URL."""
+        validator = load_json_file(get_stations_etag_path(), {}) or {}
+        if (validator.get("url") == self.stations_url and validator.get("etag")
+                and os.path.exists(get_stations_cache_path())):
+            return {"If-None-Match": validator["etag"]}
+        return {}
@@ -0,0 +1,325 @@
+import bisect
+import logging
+import mmap
+import queue
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from recorder import _extension_for
+from relay import CHUNK_SIZE, StreamFeed, relay_supported
+
+# The buffer is sized for this bitrate, so any station fits the configured length.
+ASSUMED_MAX_BITRATE = 320 * 1000
+# Bytes handed to the player when joining at the live edge, so it starts without waiting.
+LIVE_BURST_BYTES = 64 * 1024
+INDEX_INTERVAL_SECONDS = 1.0
+# How far the rewind and fast-forward shortcuts jump.
+SKIP_SECONDS = 30
+
+
+def timeshift_supported(url):
+    """Playlists are buffered no more than they are relayed; see relay_supported."""
+    return relay_supported(url)
+
+
+class RingBuffer:
+    """
+    A fixed-size, memory-mapped ring of stream bytes backed by a temporary file.
+
+    Positions are absolute byte counts since the buffer was created; only the last
+    `capacity` bytes are kept. A coarse time index maps wall-clock moments to
+    positions so callers can seek by seconds.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._file = tempfile.TemporaryFile(prefix="amwaj-timeshift-")
+        self._file.truncate(capacity)
+        self._map = mmap.mmap(self._file.fileno(), capacity)
+        self._head = 0
+        self._times = []
+        self._positions = []
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def head(self):
+        return self._head
+
+    @property
+    def tail(self):
+        return max(0, self._head - self.capacity)
+
+    def write(self, data, timestamp=None):
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        with self._condition:
+            if not self._times or timestamp - self._times[-1] >= INDEX_INTERVAL_SECONDS:
+                self._times.append(timestamp)
+                self._positions.append(self._head)
+            data = data[-self.capacity:]
+            offset = self._head % self.capacity
+            first = min(len(data), self.capacity - offset)
+            self._map[offset:offset + first] = data[:first]
+            if first < len(data):
+                self._map[0:len(data) - first] = data[first:]
+            self._head += len(data)
+            self._trim_index()
+            self._condition.notify_all()
+
+    def _trim_index(self):
+        tail = self.tail
+        stale = bisect.bisect_left(self._positions, tail)
+        if stale:
+            del self._times[:stale]
+            del self._positions[:stale]
+
+    def read(self, position, size):
+        """Returns (position, data) from `position`, skipping ahead if it was already overwritten."""
+        with self._condition:
+            position = max(position, self.tail)
+            size = min(size, self._head - position)
+            if size <= 0:
+                return position, b""
+            offset = position % self.capacity
+            first = min(size, self.capacity - offset)
+            data = self._map[offset:offset + first]
+            if first < size:
+                data += self._map[0:size - first]
+            return position, data
+
+    def wait(self, position, timeout):
+        """Blocks until data past `position` is available. Returns False on timeout or close."""
+        with self._condition:
+            if self._head <= position and not self._closed:
+                self._condition.wait(timeout)
+            return self._head > position and not self._closed
+
+    def position_at(self, timestamp):
+        """Returns the buffered position closest to `timestamp` (clamped to what is still kept)."""
+        with self._condition:
+            index = bisect.bisect_right(self._times, timestamp) - 1
+            if index < 0:
+                return self.tail
+            return max(self._positions[index], self.tail)
+
+    def buffered_seconds(self, now=None):
+        now = time.monotonic() if now is None else now
+        with self._condition:
+            return now - self._times[0] if self._times else 0.0
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            self._map.close()
+            self._file.close()
+
+
+class _TimeshiftServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _TimeshiftRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def do_GET(self):
+        timeshift = self.server.timeshift
+        parts = urlsplit(self.path)
+        query = parse_qs(parts.query)
+        session = timeshift.session_buffer(int(query.get("session", ["0"])[0]))
+        if parts.path != "/timeshift" or session is None:
+            self.send_error(404)
+            return
+        buffer, headers = session
+        position = int(query.get("from", ["0"])[0])
+        try:
+            self.send_response(200)
+            for header, value in headers.items():
+                self.send_header(header, value)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            while True:
+                position, data = buffer.read(position, CHUNK_SIZE)
+                if not data:
+                    if not buffer.wait(position, 30):
+                        break
+                    continue
+                self.wfile.write(data)
+                position += len(data)
+        except (ConnectionError, OSError, ValueError):
+            # ValueError: the buffer was closed under us when the station changed.
+            pass
+
+    def log_message(self, format, *args):
+        logging.debug(f"Timeshift: {format % args}")
+
+
+class Timeshift:
+    """
+    Tees the playing station into a ring buffer and serves it to the player on loopback.
+
+    The station is fetched once by a relay StreamFeed; playback reads from the
+    buffer at a chosen delay behind live, which is what makes pause, rewind and
+    "save the last N minutes" possible without fetching anything again. The
+    buffer is a fixed-size file, so disk and memory use do not grow with time.
+    """
+
+    def __init__(self, minutes=30, bitrate=ASSUMED_MAX_BITRATE):
+        self.bitrate = bitrate
+        self.capacity = int(minutes * 60 * bitrate / 8)
+        self._lock = threading.Lock()
+        self._session = 0
+        self._buffer = None
+        self._feed = None
+        self._delay = 0.0
+        self._paused_at = None
+        self._server = _TimeshiftServer(("127.0.0.1", 0), _TimeshiftRequestHandler)
+        self._server.timeshift = self
+        threading.Thread(target=self._server.serve_forever, name="timeshift-server", daemon=True).start()
+
+    def start(self, url, minutes=None):
+        """
+        Starts buffering `url` and returns the local URL the player should open.
+        `minutes`, when given, resizes the buffer from this station on.
+        """
+        self.stop()
+        if minutes is not None:
+            self.capacity = int(minutes * 60 * self.bitrate / 8)
+        buffer = RingBuffer(self.capacity)
+        feed = StreamFeed(url)
+        with self._lock:
+            self._session += 1
+            self._buffer = buffer
+            self._feed = feed
+            self._delay = 0.0
+            self._paused_at = None
+            session = self._session
+        threading.Thread(target=self._pump, args=(feed, buffer), name="timeshift-tee", daemon=True).start()
+        return self._url(session, 0)
+
+    def stop(self):
+        with self._lock:
+            feed, buffer = self._feed, self._buffer
+            self._feed = self._buffer = None
+            self._session += 1
+        if feed:
+            feed.close()
+        if buffer:
+            buffer.close()
+
+    def close(self):
+        self.stop()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def is_active(self):
+        return self._buffer is not None
+
+    def live_feed(self, url):
+        """Returns the StreamFeed buffering `url`, or None once another station (or none) is buffered."""
+        with self._lock:
+            feed = self._feed
+        if feed is not None and feed.url == url:
+            return feed
+        return None
+
+    def session_buffer(self, session):
+        with self._lock:
+            if session != self._session or self._buffer is None:
+                return None
+            return self._buffer, dict(self._feed.headers)
+
+    def _pump(self, feed, buffer):
+        subscriber = feed.subscribe(timeout=15)
+        if subscriber is None:
+            logging.warning("Timeshift could not reach the station.")
+            return
+        try:
+            while True:
+                try:
+                    chunk = subscriber.queue.get(timeout=30)
+                except queue.Empty:
+                    continue
+                if chunk is None:
+                    break
+                buffer.write(chunk)
+        except ValueError:
+            # The buffer was closed because the station changed.
+            pass
+        finally:
+            feed.unsubscribe(subscriber)
+
+    def _url(self, session, position):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/timeshift?session={session}&from={position}"
+
+    def _url_for_delay(self):
+        with self._lock:
+            buffer, session = self._buffer, self._session
+        if buffer is None:
+            return None
+        if self._delay <= 0:
+            return self._url(session, max(buffer.tail, buffer.head - LIVE_BURST_BYTES))
+        return self._url(session, buffer.position_at(time.monotonic() - self._delay))
+
+    def get_delay(self):
+        """Seconds the listener is behind live, counting an ongoing pause."""
+        if self._paused_at is not None:
+            return self._delay + time.monotonic() - self._paused_at
+        return self._delay
+
+    def get_buffered_seconds(self):
+        buffer = self._buffer
+        return buffer.buffered_seconds() if buffer else 0.0
+
+    def is_paused(self):
+        return self._paused_at is not None
+
+    def pause(self):
+        if self._paused_at is None:
+            self._paused_at = time.monotonic()
+
+    def resume(self):
+        """Returns the URL that continues playback where it was paused."""
+        if self._paused_at is not None:
+            self._delay = min(self.get_delay(), self.get_buffered_seconds())
+            self._paused_at = None
+        return self._url_for_delay()
+
+    def seek(self, seconds):
+        """Moves `seconds` later (positive) or earlier (negative) in the buffer. Returns the URL to play."""
+        self._delay = min(max(self.get_delay() - seconds, 0.0), self.get_buffered_seconds())
+        self._paused_at = None
+        return self._url_for_delay()
+
+    def go_live(self):
+        self._delay = 0.0
+        self._paused_at = None
+        return self._url_for_delay()
+
+    def get_extension(self):
+        feed = self._feed
+        return _extension_for(feed.headers.get("Content-Type") if feed else None)
+
+    def save_last(self, token, path, seconds):
+        """Writes the last `seconds` of the buffer to `path`. Runs on a TaskExecutor; returns bytes written."""
+        with self._lock:
+            buffer = self._buffer
+        if buffer is None:
+            raise RuntimeError("Timeshift is not active.")
+        position = buffer.position_at(time.monotonic() - seconds)
+        end = buffer.head
+        written = 0
+        with open(path, "wb") as f:
+            while position < end:
+                token.raise_if_cancelled()
+                position, data = buffer.read(position, min(CHUNK_SIZE * 4, end - position))
+                if not data:
+                    break
+                f.write(data)
+                position += len(data)
+                written += len(data)
+        logging.info(f"Saved the last {seconds}s of the timeshift buffer ({written} bytes) to {path}")
+        return written
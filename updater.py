@@ -0,0 +1,298 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+
+import requests
+
+from settings import get_update_staging_dir, load_json_file, save_json_file
+
+CHUNK_SIZE = 64 * 1024
+# Give up on a file after this many attempts in a row that left it no longer than before.
+MAX_STALLED_ATTEMPTS = 3
+STAGED_FILE = "staged.json"
+OLD_SUFFIX = ".old"
+
+
+class UpdateError(Exception):
+    """Raised when an update could not be downloaded, verified or applied."""
+
+
+def updates_supported():
+    """In-place updates only make sense for the frozen (PyInstaller) build, not a source checkout."""
+    return getattr(sys, "frozen", False)
+
+
+def get_install_dir():
+    if getattr(sys, "frozen", False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _safe_relative_path(path):
+    normalized = os.path.normpath(path)
+    if os.path.isabs(normalized) or normalized.startswith(".."):
+        raise UpdateError(f"Refusing manifest path outside the install directory: {path}")
+    return normalized
+
+
+def build_manifest(root, version_string, base_url):
+    """Lists every file under `root` with its size and SHA-256, in the format UpdateDownloader reads."""
+    files = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(OLD_SUFFIX):
+                continue
+            path = os.path.join(directory, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            files[relative] = {"sha256": file_sha256(path), "size": os.path.getsize(path)}
+    return {"version": version_string, "base_url": base_url.rstrip("/") + "/", "files": files}
+
+
+def download_file(session, url, dest, sha256, size=None, token=None, on_progress=None):
+    """
+    Downloads `url` to `dest` and verifies its SHA-256. Data goes to `dest`.part first;
+    an interrupted download, in this run or an earlier one, is resumed with an HTTP
+    Range request. Attempts that do not grow the file, such as a server that ignores
+    Range or ends early, count as stalls. Returns the number of bytes transferred.
+    """
+    part_path = f"{dest}.part"
+    os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+    transferred = 0
+    stalled = 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size is not None and offset >= size:
+            break
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        received = 0
+        error = None
+        try:
+            with session.get(url, headers=headers, stream=True, timeout=(10, 30)) as response:
+                if response.status_code == 416:
+                    # The partial file is already complete (or stale); verification decides.
+                    break
+                response.raise_for_status()
+                resumed = offset and response.status_code == 206
+                with open(part_path, "ab" if resumed else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        if token is not None:
+                            token.raise_if_cancelled()
+                        f.write(chunk)
+                        received += len(chunk)
+                        if size is not None and f.tell() > size:
+                            break
+                        if on_progress:
+                            on_progress(len(chunk))
+        except requests.exceptions.RequestException as e:
+            error = e
+        transferred += received
+        if size is None and error is None:
+            break
+        length = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        if size is not None and length > size:
+            os.remove(part_path)
+            raise UpdateError(f"Download of {url} is larger than the {size} bytes listed in the manifest.")
+        stalled = 0 if length > offset else stalled + 1
+        if stalled >= MAX_STALLED_ATTEMPTS:
+            raise UpdateError(f"Download of {url} keeps failing: {error or f'stuck at {length} of {size} bytes'}")
+        if error is not None:
+            logging.warning(f"Update download interrupted after {received} bytes, resuming: {error}")
+
+    if not os.path.exists(part_path) or file_sha256(part_path) != sha256:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise UpdateError(f"Checksum mismatch for {url}")
+    os.replace(part_path, dest)
+    return transferred
+
+
+class UpdateDownloader:
+    """
+    Background job (run via TaskExecutor) that stages a new release for installation.
+
+    The release manifest lists every file with its SHA-256, so only the files that
+    differ from the installed ones are fetched; a Python-only release does not pull
+    the VLC plugins again. Files are staged in the user's profile and swapped in by
+    `apply_staged_update` on the next start.
+    """
+
+    def __init__(self, manifest_url, manifest_sha256=None, install_dir=None, staging_dir=None, on_progress=None):
+        self.manifest_url = manifest_url
+        self.manifest_sha256 = manifest_sha256
+        self.install_dir = install_dir or get_install_dir()
+        self.staging_dir = staging_dir or get_update_staging_dir()
+        self.on_progress = on_progress
+
+    def __call__(self, token):
+        """Returns a report with the version staged and the bytes transferred versus the full release size."""
+        session = requests.Session()
+        try:
+            response = session.get(self.manifest_url, timeout=10)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise UpdateError(f"Could not fetch the update manifest: {e}")
+        if self.manifest_sha256 and hashlib.sha256(response.content).hexdigest() != self.manifest_sha256:
+            raise UpdateError("The update manifest does not match the checksum in version.json.")
+        try:
+            manifest = json.loads(response.content)
+            files = manifest["files"]
+            version_string = manifest["version"]
+        except (ValueError, KeyError, TypeError):
+            raise UpdateError("The update manifest is malformed.")
+        base_url = manifest.get("base_url") or self.manifest_url.rsplit("/", 1)[0] + "/"
+
+        files_dir = os.path.join(self.staging_dir, version_string)
+        self._discard_other_versions(version_string)
+        changed = [path for path, entry in files.items() if not self._is_installed(path, entry)]
+        total_bytes = sum(entry.get("size", 0) for entry in files.values())
+        changed_bytes = sum(files[path].get("size", 0) for path in changed)
+        logging.info(f"Update {version_string}: {len(changed)} of {len(files)} files changed ({changed_bytes} bytes).")
+
+        downloaded = 0
+        progress = {"done": 0}
+
+        def report(count):
+            progress["done"] += count
+            if self.on_progress:
+                self.on_progress(progress["done"], changed_bytes)
+
+        for path in changed:
+            token.raise_if_cancelled()
+            entry = files[path]
+            dest = os.path.join(files_dir, _safe_relative_path(path))
+            if os.path.exists(dest) and file_sha256(dest) == entry["sha256"]:
+                # Staged by an earlier, interrupted run.
+                report(entry.get("size", 0))
+                continue
+            downloaded += download_file(session, base_url + path, dest, entry["sha256"], entry.get("size"),
+                                        token=token, on_progress=report)
+
+        save_json_file(os.path.join(self.staging_dir, STAGED_FILE),
+                       {"version": version_string, "directory": files_dir, "files": changed})
+        result = {
+            "version": version_string,
+            "files_total": len(files),
+            "files_changed": len(changed),
+            "bytes_transferred": downloaded,
+            "bytes_changed": changed_bytes,
+            "bytes_full_release": total_bytes,
+        }
+        logging.info(f"Update staged: {result}")
+        return result
+
+    def _is_installed(self, path, entry):
+        installed = os.path.join(self.install_dir, _safe_relative_path(path))
+        if not os.path.exists(installed):
+            return False
+        # A size mismatch settles it without hashing hundreds of megabytes of plugins.
+        if "size" in entry and os.path.getsize(installed) != entry["size"]:
+            return False
+        return file_sha256(installed) == entry["sha256"]
+
+    def _discard_other_versions(self, version_string):
+        if not os.path.isdir(self.staging_dir):
+            return
+        for name in os.listdir(self.staging_dir):
+            path = os.path.join(self.staging_dir, name)
+            if os.path.isdir(path) and name != version_string:
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def apply_staged_update(install_dir=None, staging_dir=None):
+    """
+    Swaps a fully staged update into the install directory. Files in use are renamed
+    to *.old rather than overwritten. On failure everything is rolled back and the
+    staged files are kept, so the next start tries again without downloading them.
+    Returns the installed version, or None if nothing was staged or it failed.
+    """
+    install_dir = install_dir or get_install_dir()
+    staging_dir = staging_dir or get_update_staging_dir()
+    staged = load_json_file(os.path.join(staging_dir, STAGED_FILE))
+    if not staged:
+        return None
+
+    applied = []
+    try:
+        for path in staged["files"]:
+            relative = _safe_relative_path(path)
+            source = os.path.join(staged["directory"], relative)
+            target = os.path.join(install_dir, relative)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            had_original = os.path.exists(target)
+            if had_original:
+                old_path = target + OLD_SUFFIX
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+                os.replace(target, old_path)
+            applied.append((source, target, had_original))
+            shutil.move(source, target)
+    except (OSError, KeyError, UpdateError) as e:
+        logging.error(f"Could not apply the staged update, rolling back; it stays staged for the next start: {e}")
+        for source, target, had_original in reversed(applied):
+            try:
+                # Moved back into staging, so the verified download is not lost.
+                if os.path.exists(target):
+                    if os.path.exists(source):
+                        os.remove(target)
+                    else:
+                        shutil.move(target, source)
+                if had_original:
+                    os.replace(target + OLD_SUFFIX, target)
+            except OSError as rollback_error:
+                logging.error(f"Rollback failed for {target}: {rollback_error}")
+        return None
+
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    logging.info(f"Installed update {staged['version']} ({len(applied)} files).")
+    return staged["version"]
+
+
+def remove_old_files(install_dir=None):
+    """Deletes the *.old files left by a previous update once they are no longer in use."""
+    for directory, _, names in os.walk(install_dir or get_install_dir()):
+        for name in names:
+            if name.endswith(OLD_SUFFIX):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except OSError:
+                    pass
+
+
+def restart_application():
+    subprocess.Popen([sys.executable] + sys.argv[1:])
+
+
+def main():
+    """Writes the update manifest of a built release and prints the checksum for version.json."""
+    parser = argparse.ArgumentParser(description="Build the Amwaj update manifest")
+    parser.add_argument("release_dir", help="the PyInstaller output directory, e.g. dist/radio_app")
+    parser.add_argument("--version", required=True)
+    parser.add_argument("--base-url", required=True, help="URL the release files are published under")
+    parser.add_argument("--output", default="manifest.json")
+    args = parser.parse_args()
+
+    manifest = build_manifest(args.release_dir, args.version, args.base_url)
+    body = json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8")
+    with open(args.output, "wb") as f:
+        f.write(body)
+    size = sum(entry["size"] for entry in manifest["files"].values())
+    print(f"{len(manifest['files'])} files, {size} bytes")
+    print(f"manifest_sha256: {hashlib.sha256(body).hexdigest()}")
+
+
+if __name__ == "__main__":
+    main()